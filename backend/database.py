@@ -1,10 +1,26 @@
 import os
-import dotenv
 from sqlalchemy import create_engine
 
+_engine = None
+
 def database_connection_url():
+    import dotenv
     dotenv.load_dotenv()
 
     return os.environ.get("POSTGRES_URI")
 
-engine = create_engine(database_connection_url(), pool_pre_ping=True)
\ No newline at end of file
+# Lets scripts and tests point the backend at another database, e.g. sqlite, before first use
+def SetEngine(engine):
+    global _engine
+    _engine = engine
+
+# db.engine is created on first access, so importing the backend doesn't connect to anything
+def __getattr__(name):
+
+    global _engine
+    if name == "engine":
+        if _engine is None:
+            _engine = create_engine(database_connection_url(), pool_pre_ping=True)
+        return _engine
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,14 +1,12 @@
 import database as db
 import sqlalchemy
 
-from schemas import types, move_categories, players
+import schemas
 
 #------------------------------------------------------------#
-# Accessible variables
-pkTypes = None
-Typespk = None
-pkMoveCategories = None
-pkPlayers = None
+# Accessible variables, loaded from the database the first time they are used:
+# pkTypes, Typespk, pkMoveCategories, pkPlayers
+_maps = {}
 #------------------------------------------------------------#
 
 def SyncTypes():
@@ -20,7 +18,7 @@ def SyncTypes():
 
         result = conn.execute(
             sqlalchemy
-            .select(types.c.id, types.c.type)
+            .select(schemas.types.c.id, schemas.types.c.type)
         )
 
         pkTypes = {row[1]: row[0] for row in result}
@@ -42,7 +40,7 @@ def SyncMoveCategories():
 
         result = conn.execute(
             sqlalchemy
-            .select(move_categories.c.id, move_categories.c.category)
+            .select(schemas.move_categories.c.id, schemas.move_categories.c.category)
         )
 
         pkMoveCategories = {row[1]: row[0] for row in result}
@@ -59,7 +57,7 @@ def SyncPlayers():
 
         result = conn.execute(
             sqlalchemy
-            .select(players.c.id, players.c.username)
+            .select(schemas.players.c.id, schemas.players.c.username)
         )
 
         pkPlayers = {row[1].lower(): row[0] for row in result}
@@ -68,6 +66,35 @@ def SyncPlayers():
 
 
 
-(pkTypes, Typespk) = SyncTypes()
-pkMoveCategories = SyncMoveCategories()
-pkPlayers = SyncPlayers()
+def _LoadTypes():
+    (_maps["pkTypes"], _maps["Typespk"]) = SyncTypes()
+
+def _LoadMoveCategories():
+    _maps["pkMoveCategories"] = SyncMoveCategories()
+
+def _LoadPlayers():
+    _maps["pkPlayers"] = SyncPlayers()
+
+_loaders = {
+    "pkTypes": _LoadTypes,
+    "Typespk": _LoadTypes,
+    "pkMoveCategories": _LoadMoveCategories,
+    "pkPlayers": _LoadPlayers,
+}
+
+# Drops the given maps, or all of them, so the next use reads them from the database again
+def Refresh(*names):
+
+    for name in names or tuple(_loaders):
+        if name not in _loaders:
+            raise KeyError(name)
+        _maps.pop(name, None)
+
+def __getattr__(name):
+
+    if name in _loaders:
+        if name not in _maps:
+            _loaders[name]()
+        return _maps[name]
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
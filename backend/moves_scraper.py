@@ -4,8 +4,8 @@ from sys import maxsize as MAX_INT
 
 import database as db
 import sqlalchemy
-from schemas import moves
-from databasesync import pkTypes, pkMoveCategories
+import schemas
+import databasesync
 
 
 def TextToInt(text):
@@ -52,8 +52,8 @@ if response.status_code == 200:
                 moveList.append(
                     {
                         "name": cells[0].text,
-                        "type": pkTypes[cells[1].text],
-                        "category": pkMoveCategories[MoveCategoryHandling(cells[2])],
+                        "type": databasesync.pkTypes[cells[1].text],
+                        "category": databasesync.pkMoveCategories[MoveCategoryHandling(cells[2])],
                         "power": TextToInt(cells[3].text),
                         "accuracy": TextToInt(cells[4].text),
                         "pp": TextToInt(cells[5].text),
@@ -75,6 +75,6 @@ else:
 # with db.engine.begin() as conn:
 #     conn.execute(
 #         sqlalchemy
-#         .insert(moves)
+#         .insert(schemas.moves)
 #         .values(moveList)
 #     )
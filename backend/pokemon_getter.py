@@ -1,90 +1,168 @@
-import pandas as pd
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
 import database as db
 import sqlalchemy
-from schemas import pokemon_final
-from databasesync import Typespk
+import schemas
+import databasesync
 
-def GetPokemonFinal(pokemon_id):
+# Bump when the layout of the cached arrays changes
+CACHE_VERSION = 1
 
-    with db.engine.begin() as conn:
+STAT_COLUMNS = ("HP", "Atk", "Def", "SpA", "SpD", "Spe")
 
-        result = conn.execute(
-            sqlalchemy
-            .select(pokemon_final)
-            .where(pokemon_final.c.pokedex_number == pokemon_id)
-        )
-    return result.first()
+# One load of the table. A reload builds a new one and swaps it in whole, so a lookup that took
+# the snapshot never mixes rowOf from one load with rows from another.
+PokemonFinalSnapshot = namedtuple("PokemonFinalSnapshot", ["version", "rows", "rowOf", "typeIds", "stats"])
 
-def GetPokemonFinalTypesIdsAndStats(pokemon_id):
-    
+
+# The whole pokemon_final table, read once per process. Stats and type ids are NumPy arrays
+# with one row per pokemon, and rowOf maps a pokedex number to its row, so every lookup is a
+# dict hit and an array index instead of a query.
+class PokemonFinalCache:
+
+    def __init__(self):
+
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.snapshot = None
+
+    # Anything loaded before this is stale, the next lookup reads the table again
+    def Invalidate(self):
+
+        with self.lock:
+            self.generation += 1
+
+    def _Version(self):
+        return (CACHE_VERSION, self.generation)
+
+    def _Load(self, version):
+
+        pokemon_final = schemas.pokemon_final
         with db.engine.begin() as conn:
-    
-            result = conn.execute(
-                sqlalchemy
-                .select(pokemon_final.c.type1, pokemon_final.c.type2,
-                        pokemon_final.c.HP, pokemon_final.c.Atk,
-                        pokemon_final.c.Def, pokemon_final.c.SpA,
-                        pokemon_final.c.SpD, pokemon_final.c.Spe)
-                .where(pokemon_final.c.pokedex_number == pokemon_id)
-            )
-        return result.first()
+            rows = conn.execute(sqlalchemy.select(pokemon_final)).fetchall()
+
+        rowOf = {}
+        for i, row in enumerate(rows):
+            # Keep the first row like result.first() did when a number appears twice
+            rowOf.setdefault(row.pokedex_number, i)
+
+        # Missing types are stored as -1 and handed back as None
+        typeIds = np.array([[-1 if row.type1 is None else row.type1, -1 if row.type2 is None else row.type2] for row in rows],
+                           dtype=np.int32).reshape(len(rows), 2)
+        stats = np.array([[getattr(row, column) for column in STAT_COLUMNS] for row in rows],
+                         dtype=np.int32).reshape(len(rows), len(STAT_COLUMNS))
+
+        return PokemonFinalSnapshot(version, rows, rowOf, typeIds, stats)
+
+    # Returns the current snapshot, loading the table first if it is missing or stale
+    def Ensure(self):
+
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.version == self._Version():
+            return snapshot
+
+        with self.lock:
+            version = self._Version()
+            if self.snapshot is None or self.snapshot.version != version:
+                self.snapshot = self._Load(version)
+            return self.snapshot
+
+    def Row(self, pokemon_id):
+
+        snapshot = self.Ensure()
+        i = snapshot.rowOf.get(pokemon_id)
+        return None if i is None else snapshot.rows[i]
+
+    def TypeIdsAndStats(self, pokemon_ids):
+
+        snapshot = self.Ensure()
+        positions = [snapshot.rowOf.get(pokemon_id, -1) for pokemon_id in pokemon_ids]
+
+        # Unknown numbers index row -1, which an empty table doesn't have
+        if snapshot.rows:
+            found = np.array(positions, dtype=np.intp)
+            typeIds = snapshot.typeIds[found].tolist()
+            stats = snapshot.stats[found].tolist()
+        else:
+            typeIds = stats = [None] * len(positions)
+
+        result = []
+        for pokemon_id, i, types, values in zip(pokemon_ids, positions, typeIds, stats):
+            if i < 0:
+                result.append((pokemon_id, None, None) + (None,) * len(STAT_COLUMNS))
+            else:
+                result.append((pokemon_id, None if types[0] < 0 else types[0], None if types[1] < 0 else types[1]) + tuple(values))
+        return result
+
+
+pokemonFinalCache = PokemonFinalCache()
+
+
+def _TypeName(typeId):
+    return None if typeId is None else databasesync.Typespk[typeId]
+
+def GetPokemonFinal(pokemon_id):
+
+    return pokemonFinalCache.Row(pokemon_id)
+
+def GetPokemonFinalTypesIdsAndStats(pokemon_id):
+
+    row = pokemonFinalCache.TypeIdsAndStats([pokemon_id])[0]
+    return None if row[3] is None else row[1:]
 
 def GetPokemonFinalTypeNamesAndStats(pokemon_id):
-    
-        with db.engine.begin() as conn:
-    
-            result = conn.execute(
-                sqlalchemy
-                .select(pokemon_final.c.type1, pokemon_final.c.type2,
-                        pokemon_final.c.HP, pokemon_final.c.Atk,
-                        pokemon_final.c.Def, pokemon_final.c.SpA,
-                        pokemon_final.c.SpD, pokemon_final.c.Spe)
-                .where(pokemon_final.c.pokedex_number == pokemon_id)
-            )
-        pokemon = result.first()
-        return (Typespk[pokemon[0]], Typespk[pokemon[1]], pokemon[2], pokemon[3],
-                pokemon[4], pokemon[5], pokemon[6], pokemon[7])
-
-def ReOrderList(pokemonids, pokemonlist):
-    pokemonlist = pd.DataFrame(pokemonlist, columns=["pokedex_number", "type1", "type2", "HP", "Atk", "Def", "SpA", "SpD", "Spe"])
-    pokemonlist = pokemonlist.set_index("pokedex_number")
-    pokemonlist = pokemonlist.reindex(pokemonids)
-    pokemonlist = pokemonlist.reset_index()
-    return pokemonlist.values.tolist()
-    
 
+    row = GetPokemonFinalTypesIdsAndStats(pokemon_id)
+    return None if row is None else (_TypeName(row[0]), _TypeName(row[1])) + row[2:]
+
+# Rows come back in the order of pokemon_ids, with None values for unknown numbers
 def GetPokemonTypeAndStatsList(pokemon_ids, TypeIds = False):
-        
-        
+
+    pokemon = pokemonFinalCache.TypeIdsAndStats(list(pokemon_ids))
+
+    if TypeIds:
+        return pokemon
+    else:
+        return [(row[0], _TypeName(row[1]), _TypeName(row[2])) + row[3:] for row in pokemon]
+
+def GetListPokemonFinal(pokemon_ids):
+
+    rows = (pokemonFinalCache.Row(pokemon_id) for pokemon_id in pokemon_ids)
+    return [row for row in rows if row is not None]
+
+
+# Times lookups of random pokemon through one query each, as the getters used to, against the cache
+def BenchmarkPokemonFinalLookups(lookups=10000, seed=0):
+
+    pokemon_final = schemas.pokemon_final
+    dexNumbers = list(pokemonFinalCache.Ensure().rowOf)
+    ids = [dexNumbers[i] for i in np.random.default_rng(seed).integers(0, len(dexNumbers), lookups)]
+
+    start = time.perf_counter()
+    for pokemon_id in ids:
         with db.engine.begin() as conn:
-    
-            result = conn.execute(
+            conn.execute(
                 sqlalchemy
-                .select(pokemon_final.c.pokedex_number, pokemon_final.c.type1, pokemon_final.c.type2,
+                .select(pokemon_final.c.type1, pokemon_final.c.type2,
                         pokemon_final.c.HP, pokemon_final.c.Atk,
                         pokemon_final.c.Def, pokemon_final.c.SpA,
                         pokemon_final.c.SpD, pokemon_final.c.Spe)
-                .where(pokemon_final.c.pokedex_number.in_(pokemon_ids))
-            )
-
-        pokemon = ReOrderList(pokemon_ids, result.fetchall())
-
-        if TypeIds:
-            return [(row[0], row[1], row[2], row[3], row[4],
-                    row[5], row[6], row[7], row[8]) for row in pokemon]
-        else:
-            return [(row[0], Typespk[row[1]], Typespk[row[2]], row[3], row[4],
-                row[5], row[6], row[7], row[8]) for row in pokemon]
-
-
+                .where(pokemon_final.c.pokedex_number == pokemon_id)
+            ).first()
+    queried = time.perf_counter() - start
 
-def GetListPokemonFinal(pokemon_ids):
+    start = time.perf_counter()
+    for pokemon_id in ids:
+        GetPokemonFinalTypesIdsAndStats(pokemon_id)
+    cached = time.perf_counter() - start
 
-    with db.engine.begin() as conn:
+    start = time.perf_counter()
+    GetPokemonTypeAndStatsList(ids, TypeIds=True)
+    listed = time.perf_counter() - start
 
-        result = conn.execute(
-            sqlalchemy
-            .select(pokemon_final)
-            .where(pokemon_final.c.pokedex_number.in_(pokemon_ids))
-        )
-    return result.fetchall()
\ No newline at end of file
+    print(f"{lookups} lookups: {queried * 1000:.1f} ms queried, {cached * 1000:.1f} ms cached, "
+          f"{listed * 1000:.1f} ms as one list ({queried / cached:.0f}x)")
+    return queried, cached, listed
@@ -4,8 +4,8 @@ from sys import maxsize as MAX_INT
 
 import database as db
 import sqlalchemy
-from schemas import pokemon
-from databasesync import pkTypes
+import schemas
+import databasesync
 
 
 def TextToInt(text):
@@ -52,8 +52,8 @@ if response.status_code == 200:
 
                 # Multi-type handling
                 types = cells[2].text.split(" ")
-                type1 = pkTypes[types[0]]
-                type2 = pkTypes[types[1]]
+                type1 = databasesync.pkTypes[types[0]]
+                type2 = databasesync.pkTypes[types[1]]
 
                 # Pokemon db isnstance
                 pokedex.append(
@@ -85,6 +85,6 @@ else:
 # with db.engine.begin() as conn:
 #     conn.execute(
 #         sqlalchemy
-#         .insert(pokemon)
+#         .insert(schemas.pokemon)
 #         .values(pokedex)
 #     )
@@ -1,128 +1,163 @@
-import requests
-import json
-
-from enum import Enum
 from replay_utils import *
-
+from replay_ingest import ReplayIngester
+from replay_parser import CompressForInsert
 
 import database as db
 import sqlalchemy
 import datetime
-import json
-from schemas import replays, elo_rankings
-from databasesync import pkPlayers
-
-
-#Gets the top 50 replays for a user in a given group
-def GetTopReplaysForUserInGroup(userid, gen, tier):
-
-    group = GetGenerationTierCombo(gen, tier)
+import databasesync
 
-    url = replayBaseUrl + f"search.json?user={userid}&format={group}"
-    response = requests.get(url)
 
-    if response.status_code == 200:
+# Where each player's replays in a format have been fetched up to. The primary key carries the
+# marks so choosing who to sync reads only the index, and elo_rankings gets the matching index
+# so the join doesn't scan the table either.
+def CreateReplaySyncState():
 
-        # To send to the database
-        replaysForDatabase = []
-        replays = json.loads(response._content)
-
-        #If there are no replays, get outta here
-        if replays == []:
-            return
+    with db.engine.begin() as conn:
+        conn.execute(
+            sqlalchemy.text(
+                '''
+                CREATE TABLE IF NOT EXISTS replay_sync_state (
+                    player INTEGER NOT NULL REFERENCES players ( id ),
+                    generation INTEGER NOT NULL,
+                    tier TEXT NOT NULL,
+                    last_upload_time TIMESTAMP,
+                    last_replay_id TEXT,
+                    synced_at TIMESTAMP NOT NULL DEFAULT now(),
+                    PRIMARY KEY ( player, generation, tier ) INCLUDE ( synced_at, last_upload_time, last_replay_id )
+                )
+                '''
+            )
+        )
+        conn.execute(
+            sqlalchemy.text(
+                '''
+                CREATE INDEX IF NOT EXISTS elo_rankings_player_format
+                ON elo_rankings ( player, generation, tier )
+                '''
+            )
+        )
 
-        for replay in replays:
+# Must use sql alchemy.text to use ON CONFLICT, executed once with every row of the batch.
+# The sync states of the players in the batch are written in the same transaction, so a mark
+# never moves past replays that weren't stored. Once replay_parser.py compress has trained a
+# dictionary, logs are stored compressed with it.
+def UpsertReplays(replaysForDatabase, syncStates=()):
 
-            #Get the log of the replay
-            log = GetReplayLog(replay["id"])
+    with db.engine.begin() as conn:
 
-            #If we didn't get a log
-            if log is None:
-                 continue
-            
-            #Otherwise, add to replays
+        added = 0
+        if replaysForDatabase:
+            compressedRows = CompressForInsert(conn, replaysForDatabase)
+            if compressedRows is None:
+                result = conn.execute(
+                    sqlalchemy.text(
+                        '''
+                        INSERT INTO replays (replay_id, upload_time, player1, player2, tier, generation, log)
+                        VALUES (:replay_id, :upload_time, :player1, :player2, :tier, :generation, :log)
+                        ON CONFLICT ( replay_id ) DO NOTHING
+                        '''
+                    ),
+                    replaysForDatabase
+                )
             else:
-                #First we need to check if we have the other player in the database
-                # If we dont, we will put them as unknown player
-                # NOTE: we don't know whether the current userid will be p1 or p2, so do both
-                player1 = pkPlayers.get(replay["p1"].lower(), None)
-                player2 = pkPlayers.get(replay["p2"].lower(), None)
-
-                # Convert to datetime object
-                uploadTime = datetime.datetime.fromtimestamp(replay["uploadtime"])
-
-                # Convert to database format
-                replaysForDatabase.append( 
-                    {
-                        "replay_id": replay["id"].split("-")[-1],
-                        "upload_time": uploadTime,
-                        "player1": player1,
-                        "player2": player2,
-                        "tier": Tier(tier).ToString(),
-                        "generation": Generation(gen).value,
-                        "log": log
-                    }
+                result = conn.execute(
+                    sqlalchemy.text(
+                        '''
+                        INSERT INTO replays (replay_id, upload_time, player1, player2, tier, generation,
+                                             log_compressed, log_dictionary)
+                        VALUES (:replay_id, :upload_time, :player1, :player2, :tier, :generation,
+                                :log_compressed, :log_dictionary)
+                        ON CONFLICT ( replay_id ) DO NOTHING
+                        '''
+                    ),
+                    compressedRows
                 )
-    else:
-        print("Error: " + str(response.status_code))
+            added = max(result.rowcount, 0)
+
+        syncStates = [state for state in syncStates if state["player"] is not None]
+        if syncStates:
+            conn.execute(
+                sqlalchemy.text(
+                    '''
+                    INSERT INTO replay_sync_state (player, generation, tier, last_upload_time, last_replay_id, synced_at)
+                    VALUES (:player, :generation, :tier, :last_upload_time, :last_replay_id, now())
+                    ON CONFLICT ( player, generation, tier ) DO UPDATE
+                    SET last_upload_time = EXCLUDED.last_upload_time,
+                        last_replay_id = EXCLUDED.last_replay_id,
+                        synced_at = EXCLUDED.synced_at
+                    '''
+                ),
+                syncStates
+            )
+
+    print(f"Added {added} of {len(replaysForDatabase)} replays to database")
+    return added
 
+#Gets the replays for a user in a given group that are newer than their sync state
+def GetTopReplaysForUserInGroup(userid, gen, tier, baseUrl=replayBaseUrl):
+
+    CreateReplaySyncState()
     with db.engine.begin() as conn:
-        
-        # Must use sql alchemy.text to use ON CONFLICT
-        conn.execute(
+
+        target = conn.execute(
             sqlalchemy.text(
                 '''
-                INSERT INTO replays (replay_id, upload_time, player1, player2, tier, generation, log)
-                VALUES (:replay_id, :upload_time, :player1, :player2, :tier, :generation, :log)
-                ON CONFLICT ( replay_id ) DO NOTHING
+                SELECT players.id AS player, players.userid, :generation AS generation, :tier AS tier,
+                       replay_sync_state.last_upload_time, replay_sync_state.last_replay_id
+                FROM players
+                LEFT JOIN replay_sync_state ON replay_sync_state.player = players.id
+                    AND replay_sync_state.generation = :generation
+                    AND replay_sync_state.tier = :tier
+                WHERE players.userid = :userid
                 '''
             ),
-            replaysForDatabase
-        )
+            {"userid": userid, "generation": Generation(gen).value, "tier": Tier(tier).ToString()}
+        ).mappings().first()
 
-    print(f"Added {len(replaysForDatabase)} replays for {userid} to database\n")
-
-def GetReplayLog(id):
-    
-        url = replayBaseUrl + id + ".json?"
-        response = requests.get(url)
-    
-        if response.status_code == 200:
-            return json.loads(response._content)["log"]
-    
-        else:
-            print("Error: " + str(response.status_code))
-            return None
-        
-
-def GetReplaysForPlayersInDatabase():
-         
+    # Players we don't know yet are fetched without keeping a mark
+    if target is None:
+        target = {"userid": userid, "generation": Generation(gen).value, "tier": Tier(tier).ToString()}
+
+    ingester = ReplayIngester(baseUrl)
+    try:
+        return ingester.Ingest([target], databasesync.pkPlayers, UpsertReplays)
+    finally:
+        ingester.Close()
+
+# Syncs every ladder player whose replays haven't been fetched in the last staleAfter,
+# asking only for replays newer than their mark
+def GetReplaysForPlayersInDatabase(baseUrl=replayBaseUrl, perHostLimit=8, staleAfter=datetime.timedelta(hours=12)):
+
+    CreateReplaySyncState()
     with db.engine.begin() as conn:
 
-        unprocessedElos = conn.execute(
+        targets = conn.execute(
             sqlalchemy.text(
-
             '''
-            SELECT players.userid, generation, tier
+            SELECT DISTINCT elo_rankings.player, players.userid, elo_rankings.generation, elo_rankings.tier,
+                   replay_sync_state.last_upload_time, replay_sync_state.last_replay_id
             FROM elo_rankings
             INNER JOIN players ON players.id = elo_rankings.player
-            WHERE player IN (
-                SELECT id
-                FROM players
-                EXCEPT
-                SELECT DISTINCT COALESCE(player, 0) FROM 
-                (
-                    SELECT player1 AS player FROM replays
-                    UNION SELECT player2 FROM replays
-                ) foo
-            )
-            ORDER BY player
+            LEFT JOIN replay_sync_state ON replay_sync_state.player = elo_rankings.player
+                AND replay_sync_state.generation = elo_rankings.generation
+                AND replay_sync_state.tier = elo_rankings.tier
+            WHERE replay_sync_state.synced_at IS NULL
+                OR replay_sync_state.synced_at < now() - :staleAfter
+            ORDER BY elo_rankings.player
             '''
-            )
-        ).fetchall()
+            ),
+            {"staleAfter": staleAfter}
+        ).mappings().fetchall()
+
+    print(f"Fetching replays for {len(targets)} player ladders...")
 
-    for elo in unprocessedElos:
-            print(f"Adding for {elo[0]}...")
-            GetTopReplaysForUserInGroup(elo[0], Generation(elo[1]), Tier(elo[2]))
+    # Search pages and logs are fetched concurrently, rows are written in batches as they arrive
+    ingester = ReplayIngester(baseUrl, perHostLimit=perHostLimit)
+    try:
+        return ingester.Ingest(targets, databasesync.pkPlayers, UpsertReplays)
+    finally:
+        ingester.Close()
 
-GetReplaysForPlayersInDatabase()
\ No newline at end of file
+if __name__ == "__main__":
+    GetReplaysForPlayersInDatabase()
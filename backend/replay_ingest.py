@@ -0,0 +1,230 @@
+import asyncio
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from replay_utils import *
+
+# Statuses worth trying again after a pause, anything else is a real failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# Fetches search pages and replay logs concurrently on one pooled session.
+# requests is blocking, so each request runs on the thread pool while asyncio
+# schedules them, with at most perHostLimit requests in flight per host.
+class ReplayIngester:
+
+    def __init__(self, baseUrl=replayBaseUrl, perHostLimit=8, retries=3, backoff=0.5, timeout=30, batchSize=500):
+
+        self.baseUrl = baseUrl if baseUrl.endswith("/") else baseUrl + "/"
+        self.perHostLimit = perHostLimit
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.batchSize = batchSize
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=perHostLimit)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.executor = ThreadPoolExecutor(max_workers=perHostLimit)
+        self.hostLimits = {}
+
+        self.requestCount = 0
+        self.retryCount = 0
+        self.errorCount = 0
+
+    def Close(self):
+        self.executor.shutdown()
+        self.session.close()
+
+    def _HostLimit(self, url):
+
+        host = urlsplit(url).netloc
+        if host not in self.hostLimits:
+            self.hostLimits[host] = asyncio.Semaphore(self.perHostLimit)
+        return self.hostLimits[host]
+
+    async def _GetJson(self, url):
+
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+
+            # Only hold the host's slot while the request is in flight, not while backing off
+            async with self._HostLimit(url):
+                self.requestCount += 1
+                try:
+                    response = await loop.run_in_executor(self.executor, partial(self.session.get, url, timeout=self.timeout))
+                except requests.RequestException as e:
+                    response = None
+                    error = str(e)
+
+            if response is not None:
+                if response.status_code == 200:
+                    # Showdown answers some failures with a 200 and an HTML page, retried like a 503
+                    try:
+                        return response.json()
+                    except ValueError:
+                        error = "invalid JSON"
+                else:
+                    error = str(response.status_code)
+                    if response.status_code not in RETRY_STATUSES:
+                        break
+
+            if attempt < self.retries:
+                self.retryCount += 1
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+        self.errorCount += 1
+        print("Error: " + error + " for " + url)
+        return None
+
+    async def GetReplayLog(self, id):
+
+        replay = await self._GetJson(self.baseUrl + id + ".json")
+        if not isinstance(replay, dict) or not isinstance(replay.get("log"), str):
+            return None
+        return replay["log"]
+
+    # Newest first. With a mark, pages until it reaches replays at or before the mark and
+    # returns only the newer ones; replays uploaded in the mark's second are kept unless
+    # they are the marked replay itself, the insert ignores any that were already stored.
+    # Also returns how the search ended: "complete" when it reached the mark or the end of the
+    # history, "pages" when it ran out of pages first and "failed" when a page couldn't be fetched.
+    async def SearchReplays(self, userid, gen, tier, pages=1, since=None, sinceId=None):
+
+        group = GetGenerationTierCombo(gen, tier)
+        results = []
+        before = None
+        for _ in range(pages):
+
+            url = self.baseUrl + f"search.json?user={userid}&format={group}"
+            if before is not None:
+                url += f"&before={before}"
+
+            page = await self._GetJson(url)
+            if not isinstance(page, list):
+                return results, "failed"
+
+            # A full page has one extra entry to say there is another page
+            for replay in page[:50]:
+                if since is not None and (replay["uploadtime"] < since or replay["id"] == sinceId):
+                    return results, "complete"
+                results.append(replay)
+
+            if len(page) <= 50:
+                return results, "complete"
+            before = page[49]["uploadtime"]
+
+        return results, "pages"
+
+    async def _ReplaysForTarget(self, target, players, pages):
+
+        gen = Generation(target["generation"])
+        tier = Tier(target["tier"])
+        lastUploadTime = target.get("last_upload_time")
+        since = None if lastUploadTime is None else int(lastUploadTime.timestamp())
+
+        # The first sync of a player takes their latest page, later ones page back to the mark
+        found, outcome = await self.SearchReplays(target["userid"], gen, tier,
+                                                  1 if since is None else pages, since, target.get("last_replay_id"))
+        logs = await asyncio.gather(*(self.GetReplayLog(replay["id"]) for replay in found))
+
+        replaysForDatabase = []
+        for replay, log in zip(found, logs):
+
+            # If we didn't get a log
+            if log is None:
+                continue
+
+            # We don't know whether the current userid will be p1 or p2, so look both up
+            replaysForDatabase.append(
+                {
+                    "replay_id": replay["id"].split("-")[-1],
+                    "upload_time": datetime.datetime.fromtimestamp(replay["uploadtime"]),
+                    "player1": players.get(replay["p1"].lower(), None),
+                    "player2": players.get(replay["p2"].lower(), None),
+                    "tier": tier.ToString(),
+                    "generation": gen.value,
+                    "log": log
+                }
+            )
+
+        print(f"Fetched {len(replaysForDatabase)} new replays for {target['userid']}")
+
+        # A failed search leaves the sync state alone, so the player is tried again next run
+        if outcome == "failed":
+            return replaysForDatabase, None
+
+        # The mark only moves when everything between it and the newest replay was searched, and
+        # then only up to just below the oldest replay whose log is missing. A first sync has
+        # no mark and only ever wants the latest page, so it counts as searched.
+        mark = None
+        if outcome == "complete" or since is None:
+            for replay, log in zip(reversed(found), reversed(logs)):
+                if log is None:
+                    break
+                mark = replay
+
+        syncState = {
+            "player": target.get("player"),
+            "generation": gen.value,
+            "tier": tier.ToString(),
+            "last_upload_time": lastUploadTime if mark is None else datetime.datetime.fromtimestamp(mark["uploadtime"]),
+            "last_replay_id": target.get("last_replay_id") if mark is None else mark["id"],
+        }
+        return replaysForDatabase, syncState
+
+    # One player's unexpected data mustn't stop the others, or lose the batches not yet written
+    async def _ReplaysForTargetOrNothing(self, target, players, pages):
+
+        try:
+            return await self._ReplaysForTarget(target, players, pages)
+        except Exception as e:
+            self.errorCount += 1
+            print(f"Error: {e!r} while fetching replays for {target.get('userid')}")
+            return [], None
+
+    async def _Ingest(self, targets, players, writeBatch, pages):
+
+        # Semaphores belong to the loop that made them and every Ingest runs its own loop
+        self.hostLimits = {}
+        loop = asyncio.get_running_loop()
+        tasks = [asyncio.ensure_future(self._ReplaysForTargetOrNothing(target, players, pages)) for target in targets]
+
+        # Write in batches as players finish, on the thread pool so fetching carries on meanwhile.
+        # A player's sync state goes in the same batch as their replays.
+        pending = []
+        syncStates = []
+        written = 0
+        for task in asyncio.as_completed(tasks):
+            replaysForDatabase, syncState = await task
+            pending.extend(replaysForDatabase)
+            if syncState is not None:
+                syncStates.append(syncState)
+            if len(pending) >= self.batchSize:
+                (batch, states, pending, syncStates) = (pending, syncStates, [], [])
+                written += await loop.run_in_executor(None, writeBatch, batch, states)
+
+        if pending or syncStates:
+            written += await loop.run_in_executor(None, writeBatch, pending, syncStates)
+        return written
+
+    # targets are dicts with userid, generation and tier, plus player, last_upload_time and
+    # last_replay_id when there is sync state. players maps lowercase usernames to player ids.
+    # writeBatch(replays, syncStates) stores one batch and returns how many replays it wrote.
+    def Ingest(self, targets, players, writeBatch, pages=10):
+
+        start = time.perf_counter()
+        written = asyncio.run(self._Ingest(list(targets), players, writeBatch, pages))
+        elapsed = time.perf_counter() - start
+
+        print(f"Wrote {written} replays in {elapsed:.1f}s "
+              f"({self.requestCount} requests, {self.retryCount} retries, {self.errorCount} errors)")
+        return written
@@ -0,0 +1,283 @@
+import collections
+import os
+import sys
+import zlib
+
+import database as db
+import sqlalchemy
+
+# zstandard is optional, without it logs are compressed with zlib and a preset dictionary
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# zlib only looks back 32KB, so a bigger dictionary would be wasted
+ZLIB_DICTIONARY_SIZE = 32 * 1024
+ZSTD_DICTIONARY_SIZE = 112 * 1024
+ZSTD_LEVEL = 19
+
+# dictionary id -> (compress, decompress)
+_codecs = {}
+
+
+# Compressed logs go next to the plain log column with the id of the dictionary they need.
+# A compressed row's log is set to NULL, so the column has to allow it.
+def CreateLogStorage():
+
+    with db.engine.begin() as conn:
+        conn.execute(
+            sqlalchemy.text(
+                '''
+                CREATE TABLE IF NOT EXISTS replay_log_dictionaries (
+                    id SERIAL PRIMARY KEY,
+                    codec TEXT NOT NULL,
+                    dictionary BYTEA NOT NULL,
+                    created_at TIMESTAMP NOT NULL DEFAULT now()
+                )
+                '''
+            )
+        )
+        conn.execute(
+            sqlalchemy.text(
+                '''
+                ALTER TABLE replays
+                ADD COLUMN IF NOT EXISTS log_compressed BYTEA,
+                ADD COLUMN IF NOT EXISTS log_dictionary INTEGER REFERENCES replay_log_dictionaries ( id ),
+                ALTER COLUMN log DROP NOT NULL
+                '''
+            )
+        )
+
+
+# The most common protocol lines of the samples, most common last because zlib finds
+# matches near the end of its dictionary more cheaply
+def _BuildZlibDictionary(samples, size):
+
+    counts = collections.Counter(line for sample in samples for line in sample.split("\n") if line)
+    dictionary = b""
+    for line, _ in counts.most_common():
+        entry = line.encode("utf-8") + b"\n"
+        if len(dictionary) + len(entry) > size:
+            break
+        dictionary = entry + dictionary
+    return dictionary
+
+
+def _MakeCodec(codec, dictionary):
+
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("These logs were compressed with zstd, install zstandard to read them")
+        dictionary = zstandard.ZstdCompressionDict(dictionary)
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary)
+        decompressor = zstandard.ZstdDecompressor(dict_data=dictionary)
+        return (compressor.compress, decompressor.decompress)
+
+    def Compress(data):
+        compressor = zlib.compressobj(9, zdict=dictionary)
+        return compressor.compress(data) + compressor.flush()
+
+    def Decompress(data):
+        decompressor = zlib.decompressobj(zdict=dictionary)
+        return decompressor.decompress(data) + decompressor.flush()
+
+    return (Compress, Decompress)
+
+
+def _GetCodec(conn, dictionaryId):
+
+    if dictionaryId not in _codecs:
+        (codec, dictionary) = conn.execute(
+            sqlalchemy.text("SELECT codec, dictionary FROM replay_log_dictionaries WHERE id = :id"),
+            {"id": dictionaryId}
+        ).one()
+        _codecs[dictionaryId] = _MakeCodec(codec, bytes(dictionary))
+    return _codecs[dictionaryId]
+
+
+# Trains a dictionary on a random sample of the stored logs and returns its id
+def TrainLogDictionary(sampleCount=2000):
+
+    with db.engine.begin() as conn:
+
+        samples = conn.execute(
+            sqlalchemy.text(
+                '''
+                SELECT log FROM replays
+                WHERE log IS NOT NULL
+                ORDER BY random()
+                LIMIT :sampleCount
+                '''
+            ),
+            {"sampleCount": sampleCount}
+        ).scalars().all()
+
+        if zstandard is not None:
+            codec = "zstd"
+            dictionary = zstandard.train_dictionary(ZSTD_DICTIONARY_SIZE, [sample.encode("utf-8") for sample in samples]).as_bytes()
+        else:
+            codec = "zlib"
+            dictionary = _BuildZlibDictionary(samples, ZLIB_DICTIONARY_SIZE)
+
+        dictionaryId = conn.execute(
+            sqlalchemy.text(
+                '''
+                INSERT INTO replay_log_dictionaries (codec, dictionary)
+                VALUES (:codec, :dictionary)
+                RETURNING id
+                '''
+            ),
+            {"codec": codec, "dictionary": dictionary}
+        ).scalar_one()
+
+    print(f"Trained a {len(dictionary)} byte {codec} dictionary on {len(samples)} logs")
+    return dictionaryId
+
+
+# The newest dictionary, or None before the first one is trained
+def LatestLogDictionary():
+
+    with db.engine.begin() as conn:
+        return _LatestLogDictionary(conn)
+
+
+# Reads without creating anything, so it is None until CreateLogStorage has run too
+def _LatestLogDictionary(conn):
+
+    if not sqlalchemy.inspect(conn).has_table("replay_log_dictionaries"):
+        return None
+    return conn.execute(
+        sqlalchemy.text("SELECT max(id) FROM replay_log_dictionaries")
+    ).scalar()
+
+
+# Replaces each row's log with log_compressed and log_dictionary when a dictionary has been
+# trained, so replays are stored compressed as they are written. Returns None before that,
+# when the rows have to be inserted with a plain log.
+def CompressForInsert(conn, replaysForDatabase):
+
+    dictionaryId = _LatestLogDictionary(conn)
+    if dictionaryId is None:
+        return None
+
+    (compress, _) = _GetCodec(conn, dictionaryId)
+    rows = []
+    for replay in replaysForDatabase:
+        row = dict(replay)
+        row["log_compressed"] = compress(row.pop("log").encode("utf-8"))
+        row["log_dictionary"] = dictionaryId
+        rows.append(row)
+    return rows
+
+
+# Compresses every plain log with the given dictionary, batchSize rows per transaction
+def CompressReplayLogs(dictionaryId, batchSize=500):
+
+    rawBytes = 0
+    compressedBytes = 0
+    compressed = 0
+    while True:
+
+        with db.engine.begin() as conn:
+
+            (compress, _) = _GetCodec(conn, dictionaryId)
+            rows = conn.execute(
+                sqlalchemy.text(
+                    '''
+                    SELECT replay_id, log FROM replays
+                    WHERE log IS NOT NULL
+                    LIMIT :batchSize
+                    '''
+                ),
+                {"batchSize": batchSize}
+            ).fetchall()
+
+            if not rows:
+                break
+
+            updates = []
+            for replayId, log in rows:
+                raw = log.encode("utf-8")
+                data = compress(raw)
+                rawBytes += len(raw)
+                compressedBytes += len(data)
+                updates.append({"replay_id": replayId, "log_compressed": data, "log_dictionary": dictionaryId})
+
+            conn.execute(
+                sqlalchemy.text(
+                    '''
+                    UPDATE replays
+                    SET log_compressed = :log_compressed, log_dictionary = :log_dictionary, log = NULL
+                    WHERE replay_id = :replay_id
+                    '''
+                ),
+                updates
+            )
+
+        compressed += len(rows)
+        print(f"Compressed {compressed} logs, {rawBytes} bytes to {compressedBytes}")
+
+    return (compressed, rawBytes, compressedBytes)
+
+
+# Yields the text of every stored log, plain or compressed. The rows come from a server-side
+# cursor batchSize at a time, so memory stays flat however big the table is. Only reads, on a
+# database that was never migrated it reads the plain logs.
+def StreamReplayLogs(generation=None, tier=None, batchSize=500):
+
+    with db.engine.connect() as conn:
+
+        columns = {column["name"] for column in sqlalchemy.inspect(conn).get_columns("replays")}
+        compressedColumns = "log_compressed, log_dictionary" if "log_compressed" in columns else "NULL, NULL"
+        result = conn.execution_options(stream_results=True, yield_per=batchSize).execute(
+            sqlalchemy.text(
+                f'''
+                SELECT log, {compressedColumns} FROM replays
+                WHERE (CAST(:generation AS INTEGER) IS NULL OR generation = :generation)
+                    AND (CAST(:tier AS TEXT) IS NULL OR tier = :tier)
+                '''
+            ),
+            {"generation": generation, "tier": tier}
+        )
+
+        # The streaming connection is busy with its cursor, so dictionaries are read on a second one
+        with db.engine.connect() as lookup:
+            for log, logCompressed, logDictionary in result:
+                if logCompressed is None:
+                    if log is not None:
+                        yield log
+                    continue
+                (_, decompress) = _GetCodec(lookup, logDictionary)
+                yield decompress(bytes(logCompressed)).decode("utf-8")
+
+
+USAGE = """usage:
+    python backend/replay_parser.py compress [sampleCount]
+        Adds the compressed log columns, trains a dictionary if there is none and compresses
+        every plain log. This changes the schema and drops the plain logs, there is no undo.
+    python backend/replay_parser.py table turns.cols
+        Streams every stored log into a turn table, a .cols path writes the columnar format.
+        Only reads from the database."""
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) >= 2 and sys.argv[1] == "compress":
+
+        CreateLogStorage()
+        dictionaryId = LatestLogDictionary()
+        if dictionaryId is None:
+            dictionaryId = TrainLogDictionary(*(int(arg) for arg in sys.argv[2:3]))
+        CompressReplayLogs(dictionaryId)
+
+    elif len(sys.argv) == 3 and sys.argv[1] == "table":
+
+        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from model_creation.parse2 import create_table_from_logs
+
+        create_table_from_logs(StreamReplayLogs(), sys.argv[2], columnar=sys.argv[2].endswith(".cols"))
+
+    else:
+        print(USAGE)
+        sys.exit(2)
@@ -0,0 +1,172 @@
+import datetime
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from replay_utils import *
+from replay_ingest import ReplayIngester
+
+
+# A local stand-in for replay.pokemonshowdown.com that answers search.json and <id>.json the
+# way the real site does, and can be told to misbehave:
+#   failTimes   replay id -> how many 503s its log gets before it is served
+#   htmlIds     replay ids whose log is always a 200 with an HTML error page
+#   htmlUsers   userids whose search is always a 200 with an HTML error page
+#   noLogIds    replay ids whose json has no log
+# replays maps (userid, format) to the replays newest first, as dicts with id, uploadtime, p1
+# and p2.
+class StubReplayServer:
+
+    def __init__(self, replays, failTimes=None, htmlIds=(), htmlUsers=(), noLogIds=()):
+
+        self.replays = replays
+        self.failTimes = dict(failTimes or {})
+        self.htmlIds = set(htmlIds)
+        self.htmlUsers = set(htmlUsers)
+        self.noLogIds = set(noLogIds)
+        self.requests = []
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                stub.requests.append(self.path)
+                (status, body) = stub._Answer(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json" if body.startswith(("[", "{")) else "text/html")
+                self.end_headers()
+                self.wfile.write(body.encode("utf-8"))
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def Close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _Answer(self, path):
+
+        parts = urlsplit(path)
+        if parts.path == "/search.json":
+            query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+            if query["user"] in self.htmlUsers:
+                return (200, "<html>Service unavailable</html>")
+            before = int(query.get("before", 2 ** 62))
+            found = [replay for replay in self.replays.get((query["user"], query["format"]), [])
+                     if replay["uploadtime"] < before]
+            # 50 per page plus one more when there is another page, like the real endpoint
+            return (200, json.dumps(found[:51]))
+
+        replayId = parts.path.strip("/").removesuffix(".json")
+        if self.failTimes.get(replayId, 0) > 0:
+            self.failTimes[replayId] -= 1
+            return (503, "<html>503</html>")
+        if replayId in self.htmlIds:
+            return (200, "<html>Something went wrong</html>")
+        replay = self._Find(replayId)
+        if replay is None:
+            return (404, "<html>404</html>")
+        body = dict(replay)
+        if replayId not in self.noLogIds:
+            body["log"] = f"|player|p1|{replay.get('p1')}\n|turn|1\n|win|{replay.get('p1')}\n"
+        return (200, json.dumps(body))
+
+    def _Find(self, replayId):
+
+        for replays in self.replays.values():
+            for replay in replays:
+                if replay["id"] == replayId:
+                    return replay
+        return None
+
+
+def _StubReplays(userid, group, count, start=1_700_000_000):
+
+    return [{"id": f"{group}-{userid}{i}", "uploadtime": start + i, "p1": userid, "p2": "someone"}
+            for i in range(count, 0, -1)]
+
+
+# Runs the ingester against a stub server and checks retries, bad responses and sync marks
+# without touching the network or a database. python replay_stub_server.py
+def CheckIngestAgainstStub():
+
+    gen = Generation.IX
+    tier = Tier.OU
+    group = GetGenerationTierCombo(gen, tier)
+
+    replays = {
+        ("alice", group): _StubReplays("alice", group, 120),
+        ("bob", group): _StubReplays("bob", group, 10),
+        ("carol", group): _StubReplays("carol", group, 5),
+        ("dave", group): _StubReplays("dave", group, 5),
+    }
+    # carol has a replay the ingester can't read at all
+    del replays[("carol", group)][2]["p1"]
+
+    stub = StubReplayServer(
+        replays,
+        failTimes={f"{group}-alice118": 2},
+        htmlIds={f"{group}-dave2"},
+        htmlUsers={"bob"},
+        noLogIds={f"{group}-dave4"},
+    )
+
+    def Target(userid, player, lastUploadTime=None, lastReplayId=None):
+        return {"userid": userid, "player": player, "generation": gen.value, "tier": tier.ToString(),
+                "last_upload_time": lastUploadTime, "last_replay_id": lastReplayId}
+
+    aliceMark = replays[("alice", group)][-10]
+    targets = [
+        # alice already synced up to her 10th replay, so 110 newer ones over three pages
+        Target("alice", 1, datetime.datetime.fromtimestamp(aliceMark["uploadtime"]), aliceMark["id"]),
+        Target("bob", 2),
+        Target("carol", 3),
+        Target("dave", 4),
+    ]
+
+    written = []
+    states = {}
+
+    def WriteBatch(batch, syncStates):
+        written.extend(batch)
+        states.update((state["player"], state) for state in syncStates)
+        return len(batch)
+
+    ingester = ReplayIngester(stub.url, perHostLimit=4, retries=2, backoff=0.01, timeout=5, batchSize=25)
+    try:
+        ingester.Ingest(targets, {}, WriteBatch)
+    finally:
+        ingester.Close()
+        stub.Close()
+
+    storedIds = {replay["replay_id"] for replay in written}
+
+    # alice: every newer replay stored, the one that 503'd twice too, and the mark at her newest
+    assert len([i for i in storedIds if i.startswith("alice")]) == 110, "alice's replays weren't all stored"
+    assert "alice118" in storedIds, "a log that failed twice wasn't retried"
+    assert states[1]["last_replay_id"] == f"{group}-alice120", states[1]
+
+    # bob's search answered with HTML, so nothing is stored and his sync state is left alone
+    assert 2 not in states, "a failed search wrote sync state"
+
+    # carol's broken replay fails her alone, and her sync state is left alone too
+    assert 3 not in states, "a player that raised wrote sync state"
+
+    # dave's HTML log and log-less json count as missing, the mark stops below the older one
+    assert {"dave5", "dave3", "dave1"} <= storedIds and not {"dave4", "dave2"} & storedIds, storedIds
+    assert states[4]["last_replay_id"] == f"{group}-dave1", states[4]
+
+    print(f"Stub ingest OK: {len(written)} replays, {ingester.requestCount} requests, "
+          f"{ingester.retryCount} retries, {ingester.errorCount} errors")
+    return len(written)
+
+
+if __name__ == "__main__":
+    CheckIngestAgainstStub()
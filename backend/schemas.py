@@ -1,12 +1,72 @@
+import os
+import pickle
+
 import database as db
 import sqlalchemy
 
+TABLE_NAMES = ("types", "move_categories", "moves", "pokemon", "players", "elo_rankings", "replays", "pokemon_final")
+
+# Set SCHEMA_CACHE to a file path to keep the reflected metadata between runs
+SCHEMA_CACHE = os.environ.get("SCHEMA_CACHE")
+
 metadata = sqlalchemy.MetaData()
-types = sqlalchemy.Table("types", metadata, autoload_with=db.engine)
-move_categories = sqlalchemy.Table("move_categories", metadata, autoload_with=db.engine)
-moves = sqlalchemy.Table("moves", metadata, autoload_with=db.engine)
-pokemon = sqlalchemy.Table("pokemon", metadata, autoload_with=db.engine)
-players = sqlalchemy.Table("players", metadata, autoload_with=db.engine)
-elo_rankings = sqlalchemy.Table("elo_rankings", metadata, autoload_with=db.engine)
-replays = sqlalchemy.Table("replays", metadata, autoload_with=db.engine)
-pokemon_final = sqlalchemy.Table("pokemon_final", metadata, autoload_with=db.engine)
\ No newline at end of file
+_cacheLoaded = False
+
+
+def _LoadCache():
+
+    global metadata, _cacheLoaded
+    _cacheLoaded = True
+    if not SCHEMA_CACHE or not os.path.exists(SCHEMA_CACHE):
+        return
+
+    try:
+        with open(SCHEMA_CACHE, "rb") as f:
+            metadata = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+        print(f"Ignoring schema cache {SCHEMA_CACHE}: {e}")
+
+
+def _SaveCache():
+
+    if not SCHEMA_CACHE:
+        return
+
+    # Write through a temp file so a concurrent reader never sees half a cache
+    tmpPath = SCHEMA_CACHE + ".tmp"
+    with open(tmpPath, "wb") as f:
+        pickle.dump(metadata, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpPath, SCHEMA_CACHE)
+
+
+# Returns a table, reflecting it from the database the first time it is asked for
+def GetTable(name):
+
+    if not _cacheLoaded:
+        _LoadCache()
+
+    if name not in metadata.tables:
+        sqlalchemy.Table(name, metadata, autoload_with=db.engine)
+        _SaveCache()
+
+    return metadata.tables[name]
+
+
+# Reflects every table in one go, e.g. to fill the cache, and forgets any cached copy first
+def Reflect():
+
+    global metadata, _cacheLoaded
+    metadata = sqlalchemy.MetaData()
+    _cacheLoaded = True
+    metadata.reflect(bind=db.engine, only=list(TABLE_NAMES))
+    _SaveCache()
+    return metadata
+
+
+# Tables are module attributes, e.g. schemas.players, but nothing is reflected until they are used
+def __getattr__(name):
+
+    if name in TABLE_NAMES:
+        return GetTable(name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,13 +1,13 @@
 import requests
 import json
+import time
 
-from enum import Enum
+from concurrent.futures import ThreadPoolExecutor
 from replay_utils import *
 
 
 import database as db
 import sqlalchemy
-from schemas import players, elo_rankings
 
 #Returns the top 50 users in a given group
 def GetTopEloUsersInGroup(gen, tier):
@@ -24,59 +24,89 @@ def GetTopEloUsersInGroup(gen, tier):
     else:
         print("Error: " + str(response.status_code))
 
-# Get puts the top 50 players of a given group into the database
-def PutTopPlayersIntoDatabase(gen, tier):
+# Fetches several ladders at once on one pooled session, returns [(gen, tier, toplist)]
+def GetTopEloUsersInGroups(ladders, maxWorkers=8):
 
-    data = GetTopEloUsersInGroup(gen, tier)
+    with requests.Session() as session:
 
-    # Insert players and associated elo into database.
-    # Not the most effecient, but sql alchemy was bugging out when I tried to do this in two queries
-    with db.engine.begin() as conn:
+        def Fetch(ladder):
+            gen, tier = ladder
+            response = session.get(ladderUrl + GetGenerationTierCombo(gen, tier) + ".json")
 
-        for entry in data:
+            if response.status_code == 200:
+                return (gen, tier, response.json()["toplist"][:50])      #Only return the top 50 players
 
-            # Must use sql alchemy.text to use ON CONFLICT
-            insertedPlayerId = conn.execute(
-                sqlalchemy.text(
-                    '''
-                    INSERT INTO players (username, userid)
-                    VALUES (:username, :userid)
-                    ON CONFLICT ( userid ) DO NOTHING
-                    RETURNING id
-                    '''
-                ),
-                {
-                    "username": entry["username"],
-                    "userid": entry["userid"]
-                }
-            ).all()
+            print("Error: " + str(response.status_code) + " for " + GetGenerationTierCombo(gen, tier))
+            return (gen, tier, [])
+
+        with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+            return list(executor.map(Fetch, ladders))
+
+# Upserts every player in one statement and returns their ids by userid
+def UpsertPlayers(conn, entries):
+
+    # ON CONFLICT DO UPDATE can't touch the same row twice in one statement, so dedupe first
+    usernames = {}
+    for entry in entries:
+        usernames[entry["userid"]] = entry["username"]
+
+    if not usernames:
+        return {}
 
-            # If player already exists, get their id 
-            if insertedPlayerId == []:  
+    # DO UPDATE rather than DO NOTHING so existing players come back in RETURNING too
+    result = conn.execute(
+        sqlalchemy.text(
+            '''
+            INSERT INTO players (username, userid)
+            SELECT * FROM unnest(CAST(:usernames AS text[]), CAST(:userids AS text[]))
+            ON CONFLICT ( userid ) DO UPDATE SET username = EXCLUDED.username
+            RETURNING id, userid
+            '''
+        ),
+        {
+            "usernames": list(usernames.values()),
+            "userids": list(usernames.keys())
+        }
+    )
 
-                insertedPlayerId = conn.execute(
-                    sqlalchemy
-                    .select(players.c.id)
-                    .where(players.c.userid == entry["userid"])   
-                ).all()[0][0]
+    return {row[1]: row[0] for row in result}
 
-            else:
-                insertedPlayerId = insertedPlayerId[0][0]
+# Puts the top 50 players of each (gen, tier) ladder into the database
+def PutTopPlayersIntoDatabase(ladders):
 
+    start = time.perf_counter()
+    toplists = GetTopEloUsersInGroups(ladders)
 
-            # Insert elo into database
+    # Two round trips however many ladders: one upsert for the players, one executemany for the elos
+    with db.engine.begin() as conn:
+
+        playerIds = UpsertPlayers(conn, [entry for _, _, data in toplists for entry in data])
+
+        eloRows = [
+            {
+                "player": playerIds[entry["userid"]],
+                "elo": entry["elo"],
+                "generation": Generation(gen).value,
+                "tier": Tier(tier).ToString(),
+            }
+            for gen, tier, data in toplists
+            for entry in data
+        ]
+
+        if eloRows:
             conn.execute(
-                sqlalchemy
-                .insert(elo_rankings)
-                .values(
-                    player = insertedPlayerId,
-                    elo = entry["elo"],
-                    generation = Generation(gen).value,
-                    tier = Tier(tier).ToString(),
-                )
+                sqlalchemy.text(
+                    '''
+                    INSERT INTO elo_rankings (player, elo, generation, tier)
+                    VALUES (:player, :elo, :generation, :tier)
+                    '''
+                ),
+                eloRows
             )
 
-            print("Inserted player: " + entry["username"] + " with elo: " + str(entry["elo"]))
+    print(f"Inserted {len(playerIds)} players with {len(eloRows)} elos from {len(ladders)} ladders "
+          f"in {time.perf_counter() - start:.1f}s")
+
 
-  
-PutTopPlayersIntoDatabase(Generation.VIII, Tier.OneVOne)
\ No newline at end of file
+if __name__ == "__main__":
+    PutTopPlayersIntoDatabase([(Generation.VIII, Tier.OneVOne)])
@@ -0,0 +1,359 @@
+import json
+from typing import Callable, NamedTuple
+
+TEAM_SIZE = 6
+
+BOOSTS = ('atk', 'def', 'spa', 'spd', 'spe', 'evasion', 'accuracy')
+SIDE_CONDITIONS = ('Stealth Rock', 'Spikes', 'Toxic Spikes', 'Sticky Web',
+                   'Reflect', 'Light Screen', 'Mist', 'Aurora Veil', 'Safeguard')
+
+_BOOST_INDEX = {boost: k for k, boost in enumerate(BOOSTS)}
+_CONDITION_INDEX = {condition: k for k, condition in enumerate(SIDE_CONDITIONS)}
+
+# Protocol weather ids to the names BattlefieldInfo uses
+WEATHER_NAMES = {
+    'SunnyDay': 'Sun',
+    'DesolateLand': 'Sun',
+    'RainDance': 'Rain',
+    'PrimordialSea': 'Rain',
+    'Sandstorm': 'Sandstorm',
+    'Snow': 'Snow',
+    'Hail': 'Snow',
+}
+
+TERRAIN_NAMES = {'Electric', 'Psychic', 'Misty', 'Grassy'}
+
+
+def _effect_name(effect: str) -> str:
+    """Strip the 'move: ' style prefix from a protocol effect."""
+    return effect.split(': ', 1)[1] if ': ' in effect else effect
+
+
+def _side_index(ident: str) -> int:
+    return 0 if ident.startswith('p1') else 1
+
+
+def parse_condition(condition: str) -> tuple[int, int, str]:
+    """Split a condition like '245/301 par' or '0 fnt' into hp, max hp and status."""
+    parts = condition.split()
+    hp = parts[0]
+    status = parts[1] if len(parts) > 1 else ''
+    if '/' not in hp:
+        return int(hp), 0, status
+    current, total = hp.split('/')
+    return int(current), int(total), status
+
+
+class SideSnapshot(NamedTuple):
+    """One side's per-slot species and hp, boosts and side conditions, frozen."""
+    species: tuple[str, ...]
+    hp: tuple[int, ...]
+    boosts: tuple[int, ...]
+    conditions: tuple[int, ...]
+
+
+class TurnSnapshot(NamedTuple):
+    """The state a turn started from, cheap to take since it only copies flat tuples."""
+    sides: tuple[SideSnapshot, SideSnapshot]
+    weather: str | None
+    terrain: str | None
+    turn: int
+
+
+class SideState:
+    """One player's team as parallel per-slot arrays, slot 0 is the active pokemon.
+
+    species holds the team preview names and never changes, so a pokemon is found by name
+    through _slots in O(1). formes holds what the pokemon currently shows as.
+    """
+
+    __slots__ = ('species', 'formes', 'nicknames', 'genders', 'hp', 'max_hp', 'statuses', 'items', 'abilities',
+                 'boosts', 'conditions', 'volatiles', '_slots')
+
+    def __init__(self) -> None:
+        self.species: list[str] = []
+        self.formes: list[str] = []
+        self.nicknames: list[str | None] = []
+        self.genders: list[str | None] = []
+        self.hp: list[int] = []
+        self.max_hp: list[int] = []
+        self.statuses: list[str] = []
+        self.items: list[str | None] = []
+        self.abilities: list[str | None] = []
+        self.boosts = [0] * len(BOOSTS)
+        self.conditions = [0] * len(SIDE_CONDITIONS)
+        self.volatiles: set[str] = set()
+        self._slots: dict[str, int] = {}
+
+    def add(self, species: str) -> int:
+        """Add a pokemon to the next free slot and return the slot."""
+        slot = len(self.species)
+        self.species.append(species)
+        self.formes.append(species)
+        self.nicknames.append(None)
+        self.genders.append(None)
+        self.hp.append(100)
+        self.max_hp.append(100)
+        self.statuses.append('')
+        self.items.append(None)
+        self.abilities.append(None)
+        self._slots.setdefault(species, slot)
+        return slot
+
+    def find(self, species: str) -> int | None:
+        """Return the slot of a species, matching a forme like Urshifu-Rapid-Strike to Urshifu."""
+        slot = self._slots.get(species)
+        name = species
+        while slot is None and '-' in name:
+            name = name.rsplit('-', 1)[0]
+            slot = self._slots.get(name)
+        return slot
+
+    def snapshot(self) -> SideSnapshot:
+        return SideSnapshot(tuple(self.species), tuple(self.hp), tuple(self.boosts), tuple(self.conditions))
+
+    def swap(self, slot: int) -> None:
+        """Bring the pokemon in slot to the front."""
+        if slot == 0:
+            return
+        for values in (self.species, self.formes, self.nicknames, self.genders, self.hp, self.max_hp, self.statuses,
+                       self.items, self.abilities):
+            values[0], values[slot] = values[slot], values[0]
+        self._slots[self.species[0]] = 0
+        self._slots[self.species[slot]] = slot
+
+
+class BattleState:
+    """Battle state advanced one protocol line at a time through a dispatch table.
+
+    on_action(state, side, move, switch) is called for every player decision before it
+    changes the state, with the move's name or, for a switch, the incoming species.
+    """
+
+    __slots__ = ('sides', 'weather', 'terrain', 'turn', 'request', 'winner', 'on_action')
+
+    def __init__(self, on_action: Callable[['BattleState', int, str | None, str | None], None] | None = None) -> None:
+        self.sides = (SideState(), SideState())
+        self.weather: str | None = None
+        self.terrain: str | None = None
+        self.turn = 0
+        self.request: dict | None = None
+        self.winner: str | None = None
+        self.on_action = on_action
+
+    def apply(self, line: str) -> str | None:
+        """Apply one protocol line and return its command if it changed anything."""
+        blocks = line.split('|')
+        if len(blocks) < 2:
+            return None
+        handler = _HANDLERS.get(blocks[1])
+        if handler is None:
+            return None
+        handler(self, blocks)
+        return blocks[1]
+
+    def snapshot(self) -> TurnSnapshot:
+        """Freeze the parts of the state a training row is built from."""
+        first, second = self.sides
+        return TurnSnapshot((first.snapshot(), second.snapshot()), self.weather, self.terrain, self.turn)
+
+    def apply_lines(self, lines) -> None:
+        """Apply lines until the battle ends."""
+        for line in lines:
+            if self.apply(line) == 'win':
+                break
+
+    def _poke(self, blocks: list[str]) -> None:
+        self.sides[_side_index(blocks[2])].add(blocks[3].split(',')[0].split('-*')[0])
+
+    def _switch_in(self, blocks: list[str], decision: bool) -> None:
+        i = _side_index(blocks[2])
+        side = self.sides[i]
+        details = [part.strip() for part in blocks[3].split(',')]
+        slot = side.find(details[0])
+        if slot is None:
+            if len(side.species) >= TEAM_SIZE:
+                raise KeyError(f'{details[0]} is not on side p{i + 1}')
+            # no team preview in this format, the team is revealed one switch at a time
+            slot = side.add(details[0])
+        if decision and self.on_action is not None:
+            self.on_action(self, i, None, side.species[slot])
+        side.swap(slot)
+        side.formes[0] = details[0]
+        side.nicknames[0] = blocks[2].split(': ', 1)[1] if ': ' in blocks[2] else details[0]
+        side.genders[0] = next((part for part in details[1:] if part in {'M', 'F'}), None)
+        if len(blocks) > 4 and blocks[4]:
+            side.hp[0], side.max_hp[0], side.statuses[0] = parse_condition(blocks[4])
+        # boosts and volatiles are lost on switching out, the major status stays with the pokemon
+        side.boosts[:] = [0] * len(BOOSTS)
+        side.volatiles.clear()
+
+    def _switch(self, blocks: list[str]) -> None:
+        self._switch_in(blocks, True)
+
+    def _drag(self, blocks: list[str]) -> None:
+        self._switch_in(blocks, False)
+
+    def _detailschange(self, blocks: list[str]) -> None:
+        self.sides[_side_index(blocks[2])].formes[0] = blocks[3].split(',')[0]
+
+    def _move(self, blocks: list[str]) -> None:
+        if self.on_action is not None:
+            self.on_action(self, _side_index(blocks[2]), blocks[3], None)
+
+    def _hp(self, blocks: list[str]) -> None:
+        side = self.sides[_side_index(blocks[2])]
+        if side.species:
+            hp, max_hp, status = parse_condition(blocks[3])
+            side.hp[0] = hp
+            if max_hp:
+                side.max_hp[0] = max_hp
+            if status == 'fnt':
+                side.statuses[0] = 'fnt'
+
+    def _faint(self, blocks: list[str]) -> None:
+        side = self.sides[_side_index(blocks[2])]
+        if side.species:
+            side.hp[0] = 0
+            side.statuses[0] = 'fnt'
+
+    def _status(self, blocks: list[str]) -> None:
+        side = self.sides[_side_index(blocks[2])]
+        if side.species:
+            side.statuses[0] = blocks[3]
+
+    def _curestatus(self, blocks: list[str]) -> None:
+        side = self.sides[_side_index(blocks[2])]
+        nickname = blocks[2].split(': ', 1)[1] if ': ' in blocks[2] else None
+        # cures from the bench (Heal Bell, Natural Cure) name a pokemon that isn't active
+        for slot, slot_nickname in enumerate(side.nicknames):
+            if slot_nickname == nickname:
+                side.statuses[slot] = ''
+                return
+        if side.species:
+            side.statuses[0] = ''
+
+    def _boost(self, blocks: list[str]) -> None:
+        k = _BOOST_INDEX.get(blocks[3])
+        if k is not None:
+            change = int(blocks[4]) if blocks[1] == '-boost' else -int(blocks[4])
+            self.sides[_side_index(blocks[2])].boosts[k] += change
+
+    def _setboost(self, blocks: list[str]) -> None:
+        k = _BOOST_INDEX.get(blocks[3])
+        if k is not None:
+            self.sides[_side_index(blocks[2])].boosts[k] = int(blocks[4])
+
+    def _clearboost(self, blocks: list[str]) -> None:
+        self.sides[_side_index(blocks[2])].boosts[:] = [0] * len(BOOSTS)
+
+    def _clearallboost(self, blocks: list[str]) -> None:
+        for side in self.sides:
+            side.boosts[:] = [0] * len(BOOSTS)
+
+    def _clearnegativeboost(self, blocks: list[str]) -> None:
+        boosts = self.sides[_side_index(blocks[2])].boosts
+        boosts[:] = [max(boost, 0) for boost in boosts]
+
+    def _volatile_start(self, blocks: list[str]) -> None:
+        self.sides[_side_index(blocks[2])].volatiles.add(_effect_name(blocks[3]))
+
+    def _volatile_end(self, blocks: list[str]) -> None:
+        self.sides[_side_index(blocks[2])].volatiles.discard(_effect_name(blocks[3]))
+
+    def _item(self, blocks: list[str]) -> None:
+        side = self.sides[_side_index(blocks[2])]
+        if side.species:
+            side.items[0] = blocks[3]
+
+    def _enditem(self, blocks: list[str]) -> None:
+        side = self.sides[_side_index(blocks[2])]
+        if side.species:
+            side.items[0] = None
+
+    def _ability(self, blocks: list[str]) -> None:
+        side = self.sides[_side_index(blocks[2])]
+        if side.species:
+            side.abilities[0] = blocks[3]
+
+    def _weather(self, blocks: list[str]) -> None:
+        self.weather = WEATHER_NAMES.get(blocks[2])
+
+    def _fieldstart(self, blocks: list[str]) -> None:
+        name = _effect_name(blocks[2]).split(' ')[0]
+        if name in TERRAIN_NAMES:
+            self.terrain = name
+
+    def _fieldend(self, blocks: list[str]) -> None:
+        if _effect_name(blocks[2]).split(' ')[0] in TERRAIN_NAMES:
+            self.terrain = None
+
+    def _sidestart(self, blocks: list[str]) -> None:
+        k = _CONDITION_INDEX.get(_effect_name(blocks[3]))
+        if k is not None:
+            self.sides[_side_index(blocks[2])].conditions[k] += 1
+
+    def _sideend(self, blocks: list[str]) -> None:
+        k = _CONDITION_INDEX.get(_effect_name(blocks[3]))
+        if k is not None:
+            self.sides[_side_index(blocks[2])].conditions[k] = 0
+
+    def _swapsideconditions(self, blocks: list[str]) -> None:
+        first, second = self.sides
+        first.conditions, second.conditions = second.conditions, first.conditions
+
+    def _turn(self, blocks: list[str]) -> None:
+        self.turn = int(blocks[2])
+        # Endure and Protect only last the turn they were used
+        for side in self.sides:
+            side.volatiles.discard('Endure')
+            side.volatiles.discard('Protect')
+
+    def _upkeep(self, blocks: list[str]) -> None:
+        pass
+
+    def _request(self, blocks: list[str]) -> None:
+        # the json can itself contain '|', so take the rest of the line
+        payload = '|'.join(blocks[2:])
+        if payload:
+            self.request = json.loads(payload)
+
+    def _win(self, blocks: list[str]) -> None:
+        self.winner = blocks[2] if len(blocks) > 2 else None
+
+
+_HANDLERS: dict[str, Callable[[BattleState, list[str]], None]] = {
+    'poke': BattleState._poke,
+    'switch': BattleState._switch,
+    'drag': BattleState._drag,
+    'detailschange': BattleState._detailschange,
+    'move': BattleState._move,
+    '-damage': BattleState._hp,
+    '-heal': BattleState._hp,
+    '-sethp': BattleState._hp,
+    'faint': BattleState._faint,
+    '-status': BattleState._status,
+    '-curestatus': BattleState._curestatus,
+    '-boost': BattleState._boost,
+    '-unboost': BattleState._boost,
+    '-setboost': BattleState._setboost,
+    '-clearboost': BattleState._clearboost,
+    '-clearallboost': BattleState._clearallboost,
+    '-clearnegativeboost': BattleState._clearnegativeboost,
+    '-start': BattleState._volatile_start,
+    '-end': BattleState._volatile_end,
+    '-singleturn': BattleState._volatile_start,
+    '-item': BattleState._item,
+    '-enditem': BattleState._enditem,
+    '-ability': BattleState._ability,
+    '-weather': BattleState._weather,
+    '-fieldstart': BattleState._fieldstart,
+    '-fieldend': BattleState._fieldend,
+    '-sidestart': BattleState._sidestart,
+    '-sideend': BattleState._sideend,
+    '-swapsideconditions': BattleState._swapsideconditions,
+    'turn': BattleState._turn,
+    'upkeep': BattleState._upkeep,
+    'request': BattleState._request,
+    'win': BattleState._win,
+}
@@ -0,0 +1,234 @@
+from typing import Callable
+
+from .driver import WebDriver, PokemonInfo, StartingPokemonInfo, MoveInfo, ModifierInfo, BattlefieldInfo
+from .battle_state import BOOSTS, SIDE_CONDITIONS, BattleState, SideState, parse_condition
+
+
+# Wraps the client's socket handler so every message is also queued for us. Messages that
+# arrived before the hook are picked up from the open battle's step queue.
+_INSTALL_SCRIPT = '''
+if (!window.app) return [];
+if (!window.__pbai_hooked) {
+    window.__pbai = [];
+    var receive = app.receive;
+    app.receive = function (data) {
+        window.__pbai.push(data);
+        return receive.apply(this, arguments);
+    };
+    window.__pbai_hooked = true;
+}
+// the step queue below has everything queued so far, so a reinstall mustn't apply it twice
+window.__pbai = [];
+var room = app.curRoom;
+if (!room || !room.battle) return [];
+var lines = room.battle.stepQueue ? room.battle.stepQueue.slice() : [];
+if (room.request) lines.push('|request|' + JSON.stringify(room.request));
+return ['>' + room.id + '\\n' + lines.join('\\n')];
+'''
+
+_DRAIN_SCRIPT = '''
+var queue = window.__pbai || [];
+window.__pbai = [];
+return queue;
+'''
+
+_HAZARDS = ('Stealth Rock', 'Spikes', 'Toxic Spikes', 'Sticky Web')
+
+
+def _hp_percent(hp: int, max_hp: int) -> float:
+    return round(hp / max_hp * 100, 1) if max_hp else 0.0
+
+
+class LiveBattle:
+    """The GUI's views of a BattleState that the watcher feeds one line at a time."""
+
+    def __init__(self) -> None:
+        self.state = BattleState()
+
+    def apply(self, line: str) -> str | None:
+        return self.state.apply(line)
+
+    @property
+    def request(self) -> dict | None:
+        return self.state.request
+
+    @property
+    def turn(self) -> int:
+        return self.state.turn
+
+    @property
+    def my_side(self) -> int:
+        request = self.state.request
+        if request is not None and 'side' in request:
+            return 0 if request['side']['id'] == 'p1' else 1
+        return 0
+
+    @property
+    def enemy_side(self) -> int:
+        return 1 - self.my_side
+
+    def my_team(self) -> list[StartingPokemonInfo]:
+        """The player's team as the last |request| described it."""
+        request = self.state.request
+        if request is None or 'side' not in request:
+            return []
+        team: list[StartingPokemonInfo] = []
+        for pokemon in request['side']['pokemon']:
+            details = [part.strip() for part in pokemon['details'].split(',')]
+            nickname = pokemon['ident'].split(': ', 1)[1]
+            hp, max_hp, _ = parse_condition(pokemon['condition'])
+            stats = pokemon['stats']
+            team.append(StartingPokemonInfo(
+                name=details[0],
+                nickname=nickname if nickname != details[0] else None,
+                types=[],
+                tera_type=pokemon.get('teraType', ''),
+                gender=next((part for part in details[1:] if part in {'M', 'F'}), None),
+                hp_percent=_hp_percent(hp, max_hp),
+                total_hp=max_hp,
+                ability=pokemon.get('ability') or pokemon.get('baseAbility') or 'None',
+                item=pokemon.get('item') or 'None',
+                atk=stats['atk'],
+                def_=stats['def'],
+                spa=stats['spa'],
+                spd=stats['spd'],
+                spe=stats['spe'],
+                moves=pokemon['moves'],
+            ))
+        return team
+
+    def enemy_team(self) -> list[PokemonInfo]:
+        """The opponent's pokemon known so far, from team preview or switches."""
+        side = self.state.sides[self.enemy_side]
+        team: list[PokemonInfo] = []
+        for slot in range(len(side.species)):
+            forme = side.formes[slot]
+            nickname = side.nicknames[slot]
+            team.append(PokemonInfo(
+                name=forme,
+                nickname=nickname if nickname is not None and nickname != forme else None,
+                gender=side.genders[slot],
+                hp_percent=_hp_percent(side.hp[slot], side.max_hp[slot]),
+                item=side.items[slot],
+                abilities=[side.abilities[slot]] if side.abilities[slot] else [],
+                speed=(0, 0),
+            ))
+        return team
+
+    def moves(self) -> list[MoveInfo]:
+        """The moves the last |request| offers, empty when it asks for a switch or a wait."""
+        request = self.state.request
+        if request is None or not request.get('active'):
+            return []
+        return [MoveInfo(move['move'], '', move.get('pp', 0)) for move in request['active'][0]['moves']]
+
+    def _modifier(self, side: SideState) -> ModifierInfo | None:
+        if not side.species or side.nicknames[0] is None:
+            return None
+        boosts = dict(zip(BOOSTS, side.boosts))
+        volatiles = side.volatiles
+        status = side.statuses[0]
+        return ModifierInfo(
+            pokemon=side.nicknames[0],
+            atk=boosts['atk'],
+            def_=boosts['def'],
+            spa=boosts['spa'],
+            spd=boosts['spd'],
+            spe=boosts['spe'],
+            evasion=boosts['evasion'],
+            accuracy=boosts['accuracy'],
+            confused='confusion' in volatiles,
+            paralyzed=status == 'par',
+            aqua_ring='Aqua Ring' in volatiles,
+            taunt='Taunt' in volatiles,
+            frozen=status == 'frz',
+            toxic=status == 'tox',
+            endure='Endure' in volatiles,
+            poison=status == 'psn',
+        )
+
+    def my_status(self) -> ModifierInfo | None:
+        return self._modifier(self.state.sides[self.my_side])
+
+    def enemy_status(self) -> ModifierInfo | None:
+        return self._modifier(self.state.sides[self.enemy_side])
+
+    def _conditions(self, side: SideState) -> tuple[list[str], list[str]]:
+        hazards: list[str] = []
+        other: list[str] = []
+        for name, count in zip(SIDE_CONDITIONS, side.conditions):
+            if count:
+                if name in _HAZARDS:
+                    hazards.extend([name] * count)
+                else:
+                    other.append(name)
+        return hazards, other
+
+    def battlefield(self) -> BattlefieldInfo:
+        my_hazards, my_other = self._conditions(self.state.sides[self.my_side])
+        enemy_hazards, enemy_other = self._conditions(self.state.sides[self.enemy_side])
+        return BattlefieldInfo(
+            weather=self.state.weather,
+            terrain=self.state.terrain,
+            my_other=my_other,
+            enemy_other=enemy_other,
+            my_hazards=my_hazards,
+            enemy_hazards=enemy_hazards,
+        )
+
+
+class BattleWatcher:
+    """Follows the protocol stream of the open battle by draining a queue hooked into the page.
+
+    poll() costs one execute_script call however many messages arrived since the last one.
+    on_request is called with the battle after any |request| that needs a decision.
+    """
+
+    driver: WebDriver
+    battle: LiveBattle | None
+    room_id: str | None
+
+    def __init__(self, driver: WebDriver, on_request: Callable[[LiveBattle], None] | None = None) -> None:
+        self.driver = driver
+        self.on_request = on_request
+        self.battle = None
+        self.room_id = None
+        self.lines_applied = 0
+
+    def install(self) -> None:
+        """Hook the page and replay the open battle's log so far into a fresh battle."""
+        self.battle = None
+        self.room_id = None
+        self._receive(self.driver.execute_script(_INSTALL_SCRIPT) or [])
+
+    def poll(self) -> bool:
+        """Apply everything queued since the last poll, return whether the battle changed."""
+        return self._receive(self.driver.execute_script(_DRAIN_SCRIPT) or [])
+
+    def _receive(self, messages: list[str]) -> bool:
+        changed = False
+        decision = False
+        for message in messages:
+            lines = message.split('\n')
+            room_id = ''
+            if lines[0].startswith('>'):
+                room_id = lines[0][1:]
+                lines = lines[1:]
+            if not room_id.startswith('battle-'):
+                continue
+            if room_id != self.room_id:
+                # a different battle starts from a clean state
+                self.room_id = room_id
+                self.battle = LiveBattle()
+            for line in lines:
+                command = self.battle.apply(line)
+                if command is None:
+                    continue
+                changed = True
+                self.lines_applied += 1
+                if command == 'request':
+                    request = self.battle.request
+                    decision = request is not None and not request.get('wait')
+        if decision and self.on_request is not None:
+            self.on_request(self.battle)
+        return changed
@@ -1,5 +1,7 @@
 from dataclasses import dataclass
 
+import numpy as np
+
 from .driver import PokemonInfo, MoveInfo, ModifierInfo, StartingPokemonInfo, BattlefieldInfo
 
 @dataclass
@@ -80,184 +82,184 @@ def load_pokemon_table(filename: str) -> dict[str, SerializedPokemonInfo]:
             )
     return pokemon_table
 
-def serialize_data(
-    pokemon_table: dict[str, SerializedPokemonInfo],
-    player_pokemon: StartingPokemonInfo,
-    player_bench: list[StartingPokemonInfo],
-    player_status: ModifierInfo,
-    enemy_pokemon: PokemonInfo,
-    enemy_bench: list[PokemonInfo],
-    enemy_status: ModifierInfo,
-    battlefield: BattlefieldInfo,
-) -> dict[str, int | float]:
-    player_pokemon_conv = pokemon_table[player_pokemon.name]
-    player_bench_conv = [pokemon_table[pokemon.name] for pokemon in player_bench]
-    enemy_pokemon_conv = pokemon_table[enemy_pokemon.name]
-    enemy_bench_conv = [pokemon_table[pokemon.name] for pokemon in enemy_bench]
-    return {
-        # player pokemon info
-        'PlayerPkmnOnField': player_pokemon_conv.id,
-        'PlayerPkmnHealth': player_pokemon.hp_percent,
-        'PlayerBench1': player_bench_conv[0].id if len(player_bench_conv) > 0 else 0,
-        'PlayerBenchOneHp': player_bench[0].hp_percent if len(player_bench) > 0 else 0,
-        'PlayerBench2': player_bench_conv[1].id if len(player_bench_conv) > 1 else 0,
-        'PlayerBenchTwoHp': player_bench[1].hp_percent if len(player_bench) > 1 else 0,
-        'PlayerBench3': player_bench_conv[2].id if len(player_bench_conv) > 2 else 0,
-        'PlayerBenchThreeHp': player_bench[2].hp_percent if len(player_bench) > 2 else 0,
-        'PlayerBench4': player_bench_conv[3].id if len(player_bench_conv) > 3 else 0,
-        'PlayerBenchFourHp': player_bench[3].hp_percent if len(player_bench) > 3 else 0,
-        'PlayerBench5': player_bench_conv[4].id if len(player_bench_conv) > 4 else 0,
-        'PlayerBenchFiveHp': player_bench[4].hp_percent if len(player_bench) > 4 else 0,
-        'PlayerBoostAtk': player_status.atk,
-        'PlayerBoostDef': player_status.def_,
-        'PlayerBoostSpa': player_status.spa,
-        'PlayerBoostSpd': player_status.spd,
-        'PlayerBoostSpe': player_status.spe,
-        'PlayerBoostEva': player_status.evasion,
-        'PlayerBoostAcc': player_status.accuracy,
-
-        # enemy pokemon info
-        'EnemyPkmnOnField': enemy_pokemon_conv.id,
-        'EnemyPkmnHealth': enemy_pokemon.hp_percent,
-        'EnemyBench1': enemy_bench_conv[0].id if len(enemy_bench_conv) > 0 else 0,
-        'EnemyBenchOneHp': enemy_bench[0].hp_percent if len(enemy_bench) > 0 else 0,
-        'EnemyBench2': enemy_bench_conv[1].id if len(enemy_bench_conv) > 1 else 0,
-        'EnemyBenchTwoHp': enemy_bench[1].hp_percent if len(enemy_bench) > 1 else 0,
-        'EnemyBench3': enemy_bench_conv[2].id if len(enemy_bench_conv) > 2 else 0,
-        'EnemyBenchThreeHp': enemy_bench[2].hp_percent if len(enemy_bench) > 2 else 0,
-        'EnemyBench4': enemy_bench_conv[3].id if len(enemy_bench_conv) > 3 else 0,
-        'EnemyBenchFourHp': enemy_bench[3].hp_percent if len(enemy_bench) > 3 else 0,
-        'EnemyBench5': enemy_bench_conv[4].id if len(enemy_bench_conv) > 4 else 0,
-        'EnemyBenchFiveHp': enemy_bench[4].hp_percent if len(enemy_bench) > 4 else 0,
-        'EnemyBoostAtk': enemy_status.atk,
-        'EnemyBoostDef': enemy_status.def_,
-        'EnemyBoostSpa': enemy_status.spa,
-        'EnemyBoostSpd': enemy_status.spd,
-        'EnemyBoostSpe': enemy_status.spe,
-        'EnemyBoostEva': enemy_status.evasion,
-        'EnemyBoostAcc': enemy_status.accuracy,
-
-        # battlefield status
-        'Weather': convert_weather_from_name(battlefield.weather),
-        'Terrain': convert_terrain_from_name(battlefield.terrain),
-        'PlayerStealthRock': battlefield.my_hazards.count('Stealth Rock'),
-        'PlayerSpikes': battlefield.my_hazards.count('Spikes'),
-        'PlayerToxicSpikes': battlefield.my_hazards.count('Toxic Spikes'),
-        'PlayerStickyWeb': battlefield.my_hazards.count('Sticky Web'),
-        'PlayerReflect': battlefield.my_other.count('Reflect'),
-        'PlayerLightScreen': battlefield.my_other.count('Light Screen'),
-        'PlayerMist': battlefield.my_other.count('Mist'),
-        'PlayerAuroraVeil': battlefield.my_other.count('Aurora Veil'),
-        'PlayerSafeguard': battlefield.my_other.count('Safeguard'),
-        'EnemyStealthRock': battlefield.enemy_hazards.count('Stealth Rock'),
-        'EnemySpikes': battlefield.enemy_hazards.count('Spikes'),
-        'EnemyToxicSpikes': battlefield.enemy_hazards.count('Toxic Spikes'),
-        'EnemyStickyWeb': battlefield.enemy_hazards.count('Sticky Web'),
-        'EnemyReflect': battlefield.enemy_other.count('Reflect'),
-        'EnemyLightScreen': battlefield.enemy_other.count('Light Screen'),
-        'EnemyMist': battlefield.enemy_other.count('Mist'),
-        'EnemyAuroraVeil': battlefield.enemy_other.count('Aurora Veil'),
-        'EnemySafeguard': battlefield.enemy_other.count('Safeguard'),
-
-        # on-field information
-        'PlayerPkmnOnField_Type 1': player_pokemon_conv.type1,
-        'PlayerPkmnOnField_Type 2': player_pokemon_conv.type2,
-        'PlayerPkmnOnField_HP': player_pokemon_conv.hp,
-        'PlayerPkmnOnField_Atk': player_pokemon_conv.atk,
-        'PlayerPkmnOnField_Def': player_pokemon_conv.def_,
-        'PlayerPkmnOnField_SpA': player_pokemon_conv.spa,
-        'PlayerPkmnOnField_SpD': player_pokemon_conv.spd,
-        'PlayerPkmnOnField_Spe': player_pokemon_conv.spe,
-        'EnemyPkmnOnField_Type 1': enemy_pokemon_conv.type1,
-        'EnemyPkmnOnField_Type 2': enemy_pokemon_conv.type2,
-        'EnemyPkmnOnField_HP': enemy_pokemon_conv.hp,
-        'EnemyPkmnOnField_Atk': enemy_pokemon_conv.atk,
-        'EnemyPkmnOnField_Def': enemy_pokemon_conv.def_,
-        'EnemyPkmnOnField_SpA': enemy_pokemon_conv.spa,
-        'EnemyPkmnOnField_SpD': enemy_pokemon_conv.spd,
-        'EnemyPkmnOnField_Spe': enemy_pokemon_conv.spe,
-
-        # player bench information
-        'PlayerBench1_Type 1': player_bench_conv[0].type1 if len(player_bench_conv) > 0 else 0,
-        'PlayerBench1_Type 2': player_bench_conv[0].type2 if len(player_bench_conv) > 0 else 0,
-        'PlayerBench1_HP': player_bench_conv[0].hp if len(player_bench_conv) > 0 else 0,
-        'PlayerBench1_Atk': player_bench_conv[0].atk if len(player_bench_conv) > 0 else 0,
-        'PlayerBench1_Def': player_bench_conv[0].def_ if len(player_bench_conv) > 0 else 0,
-        'PlayerBench1_SpA': player_bench_conv[0].spa if len(player_bench_conv) > 0 else 0,
-        'PlayerBench1_SpD': player_bench_conv[0].spd if len(player_bench_conv) > 0 else 0,
-        'PlayerBench1_Spe': player_bench_conv[0].spe if len(player_bench_conv) > 0 else 0,
-        'PlayerBench2_Type 1': player_bench_conv[1].type1 if len(player_bench_conv) > 1 else 0,
-        'PlayerBench2_Type 2': player_bench_conv[1].type2 if len(player_bench_conv) > 1 else 0,
-        'PlayerBench2_HP': player_bench_conv[1].hp if len(player_bench_conv) > 1 else 0,
-        'PlayerBench2_Atk': player_bench_conv[1].atk if len(player_bench_conv) > 1 else 0,
-        'PlayerBench2_Def': player_bench_conv[1].def_ if len(player_bench_conv) > 1 else 0,
-        'PlayerBench2_SpA': player_bench_conv[1].spa if len(player_bench_conv) > 1 else 0,
-        'PlayerBench2_SpD': player_bench_conv[1].spd if len(player_bench_conv) > 1 else 0,
-        'PlayerBench2_Spe': player_bench_conv[1].spe if len(player_bench_conv) > 1 else 0,
-        'PlayerBench3_Type 1': player_bench_conv[2].type1 if len(player_bench_conv) > 2 else 0,
-        'PlayerBench3_Type 2': player_bench_conv[2].type2 if len(player_bench_conv) > 2 else 0,
-        'PlayerBench3_HP': player_bench_conv[2].hp if len(player_bench_conv) > 2 else 0,
-        'PlayerBench3_Atk': player_bench_conv[2].atk if len(player_bench_conv) > 2 else 0,
-        'PlayerBench3_Def': player_bench_conv[2].def_ if len(player_bench_conv) > 2 else 0,
-        'PlayerBench3_SpA': player_bench_conv[2].spa if len(player_bench_conv) > 2 else 0,
-        'PlayerBench3_SpD': player_bench_conv[2].spd if len(player_bench_conv) > 2 else 0,
-        'PlayerBench3_Spe': player_bench_conv[2].spe if len(player_bench_conv) > 2 else 0,
-        'PlayerBench4_Type 1': player_bench_conv[3].type1 if len(player_bench_conv) > 3 else 0,
-        'PlayerBench4_Type 2': player_bench_conv[3].type2 if len(player_bench_conv) > 3 else 0,
-        'PlayerBench4_HP': player_bench_conv[3].hp if len(player_bench_conv) > 3 else 0,
-        'PlayerBench4_Atk': player_bench_conv[3].atk if len(player_bench_conv) > 3 else 0,
-        'PlayerBench4_Def': player_bench_conv[3].def_ if len(player_bench_conv) > 3 else 0,
-        'PlayerBench4_SpA': player_bench_conv[3].spa if len(player_bench_conv) > 3 else 0,
-        'PlayerBench4_SpD': player_bench_conv[3].spd if len(player_bench_conv) > 3 else 0,
-        'PlayerBench4_Spe': player_bench_conv[3].spe if len(player_bench_conv) > 3 else 0,
-        'PlayerBench5_Type 1': player_bench_conv[4].type1 if len(player_bench_conv) > 4 else 0,
-        'PlayerBench5_Type 2': player_bench_conv[4].type2 if len(player_bench_conv) > 4 else 0,
-        'PlayerBench5_HP': player_bench_conv[4].hp if len(player_bench_conv) > 4 else 0,
-        'PlayerBench5_Atk': player_bench_conv[4].atk if len(player_bench_conv) > 4 else 0,
-        'PlayerBench5_Def': player_bench_conv[4].def_ if len(player_bench_conv) > 4 else 0,
-        'PlayerBench5_SpA': player_bench_conv[4].spa if len(player_bench_conv) > 4 else 0,
-        'PlayerBench5_SpD': player_bench_conv[4].spd if len(player_bench_conv) > 4 else 0,
-        'PlayerBench5_Spe': player_bench_conv[4].spe if len(player_bench_conv) > 4 else 0,
-        
-        # enemy bench information
-        'EnemyBench1_Type 1': enemy_bench_conv[0].type1 if len(enemy_bench_conv) > 0 else 0,
-        'EnemyBench1_Type 2': enemy_bench_conv[0].type2 if len(enemy_bench_conv) > 0 else 0,
-        'EnemyBench1_HP': enemy_bench_conv[0].hp if len(enemy_bench_conv) > 0 else 0,
-        'EnemyBench1_Atk': enemy_bench_conv[0].atk if len(enemy_bench_conv) > 0 else 0,
-        'EnemyBench1_Def': enemy_bench_conv[0].def_ if len(enemy_bench_conv) > 0 else 0,
-        'EnemyBench1_SpA': enemy_bench_conv[0].spa if len(enemy_bench_conv) > 0 else 0,
-        'EnemyBench1_SpD': enemy_bench_conv[0].spd if len(enemy_bench_conv) > 0 else 0,
-        'EnemyBench1_Spe': enemy_bench_conv[0].spe if len(enemy_bench_conv) > 0 else 0,
-        'EnemyBench2_Type 1': enemy_bench_conv[1].type1 if len(enemy_bench_conv) > 1 else 0,
-        'EnemyBench2_Type 2': enemy_bench_conv[1].type2 if len(enemy_bench_conv) > 1 else 0,
-        'EnemyBench2_HP': enemy_bench_conv[1].hp if len(enemy_bench_conv) > 1 else 0,
-        'EnemyBench2_Atk': enemy_bench_conv[1].atk if len(enemy_bench_conv) > 1 else 0,
-        'EnemyBench2_Def': enemy_bench_conv[1].def_ if len(enemy_bench_conv) > 1 else 0,
-        'EnemyBench2_SpA': enemy_bench_conv[1].spa if len(enemy_bench_conv) > 1 else 0,
-        'EnemyBench2_SpD': enemy_bench_conv[1].spd if len(enemy_bench_conv) > 1 else 0,
-        'EnemyBench2_Spe': enemy_bench_conv[1].spe if len(enemy_bench_conv) > 1 else 0,
-        'EnemyBench3_Type 1': enemy_bench_conv[2].type1 if len(enemy_bench_conv) > 2 else 0,
-        'EnemyBench3_Type 2': enemy_bench_conv[2].type2 if len(enemy_bench_conv) > 2 else 0,
-        'EnemyBench3_HP': enemy_bench_conv[2].hp if len(enemy_bench_conv) > 2 else 0,
-        'EnemyBench3_Atk': enemy_bench_conv[2].atk if len(enemy_bench_conv) > 2 else 0,
-        'EnemyBench3_Def': enemy_bench_conv[2].def_ if len(enemy_bench_conv) > 2 else 0,
-        'EnemyBench3_SpA': enemy_bench_conv[2].spa if len(enemy_bench_conv) > 2 else 0,
-        'EnemyBench3_SpD': enemy_bench_conv[2].spd if len(enemy_bench_conv) > 2 else 0,
-        'EnemyBench3_Spe': enemy_bench_conv[2].spe if len(enemy_bench_conv) > 2 else 0,
-        'EnemyBench4_Type 1': enemy_bench_conv[3].type1 if len(enemy_bench_conv) > 3 else 0,
-        'EnemyBench4_Type 2': enemy_bench_conv[3].type2 if len(enemy_bench_conv) > 3 else 0,
-        'EnemyBench4_HP': enemy_bench_conv[3].hp if len(enemy_bench_conv) > 3 else 0,
-        'EnemyBench4_Atk': enemy_bench_conv[3].atk if len(enemy_bench_conv) > 3 else 0,
-        'EnemyBench4_Def': enemy_bench_conv[3].def_ if len(enemy_bench_conv) > 3 else 0,
-        'EnemyBench4_SpA': enemy_bench_conv[3].spa if len(enemy_bench_conv) > 3 else 0,
-        'EnemyBench4_SpD': enemy_bench_conv[3].spd if len(enemy_bench_conv) > 3 else 0,
-        'EnemyBench4_Spe': enemy_bench_conv[3].spe if len(enemy_bench_conv) > 3 else 0,
-        'EnemyBench5_Type 1': enemy_bench_conv[4].type1 if len(enemy_bench_conv) > 4 else 0,
-        'EnemyBench5_Type 2': enemy_bench_conv[4].type2 if len(enemy_bench_conv) > 4 else 0,
-        'EnemyBench5_HP': enemy_bench_conv[4].hp if len(enemy_bench_conv) > 4 else 0,
-        'EnemyBench5_Atk': enemy_bench_conv[4].atk if len(enemy_bench_conv) > 4 else 0,
-        'EnemyBench5_Def': enemy_bench_conv[4].def_ if len(enemy_bench_conv) > 4 else 0,
-        'EnemyBench5_SpA': enemy_bench_conv[4].spa if len(enemy_bench_conv) > 4 else 0,
-        'EnemyBench5_SpD': enemy_bench_conv[4].spd if len(enemy_bench_conv) > 4 else 0,
-        'EnemyBench5_Spe': enemy_bench_conv[4].spe if len(enemy_bench_conv) > 4 else 0,
-    }
+@dataclass
+class TurnState:
+    """Everything the model looks at for one decision."""
+    player_pokemon: StartingPokemonInfo
+    player_bench: list[StartingPokemonInfo]
+    player_status: ModifierInfo
+    enemy_pokemon: PokemonInfo
+    enemy_bench: list[PokemonInfo]
+    enemy_status: ModifierInfo
+    battlefield: BattlefieldInfo
+
+
+BENCH_SLOTS = 5
+_BENCH_WORDS = ['One', 'Two', 'Three', 'Four', 'Five']
+_STAT_SUFFIXES = ['Type 1', 'Type 2', 'HP', 'Atk', 'Def', 'SpA', 'SpD', 'Spe']
+_BOOST_SUFFIXES = ['Atk', 'Def', 'Spa', 'Spd', 'Spe', 'Eva', 'Acc']
+_HAZARD_NAMES = ['Stealth Rock', 'Spikes', 'Toxic Spikes', 'Sticky Web']
+_OTHER_NAMES = ['Reflect', 'Light Screen', 'Mist', 'Aurora Veil', 'Safeguard']
+
+
+def _side_condition_columns(side: str) -> list[str]:
+    return [side + name.replace(' ', '') for name in _HAZARD_NAMES + _OTHER_NAMES]
+
+
+def _feature_columns() -> list[str]:
+    """The model input columns, in the order the training tables were written."""
+    columns: list[str] = []
+    for side in ('Player', 'Enemy'):
+        columns += [f'{side}PkmnOnField', f'{side}PkmnHealth']
+        for slot in range(BENCH_SLOTS):
+            columns += [f'{side}Bench{slot + 1}', f'{side}Bench{_BENCH_WORDS[slot]}Hp']
+        columns += [f'{side}Boost{boost}' for boost in _BOOST_SUFFIXES]
+    columns += ['Weather', 'Terrain']
+    columns += _side_condition_columns('Player') + _side_condition_columns('Enemy')
+    for side in ('Player', 'Enemy'):
+        columns += [f'{side}PkmnOnField_{stat}' for stat in _STAT_SUFFIXES]
+    for side in ('Player', 'Enemy'):
+        for slot in range(BENCH_SLOTS):
+            columns += [f'{side}Bench{slot + 1}_{stat}' for stat in _STAT_SUFFIXES]
+    return columns
+
+
+FEATURE_COLUMNS = _feature_columns()
+
+# parse2 writes the same features under its own names, e.g. PlayerPkmnType1 for
+# PlayerPkmnOnField_Type 1 and PlayerBenchOneAtk for PlayerBench1_Atk
+_PARSE2_STAT_SUFFIXES = ['Type1', 'Type2', 'HP', 'Atk', 'Def', 'SpA', 'SpD', 'Spe']
+
+
+def _parse2_aliases() -> tuple[dict[str, str], set[str]]:
+    """parse2 column -> FEATURE_COLUMNS name, and the status columns the encoder leaves at 0."""
+    aliases: dict[str, str] = {}
+    statuses: set[str] = set()
+    for side in ('Player', 'Enemy'):
+        statuses.add(f'{side}PkmnStatus')
+        for stat, parse2_stat in zip(_STAT_SUFFIXES, _PARSE2_STAT_SUFFIXES):
+            aliases[f'{side}Pkmn{parse2_stat}'] = f'{side}PkmnOnField_{stat}'
+        for slot, word in enumerate(_BENCH_WORDS):
+            aliases[f'{side}Bench{word}'] = f'{side}Bench{slot + 1}'
+            statuses.add(f'{side}Bench{word}Status')
+            for stat, parse2_stat in zip(_STAT_SUFFIXES, _PARSE2_STAT_SUFFIXES):
+                aliases[f'{side}Bench{word}{parse2_stat}'] = f'{side}Bench{slot + 1}_{stat}'
+    return aliases, statuses
+
+
+_PARSE2_ALIASES, _UNENCODED_COLUMNS = _parse2_aliases()
+
+
+def feature_index(columns: list[str]) -> dict[str, int]:
+    """Map each FEATURE_COLUMNS name to its position in columns, which may use parse2's names.
+
+    Status columns are allowed and left at 0, since parse2 writes them as 0 too. Any other
+    column the encoder can't fill, or a feature column that is missing, raises ValueError.
+    """
+    index: dict[str, int] = {}
+    unknown: list[str] = []
+    for i, column in enumerate(columns):
+        name = _PARSE2_ALIASES.get(column, column)
+        if name in FEATURE_COLUMNS:
+            index[name] = i
+        elif column not in _UNENCODED_COLUMNS:
+            unknown.append(column)
+    missing = [column for column in FEATURE_COLUMNS if column not in index]
+    if unknown or missing:
+        raise ValueError(f'The GUI cannot encode these feature columns. Unknown: {unknown[:10]}, missing: {missing[:10]}.')
+    return index
+
+
+class _SideLayout:
+    """Column indices of one side's features in an encoded row."""
+
+    def __init__(self, index: dict[str, int], side: str) -> None:
+        self.onfield_id = index[f'{side}PkmnOnField']
+        self.health = index[f'{side}PkmnHealth']
+        self.onfield_stats = np.array([index[f'{side}PkmnOnField_{stat}'] for stat in _STAT_SUFFIXES])
+        self.bench_ids = np.array([index[f'{side}Bench{slot + 1}'] for slot in range(BENCH_SLOTS)])
+        self.bench_hp = np.array([index[f'{side}Bench{word}Hp'] for word in _BENCH_WORDS])
+        self.bench_stats = np.array([
+            [index[f'{side}Bench{slot + 1}_{stat}'] for stat in _STAT_SUFFIXES] for slot in range(BENCH_SLOTS)
+        ])
+        self.boosts = np.array([index[f'{side}Boost{boost}'] for boost in _BOOST_SUFFIXES])
+        self.side_conditions = np.array([index[column] for column in _side_condition_columns(side)])
+
+
+class FeatureEncoder:
+    """Encodes TurnStates straight into float32 rows laid out like `columns`."""
+
+    columns: list[str]
+    species_rows: dict[str, int]
+    stats: np.ndarray
+
+    def __init__(self, pokemon_table: dict[str, SerializedPokemonInfo], columns: list[str] | None = None) -> None:
+        self.columns = list(FEATURE_COLUMNS if columns is None else columns)
+        index = feature_index(self.columns)
+        self._player = _SideLayout(index, 'Player')
+        self._enemy = _SideLayout(index, 'Enemy')
+        self._weather = index['Weather']
+        self._terrain = index['Terrain']
+
+        # row 0 stays all zeros for empty bench slots, the rest is [id, type1, type2, hp, atk, def, spa, spd, spe]
+        self.species_rows = {}
+        self.stats = np.zeros((len(pokemon_table) + 1, 1 + len(_STAT_SUFFIXES)), dtype=np.float32)
+        for row, (name, info) in enumerate(pokemon_table.items(), start=1):
+            self.species_rows[name] = row
+            self.stats[row] = (info.id, info.type1, info.type2, info.hp, info.atk, info.def_, info.spa, info.spd, info.spe)
+
+    @classmethod
+    def from_file(cls, filename: str, columns: list[str] | None = None) -> 'FeatureEncoder':
+        return cls(load_pokemon_table(filename), columns)
+
+    @property
+    def width(self) -> int:
+        return len(self.columns)
+
+    def _encode_side(
+        self,
+        row: np.ndarray,
+        layout: _SideLayout,
+        pokemon: PokemonInfo | StartingPokemonInfo,
+        bench: list[PokemonInfo] | list[StartingPokemonInfo],
+        status: ModifierInfo,
+        hazards: list[str],
+        other: list[str],
+    ) -> None:
+        onfield = self.species_rows[pokemon.name]
+        row[layout.onfield_id] = self.stats[onfield, 0]
+        row[layout.health] = pokemon.hp_percent
+        row[layout.onfield_stats] = self.stats[onfield, 1:]
+
+        bench = bench[:BENCH_SLOTS]
+        if bench:
+            n = len(bench)
+            bench_rows = [self.species_rows[member.name] for member in bench]
+            row[layout.bench_ids[:n]] = self.stats[bench_rows, 0]
+            row[layout.bench_hp[:n]] = [member.hp_percent for member in bench]
+            row[layout.bench_stats[:n]] = self.stats[bench_rows, 1:]
+
+        row[layout.boosts] = (status.atk, status.def_, status.spa, status.spd, status.spe, status.evasion, status.accuracy)
+        row[layout.side_conditions] = [hazards.count(name) for name in _HAZARD_NAMES] + [other.count(name) for name in _OTHER_NAMES]
+
+    def encode(self, state: TurnState, out: np.ndarray | None = None) -> np.ndarray:
+        """Encode one turn, into `out` if given (it is overwritten)."""
+        if out is None:
+            out = np.zeros(self.width, dtype=np.float32)
+        else:
+            out.fill(0)
+        battlefield = state.battlefield
+        self._encode_side(out, self._player, state.player_pokemon, state.player_bench, state.player_status,
+                          battlefield.my_hazards, battlefield.my_other)
+        self._encode_side(out, self._enemy, state.enemy_pokemon, state.enemy_bench, state.enemy_status,
+                          battlefield.enemy_hazards, battlefield.enemy_other)
+        out[self._weather] = convert_weather_from_name(battlefield.weather)
+        out[self._terrain] = convert_terrain_from_name(battlefield.terrain)
+        return out
+
+    def encode_many(self, states: list[TurnState]) -> np.ndarray:
+        """Encode a batch of turns into one (len(states), width) matrix."""
+        matrix = np.zeros((len(states), self.width), dtype=np.float32)
+        for i, state in enumerate(states):
+            self.encode(state, matrix[i])
+        return matrix
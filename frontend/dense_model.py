@@ -0,0 +1,76 @@
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+DENSE_MODEL_VERSION = 1
+
+ACTIVATIONS = ('linear', 'relu', 'softmax')
+
+
+@dataclass
+class DenseModel:
+    """A stack of dense layers run with NumPy, read from the weights a Keras model was exported to."""
+    weights: list[np.ndarray]
+    biases: list[np.ndarray]
+    activations: list[str]
+    version: int = DENSE_MODEL_VERSION
+
+    @property
+    def input_width(self) -> int:
+        return self.weights[0].shape[0]
+
+    @property
+    def output_width(self) -> int:
+        return self.weights[-1].shape[1]
+
+    def forward(self, X: np.ndarray) -> np.ndarray:
+        """Return the model's outputs for a batch of scaled rows."""
+        for weight, bias, activation in zip(self.weights, self.biases, self.activations):
+            X = X @ weight
+            X += bias
+            if activation == 'relu':
+                np.maximum(X, 0, out=X)
+            elif activation == 'softmax':
+                X -= X.max(axis=-1, keepdims=True)
+                np.exp(X, out=X)
+                X /= X.sum(axis=-1, keepdims=True)
+        return X
+
+
+def dense_model_path_for(model_path: str) -> str:
+    """Return the path of the exported weights that belong next to the given model file."""
+    return os.path.splitext(model_path)[0] + '.dense.npz'
+
+
+def save_dense_model(path: str, model: DenseModel) -> None:
+    """Write the layers as a flat npz file, readable without pickle or TensorFlow."""
+    arrays = {}
+    for k, (weight, bias) in enumerate(zip(model.weights, model.biases)):
+        arrays[f'weight_{k}'] = weight.astype(np.float32)
+        arrays[f'bias_{k}'] = bias.astype(np.float32)
+    with open(path, 'wb') as f:
+        np.savez(
+            f,
+            version=np.array(model.version, dtype=np.int32),
+            activations=np.array(model.activations, dtype=np.str_),
+            **arrays,
+        )
+
+
+def load_dense_model(path: str) -> DenseModel:
+    """Read a model written by save_dense_model."""
+    with np.load(path, allow_pickle=False) as data:
+        version = int(data['version'])
+        if version != DENSE_MODEL_VERSION:
+            raise ValueError(f'Unsupported dense model version {version} in {path}, expected {DENSE_MODEL_VERSION}.')
+        activations = data['activations'].tolist()
+        unknown = set(activations) - set(ACTIVATIONS)
+        if unknown:
+            raise ValueError(f'Unsupported activations {sorted(unknown)} in {path}.')
+        return DenseModel(
+            weights=[data[f'weight_{k}'] for k in range(len(activations))],
+            biases=[data[f'bias_{k}'] for k in range(len(activations))],
+            activations=activations,
+            version=version,
+        )
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+import json
 import time
 from typing import Literal
 
@@ -126,6 +127,229 @@ class BattlefieldInfo:
         final_strings.append('Enemy Hazards:' + ''.join(f'\n- {effect}' for effect in self.enemy_hazards))
         return final_strings
 
+_SNAPSHOT_SCRIPT = '''
+var room = window.app && app.curRoom;
+var battle = room && room.battle;
+if (!battle) return null;
+var dex = window.Dex;
+function name(table, id) {
+    if (!id) return null;
+    return dex && dex[table] ? dex[table].get(id).name : id;
+}
+var tooltips = room.tooltips || (battle.scene && battle.scene.tooltips);
+function pokemon(p) {
+    var species = dex ? dex.species.get(p.speciesForme) : null;
+    var speed = [0, 0];
+    try {
+        if (tooltips && tooltips.getSpeedRange) speed = tooltips.getSpeedRange(p);
+    } catch (e) {}
+    return {
+        species: p.speciesForme,
+        name: p.name,
+        gender: p.gender || null,
+        hp: p.hp,
+        maxhp: p.maxhp,
+        fainted: !!p.fainted,
+        status: p.status || '',
+        item: name('items', p.item),
+        ability: name('abilities', p.ability || p.baseAbility),
+        possibleAbilities: species && species.abilities ? Object.values(species.abilities) : [],
+        speed: speed,
+        boosts: p.boosts || {},
+        volatiles: Object.keys(p.volatiles || {})
+    };
+}
+function side(s) {
+    if (!s) return null;
+    var active = s.active && s.active[0];
+    return {
+        pokemon: s.pokemon.map(pokemon),
+        active: active ? pokemon(active) : null,
+        sideConditions: Object.keys(s.sideConditions || {}).map(function (id) {
+            return [id, s.sideConditions[id][1] || 1];
+        })
+    };
+}
+var request = room.request || null;
+var team = [];
+var moves = [];
+if (request && request.side) {
+    team = request.side.pokemon.map(function (p) {
+        var speciesName = p.details.split(',')[0];
+        var species = dex ? dex.species.get(speciesName) : null;
+        return {
+            species: speciesName,
+            name: p.ident.split(': ').slice(1).join(': '),
+            details: p.details,
+            condition: p.condition,
+            types: species ? species.types : [],
+            teraType: p.teraType || '',
+            ability: name('abilities', p.ability || p.baseAbility),
+            item: name('items', p.item),
+            stats: p.stats,
+            moves: p.moves.map(function (id) { return name('moves', id); })
+        };
+    });
+    if (request.active && request.active[0]) {
+        moves = request.active[0].moves.map(function (m) {
+            return {name: m.move, type: dex ? dex.moves.get(m.id).type : '', pp: m.pp || 0};
+        });
+    }
+}
+return JSON.stringify({
+    near: side(battle.nearSide || battle.mySide),
+    far: side(battle.farSide || battle.yourSide),
+    weather: battle.weather || '',
+    pseudoWeather: (battle.pseudoWeather || []).map(function (w) { return w[0]; }),
+    team: team,
+    moves: moves
+});
+'''
+
+_WEATHER_NAMES = {
+    'sunnyday': 'Sun',
+    'desolateland': 'Sun',
+    'raindance': 'Rain',
+    'primordialsea': 'Rain',
+    'sandstorm': 'Sandstorm',
+    'snow': 'Snow',
+    'hail': 'Snow',
+}
+
+_HAZARD_IDS = {
+    'stealthrock': 'Stealth Rock',
+    'spikes': 'Spikes',
+    'toxicspikes': 'Toxic Spikes',
+    'stickyweb': 'Sticky Web',
+}
+
+_OTHER_IDS = {
+    'reflect': 'Reflect',
+    'lightscreen': 'Light Screen',
+    'mist': 'Mist',
+    'auroraveil': 'Aurora Veil',
+    'safeguard': 'Safeguard',
+}
+
+@dataclass
+class BattleSnapshot:
+    """Everything the DOM getters return, read from the client's battle state in one call."""
+    my_team: list[PokemonInfo]
+    enemy_team: list[PokemonInfo]
+    starting_info: list[StartingPokemonInfo]
+    moves: list[MoveInfo]
+    my_status: ModifierInfo | None
+    enemy_status: ModifierInfo | None
+    battlefield: BattlefieldInfo
+
+def _nickname(species: str, name: str) -> str | None:
+    """Tooltips only show a nickname when it differs from the species."""
+    return name if name and name != species else None
+
+def _modifier_from_snapshot(pokemon: dict) -> ModifierInfo:
+    """Build a ModifierInfo from an active pokemon's boosts, status and volatiles."""
+    boosts = pokemon['boosts']
+    volatiles = set(pokemon['volatiles'])
+    status = pokemon['status']
+    return ModifierInfo(
+        pokemon=pokemon['name'],
+        atk=boosts.get('atk', 0),
+        def_=boosts.get('def', 0),
+        spa=boosts.get('spa', 0),
+        spd=boosts.get('spd', 0),
+        spe=boosts.get('spe', 0),
+        evasion=boosts.get('evasion', 0),
+        accuracy=boosts.get('accuracy', 0),
+        confused='confusion' in volatiles,
+        paralyzed=status == 'par',
+        aqua_ring='aquaring' in volatiles,
+        taunt='taunt' in volatiles,
+        frozen=status == 'frz',
+        toxic=status == 'tox',
+        endure='endure' in volatiles,
+        poison=status == 'psn',
+    )
+
+def _pokemon_from_snapshot(pokemon: dict) -> PokemonInfo:
+    """Build a PokemonInfo from a pokemon on either side of the battle."""
+    hp_percent = 0.0 if pokemon['fainted'] or not pokemon['maxhp'] else round(pokemon['hp'] / pokemon['maxhp'] * 100, 1)
+    abilities = [pokemon['ability']] if pokemon['ability'] else pokemon['possibleAbilities']
+    low, high = pokemon['speed']
+    return PokemonInfo(
+        name=pokemon['species'],
+        nickname=_nickname(pokemon['species'], pokemon['name']),
+        gender=pokemon['gender'] if pokemon['gender'] in {'M', 'F'} else None,
+        hp_percent=hp_percent,
+        item=pokemon['item'],
+        abilities=abilities,
+        speed=(int(low), int(high)),
+    )
+
+def _starting_pokemon_from_snapshot(pokemon: dict) -> StartingPokemonInfo:
+    """Build a StartingPokemonInfo from a pokemon in the player's |request|."""
+    details = [part.strip() for part in pokemon['details'].split(',')]
+    gender = next((part for part in details[1:] if part in {'M', 'F'}), None)
+    # condition is '245/301', '245/301 par' or '0 fnt'
+    hp = pokemon['condition'].split()[0]
+    hp_percent = 0.0
+    total_hp = 0
+    if '/' in hp:
+        current, total_hp = (int(value) for value in hp.split('/'))
+        hp_percent = round(current / total_hp * 100, 1)
+    stats = pokemon['stats']
+    return StartingPokemonInfo(
+        name=pokemon['species'],
+        nickname=_nickname(pokemon['species'], pokemon['name']),
+        types=pokemon['types'],
+        tera_type=pokemon['teraType'],
+        gender=gender,
+        hp_percent=hp_percent,
+        total_hp=total_hp,
+        ability=pokemon['ability'] or 'None',
+        item=pokemon['item'] or 'None',
+        atk=stats['atk'],
+        def_=stats['def'],
+        spa=stats['spa'],
+        spd=stats['spd'],
+        spe=stats['spe'],
+        moves=pokemon['moves'],
+    )
+
+def _side_conditions_from_snapshot(side: dict) -> tuple[list[str], list[str]]:
+    """Split a side's conditions into hazards (one entry per layer) and other effects."""
+    hazards: list[str] = []
+    other: list[str] = []
+    for condition_id, layers in side['sideConditions']:
+        if condition_id in _HAZARD_IDS:
+            hazard = _HAZARD_IDS[condition_id]
+            hazards.extend([hazard] * (1 if hazard == 'Stealth Rock' else int(layers)))
+        elif condition_id in _OTHER_IDS:
+            other.append(_OTHER_IDS[condition_id])
+    return hazards, other
+
+def _parse_snapshot(data: dict) -> BattleSnapshot:
+    """Turn the snapshot script's output into the same dataclasses the DOM getters return."""
+    near, far = data['near'], data['far']
+    my_hazards, my_other = _side_conditions_from_snapshot(near)
+    enemy_hazards, enemy_other = _side_conditions_from_snapshot(far)
+    terrain = next((name.split(' ')[0] for name in data['pseudoWeather'] if name.endswith('Terrain')), None)
+    return BattleSnapshot(
+        my_team=[_pokemon_from_snapshot(pokemon) for pokemon in near['pokemon']],
+        enemy_team=[_pokemon_from_snapshot(pokemon) for pokemon in far['pokemon']],
+        starting_info=[_starting_pokemon_from_snapshot(pokemon) for pokemon in data['team']],
+        moves=[MoveInfo(move['name'], move['type'], move['pp']) for move in data['moves']],
+        my_status=_modifier_from_snapshot(near['active']) if near['active'] else None,
+        enemy_status=_modifier_from_snapshot(far['active']) if far['active'] else None,
+        battlefield=BattlefieldInfo(
+            weather=_WEATHER_NAMES.get(data['weather']),
+            terrain=terrain,
+            my_other=my_other,
+            enemy_other=enemy_other,
+            my_hazards=my_hazards,
+            enemy_hazards=enemy_hazards,
+        ),
+    )
+
 def _convert_stat_to_stage(raw: float, acc_eva: bool) -> int:
     """Convert a raw stat to a multiplier stage."""
     if acc_eva:
@@ -229,20 +453,42 @@ def _parse_statbar(statbar: WebElement) -> ModifierInfo:
 
 
 class WebDriver(webdriver.Chrome):
+
+    snapshot_mode: bool
     
-    def __init__(self, *args, **kwargs) -> None:
+    def __init__(self, *args, snapshot_mode: bool = True, **kwargs) -> None:
         super().__init__(*args, **kwargs)
+        self.snapshot_mode = snapshot_mode
+
+    def get_snapshot(self) -> BattleSnapshot | None:
+        """Read the whole battle in a single execute_script call, None when no battle is open."""
+        raw = self.execute_script(_SNAPSHOT_SCRIPT)
+        if raw is None:
+            return None
+        return _parse_snapshot(json.loads(raw))
+
+    def _snapshot_or_none(self) -> BattleSnapshot | None:
+        return self.get_snapshot() if self.snapshot_mode else None
 
     def get_enemy_statbar(self) -> ModifierInfo:
+        snapshot = self._snapshot_or_none()
+        if snapshot is not None and snapshot.enemy_status is not None:
+            return snapshot.enemy_status
         enemy_statbar = self.find_element(by=By.CLASS_NAME, value='lstatbar')
         return _parse_statbar(enemy_statbar)
 
     def get_my_statbar(self) -> ModifierInfo:
+        snapshot = self._snapshot_or_none()
+        if snapshot is not None and snapshot.my_status is not None:
+            return snapshot.my_status
         my_statbar = self.find_element(by=By.CLASS_NAME, value='rstatbar')
         return _parse_statbar(my_statbar)
 
     def get_available_moves(self) -> list[MoveInfo]:
         """Return a list of available moves."""
+        snapshot = self._snapshot_or_none()
+        if snapshot is not None:
+            return snapshot.moves
         move_menu = self.find_element(by=By.CLASS_NAME, value='movemenu')
         moves: list[MoveInfo] = []
         for move_button in move_menu.find_elements(by=By.TAG_NAME, value='button'):
@@ -316,13 +562,22 @@ class WebDriver(webdriver.Chrome):
         return team
 
     def get_my_team_info(self) -> list[PokemonInfo]:
+        snapshot = self._snapshot_or_none()
+        if snapshot is not None:
+            return snapshot.my_team
         return self._get_team_info('trainer-near')
 
     def get_enemy_team_info(self) -> list[PokemonInfo]:
+        snapshot = self._snapshot_or_none()
+        if snapshot is not None:
+            return snapshot.enemy_team
         return self._get_team_info('trainer-far')
     
     def get_starting_info(self) -> list[StartingPokemonInfo]:
         """Return a list of starting pokemon info."""
+        snapshot = self._snapshot_or_none()
+        if snapshot is not None:
+            return snapshot.starting_info
         starting_info: list[StartingPokemonInfo] = []
         switch_menu = self.find_element(by=By.CLASS_NAME, value='switchmenu')
         for button in switch_menu.find_elements(by=By.TAG_NAME, value='button'):
@@ -369,6 +624,9 @@ class WebDriver(webdriver.Chrome):
         return starting_info
 
     def get_battlefield_info(self) -> BattlefieldInfo:
+        snapshot = self._snapshot_or_none()
+        if snapshot is not None:
+            return snapshot.battlefield
         info = BattlefieldInfo(
             weather=None,
             terrain=None,
@@ -0,0 +1,72 @@
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+SCHEMA_VERSION = 1
+
+
+@dataclass
+class FeatureSchema:
+    """The column order, min-max scaling and move vocabulary a model was trained with."""
+    columns: list[str]
+    data_min: np.ndarray
+    scale: np.ndarray
+    move_ids: np.ndarray
+    move_names: list[str]
+    version: int = SCHEMA_VERSION
+
+    @property
+    def offset(self) -> np.ndarray:
+        """The additive term of the scaling, same as MinMaxScaler.min_."""
+        return -self.data_min * self.scale
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """Scale rows ordered like self.columns the same way the training data was."""
+        return X * self.scale + self.offset
+
+
+def schema_path_for(model_path: str) -> str:
+    """Return the path of the schema sidecar that belongs next to the given model file."""
+    return os.path.splitext(model_path)[0] + '.schema.npz'
+
+
+def schema_from_scaler(columns: list[str], scaler, move_ids, move_names: list[str]) -> FeatureSchema:
+    """Build a schema from a fitted MinMaxScaler."""
+    return FeatureSchema(
+        columns=list(columns),
+        data_min=np.asarray(scaler.data_min_, dtype=np.float32),
+        scale=np.asarray(scaler.scale_, dtype=np.float32),
+        move_ids=np.asarray(move_ids, dtype=np.int32),
+        move_names=list(move_names),
+    )
+
+
+def save_feature_schema(path: str, schema: FeatureSchema) -> None:
+    """Write the schema as a flat npz file, readable without pickle or pandas."""
+    with open(path, 'wb') as f:
+        np.savez(
+            f,
+            version=np.array(schema.version, dtype=np.int32),
+            columns=np.array(schema.columns, dtype=np.str_),
+            data_min=schema.data_min.astype(np.float32),
+            scale=schema.scale.astype(np.float32),
+            move_ids=schema.move_ids.astype(np.int32),
+            move_names=np.array(schema.move_names, dtype=np.str_),
+        )
+
+
+def load_feature_schema(path: str) -> FeatureSchema:
+    """Read a schema written by save_feature_schema."""
+    with np.load(path, allow_pickle=False) as data:
+        version = int(data['version'])
+        if version != SCHEMA_VERSION:
+            raise ValueError(f'Unsupported feature schema version {version} in {path}, expected {SCHEMA_VERSION}.')
+        return FeatureSchema(
+            columns=data['columns'].tolist(),
+            data_min=data['data_min'],
+            scale=data['scale'],
+            move_ids=data['move_ids'],
+            move_names=data['move_names'].tolist(),
+            version=version,
+        )
@@ -1,24 +1,50 @@
+from __future__ import annotations
+
+import threading
 import tkinter
 from tkinter import ttk
 import time
+from typing import TYPE_CHECKING
 
-import pandas as pd
-import numpy as np
-from keras.models import load_model
-from sklearn.preprocessing import MinMaxScaler
+from .jobs import JobResult, JobRunner
+from .widget_views import LabelColumns, LabelStack, TreeRows
 
-from .driver import WebDriver, PokemonInfo, MoveInfo, ModifierInfo, StartingPokemonInfo, BattlefieldInfo
-from .conversion import serialize_data, load_pokemon_table
+# selenium, numpy and the model are imported when first needed so the window can open at once
+if TYPE_CHECKING:
+    from .driver import WebDriver, PokemonInfo, MoveInfo, ModifierInfo, StartingPokemonInfo, BattlefieldInfo
+    from .conversion import TurnState
+    from .prediction import PredictionSession
+    from .battle_watcher import BattleWatcher, LiveBattle
 
 
 class GUI:
     
     window: tkinter.Tk
     driver: WebDriver | None = None
+    session: PredictionSession | None = None
+    watcher: BattleWatcher | None = None
+
+    WATCH_INTERVAL_MS = 250
+    _watching: bool = False
+    _watch_job: str | None = None
+    _decision_pending: bool = False
+    _warm_up_thread: threading.Thread | None = None
+    _warm_up_error: BaseException | None = None
+
+    # Selenium calls all go through the driver lane since the driver isn't thread-safe, so a
+    # refresh and a prediction on the model lane can overlap while Tk stays free
+    jobs: JobRunner
+    JOB_POLL_MS = 30
+    _jobs_label: ttk.Label | None = None
 
     tree: ttk.Treeview | None = None
     _treeview_info_frame: ttk.Frame | None = None
 
+    # What is on screen, so a refresh only reconfigures the labels and rows that changed
+    _tree_rows: dict[str, TreeRows]
+    _selection_view: LabelStack | None = None
+    _info_views: dict[str, LabelColumns]
+
     _near_team_info_frame: ttk.Frame | None = None
     _near_team_info_subframes: list[ttk.Frame] | None = None
     _far_team_info_frame: ttk.Frame | None = None
@@ -53,6 +79,12 @@ class GUI:
         self.tree = self.create_treeview(tree_frame)
         self._treeview_info_frame = ttk.Frame(info_frame)
         self._treeview_info_frame.pack(side=tkinter.LEFT, fill=tkinter.BOTH, expand=True)
+        self._tree_rows = {
+            'near_team': TreeRows(self.tree, 'near_team', 'near_pokemon'),
+            'far_team': TreeRows(self.tree, 'far_team', 'far_pokemon'),
+        }
+        self._selection_view = LabelStack(self._treeview_info_frame, side=tkinter.TOP, anchor=tkinter.W, pady=3)
+        self._info_views = {}
         
         # self._near_team_info_frame, self._near_team_info_subframes = self._add_team_info('Your Team')
         # self._far_team_info_frame, self._far_team_info_subframes = self._add_team_info('Enemy Team')
@@ -63,14 +95,51 @@ class GUI:
         self._prediction_frame, self._prediction_subframe = self.add_prediction()
 
         self._add_buttons()
+
+        self.jobs = JobRunner(('driver', 'model'))
+        self._jobs_label = ttk.Label(self.window, text=self.jobs.status(), justify=tkinter.LEFT)
+        self._jobs_label.pack(side=tkinter.BOTTOM, pady=5)
+        self.window.after(self.JOB_POLL_MS, self._pump_jobs)
     
     def run(self) -> None:
         """Run the GUI."""
         self.window.mainloop()
+        self.jobs.close()
+
+    def _pump_jobs(self) -> None:
+        """Hand finished jobs to their callbacks on the Tk thread and show what is in flight."""
+        try:
+            self.jobs.deliver()
+            status = self.jobs.status()
+            if self._jobs_label is not None and self._jobs_label.cget('text') != status:
+                self._jobs_label.configure(text=status)
+        finally:
+            self.window.after(self.JOB_POLL_MS, self._pump_jobs)
+
+    def _refresh(self, key: str, fetch, apply) -> None:
+        """Run fetch on the driver lane and apply its result on the Tk thread once it arrives."""
+        if self.driver is None:
+            return
+        self.jobs.submit('driver', key, fetch, lambda result: apply(result.value))
     
     def hook(self, driver: WebDriver) -> None:
-        """Hook the GUI to the driver."""
+        """Hook the GUI to the driver and make sure the prediction session is loading."""
         self.driver = driver
+        self.warm_up()
+
+    def warm_up(self) -> None:
+        """Start importing the model code and loading the prediction session on a background thread."""
+        if self._warm_up_thread is None:
+            self._warm_up_thread = threading.Thread(target=self._load_session, name='warm-up', daemon=True)
+            self._warm_up_thread.start()
+
+    def _load_session(self) -> None:
+        """Runs on the warm-up thread, so it must not touch any widget."""
+        try:
+            from .prediction import PredictionSession
+            self.session = PredictionSession()
+        except BaseException as e:
+            self._warm_up_error = e
     
     def create_treeview(self, frame: tkinter.Frame) -> ttk.Treeview:
         """Create a treeview for the given frame."""
@@ -94,19 +163,11 @@ class GUI:
         return tree
 
     def update_tree_teams(self) -> None:
-        """Add the teams to the treeview."""
-        for child in self.tree.get_children('near_team'):
-            self.tree.delete(child)
-        for child in self.tree.get_children('far_team'):
-            self.tree.delete(child)
-        if self.my_team is not None:
-            for i, pokemon in enumerate(self.my_team):
-                name = f'{pokemon.nickname} ({pokemon.name})' if pokemon.nickname is not None else pokemon.name
-                self.tree.insert('near_team', 'end', f'near_pokemon_{i}', text=name)
-        if self.enemy_team is not None:
-            for i, pokemon in enumerate(self.enemy_team):
-                name = f'{pokemon.nickname} ({pokemon.name})' if pokemon.nickname is not None else pokemon.name
-                self.tree.insert('far_team', 'end', f'far_pokemon_{i}', text=name)
+        """Add the teams to the treeview, renaming only the rows whose pokemon changed."""
+        for parent, team in (('near_team', self.my_team), ('far_team', self.enemy_team)):
+            names = [f'{pokemon.nickname} ({pokemon.name})' if pokemon.nickname is not None else pokemon.name
+                     for pokemon in team or []]
+            self._tree_rows[parent].update(names)
     
     def update_selection_frame(self) -> None:
         """Update the treeview info frame based on the current treeview selection."""
@@ -116,12 +177,8 @@ class GUI:
         selection = selection[0]
 
         def write_to_frame(lines: list[str]) -> None:
-            """Write the given lines to the info frame."""
-            for child in self._treeview_info_frame.winfo_children():
-                child.destroy()
-            for line in lines:
-                label = ttk.Label(self._treeview_info_frame, text=line)
-                label.pack(side=tkinter.TOP, anchor=tkinter.W, pady=3)
+            """Write the given lines to the info frame, reusing the labels already there."""
+            self._selection_view.update(lines)
 
         if selection == 'near_team':
             if self.my_team is None:
@@ -161,15 +218,25 @@ class GUI:
                 index = int(selection.split('_')[-1])
                 write_to_frame([self.enemy_team[index].display()])
     
+    def _wait_for_mouse(self) -> None:
+        """Give the mouse a moment to stop before tooltips are scraped by hovering."""
+        if not self.driver.snapshot_mode:
+            time.sleep(0.5)
+
     def _update_starting_team_info_from_driver(self) -> None:
         """Update the starting team info frame from the driver."""
-        if self.driver is None:
-            return
-        # slight delay to wait for mouse movement to stop
-        time.sleep(0.5)
-        
-        self.my_team = self.driver.get_starting_info()
+        def fetch() -> list[StartingPokemonInfo]:
+            self._wait_for_mouse()
+            return self.driver.get_starting_info()
 
+        def apply(my_team: list[StartingPokemonInfo]) -> None:
+            self.my_team = my_team
+            self._show_starting_team_info()
+
+        self._refresh('starting_team', fetch, apply)
+    
+    def _show_starting_team_info(self) -> None:
+        """Show the starting team info."""
         if self._near_team_info_frame is not None and self._near_team_info_subframes is not None:
             starting_team_info_strings = [info.display().split('\n') for info in self.my_team]
             self.update_info_frame(self._near_team_info_frame, self._near_team_info_subframes, starting_team_info_strings)
@@ -181,13 +248,18 @@ class GUI:
     
     def _update_enemy_team_info_from_driver(self) -> None:
         """Update the enemy team info frame from the driver."""
-        if self.driver is None:
-            return
-        # slight delay to wait for mouse movement to stop
-        time.sleep(0.5)
-        
-        self.enemy_team = self.driver.get_enemy_team_info()
+        def fetch() -> list[PokemonInfo]:
+            self._wait_for_mouse()
+            return self.driver.get_enemy_team_info()
 
+        def apply(enemy_team: list[PokemonInfo]) -> None:
+            self.enemy_team = enemy_team
+            self._show_enemy_team_info()
+
+        self._refresh('enemy_team', fetch, apply)
+    
+    def _show_enemy_team_info(self) -> None:
+        """Show the enemy team info."""
         if self._far_team_info_frame is not None and self._far_team_info_subframes is not None:
             far_team_info_strings = [info.display().split('\n') for info in self.enemy_team]
             self.update_info_frame(self._far_team_info_frame, self._far_team_info_subframes, far_team_info_strings)
@@ -199,12 +271,18 @@ class GUI:
     
     def _update_move_info_from_driver(self) -> None:
         """Update the info frame from the driver."""
-        if self.driver is None:
-            return
-        # slight delay to wait for mouse movement to stop
-        time.sleep(0.5)
-        self.moves = self.driver.get_available_moves()
+        def fetch() -> list[MoveInfo]:
+            self._wait_for_mouse()
+            return self.driver.get_available_moves()
+
+        def apply(moves: list[MoveInfo]) -> None:
+            self.moves = moves
+            self._show_move_info()
 
+        self._refresh('moves', fetch, apply)
+    
+    def _show_move_info(self) -> None:
+        """Show the available moves."""
         if self._move_info_frame is not None and self._move_info_subframes is not None:
             move_info_strings = [info.display().split('\n') for info in self.moves]
             self.update_info_frame(self._move_info_frame, self._move_info_subframes, move_info_strings)
@@ -215,13 +293,19 @@ class GUI:
     
     def _update_status_info_from_driver(self) -> None:
         """Update the status info frame from the driver."""
-        if self.driver is None:
-            return
-        
-        self.my_status = self.driver.get_my_statbar()
-        self.enemy_status = self.driver.get_enemy_statbar()
-        
-        if self._status_info_frame is not None and self._status_info_subframes is not None:
+        def fetch() -> tuple[ModifierInfo | None, ModifierInfo | None]:
+            return self.driver.get_my_statbar(), self.driver.get_enemy_statbar()
+
+        def apply(statuses: tuple[ModifierInfo | None, ModifierInfo | None]) -> None:
+            self.my_status, self.enemy_status = statuses
+            self._show_status_info()
+
+        self._refresh('statuses', fetch, apply)
+    
+    def _show_status_info(self) -> None:
+        """Show both statbars."""
+        if self._status_info_frame is not None and self._status_info_subframes is not None \
+                and self.my_status is not None and self.enemy_status is not None:
             status_strings: list[list[str]] = []
             status_strings.append(self.my_status.display().split('\n'))
             status_strings.append(self.enemy_status.display().split('\n'))
@@ -233,11 +317,14 @@ class GUI:
     
     def _update_battlefield_info_from_driver(self) -> None:
         """Update the battlefield info frame from the driver."""
-        if self.driver is None:
-            return
-        
-        self.battlefield = self.driver.get_battlefield_info()
+        def apply(battlefield: BattlefieldInfo) -> None:
+            self.battlefield = battlefield
+            self._show_battlefield_info()
 
+        self._refresh('battlefield', lambda: self.driver.get_battlefield_info(), apply)
+    
+    def _show_battlefield_info(self) -> None:
+        """Show the battlefield info."""
         if self._battlefield_info_frame is not None and self._battlefield_info_subframes is not None:
             battlefield_strings = [info.split('\n') for info in self.battlefield.display_items()]
             self.update_info_frame(self._battlefield_info_frame, self._battlefield_info_subframes, battlefield_strings)
@@ -248,11 +335,92 @@ class GUI:
     
     def _update_all_info_from_driver(self) -> None:
         """Update all info frames from the driver."""
-        self._update_starting_team_info_from_driver()
-        self._update_enemy_team_info_from_driver()
-        self._update_move_info_from_driver()
-        self._update_status_info_from_driver()
-        self._update_battlefield_info_from_driver()
+        def fetch() -> tuple:
+            snapshot = self.driver.get_snapshot() if self.driver.snapshot_mode else None
+            if snapshot is not None:
+                # one round trip for everything instead of one per getter
+                return (snapshot.starting_info, snapshot.enemy_team, snapshot.moves, snapshot.my_status,
+                        snapshot.enemy_status, snapshot.battlefield)
+            self._wait_for_mouse()
+            my_team = self.driver.get_starting_info()
+            self._wait_for_mouse()
+            enemy_team = self.driver.get_enemy_team_info()
+            self._wait_for_mouse()
+            moves = self.driver.get_available_moves()
+            return (my_team, enemy_team, moves, self.driver.get_my_statbar(), self.driver.get_enemy_statbar(),
+                    self.driver.get_battlefield_info())
+
+        self._refresh('all', fetch, self._apply_all_info)
+
+    def _apply_all_info(self, info: tuple) -> None:
+        """Store and show everything _update_all_info_from_driver fetched."""
+        (self.my_team, self.enemy_team, self.moves, self.my_status, self.enemy_status, self.battlefield) = info
+        self._show_starting_team_info()
+        self._show_enemy_team_info()
+        self._show_move_info()
+        self._show_status_info()
+        self._show_battlefield_info()
+    
+    def _toggle_watch(self) -> None:
+        """Start or stop following the battle's protocol stream."""
+        if self.driver is None:
+            return
+        if self._watching:
+            self._watching = False
+            if self._watch_job is not None:
+                self.window.after_cancel(self._watch_job)
+                self._watch_job = None
+            return
+        if self.watcher is None:
+            from .battle_watcher import BattleWatcher
+            self.watcher = BattleWatcher(self.driver, on_request=self._on_request)
+        self._watching = True
+        self.jobs.submit('driver', 'watch', self.watcher.install, self._on_watcher_polled, self._on_watcher_polled)
+
+    def _on_request(self, battle: LiveBattle) -> None:
+        """Remember that the player has a decision to make, the poll predicts once the state is synced."""
+        self._decision_pending = True
+
+    def _poll_watcher(self) -> None:
+        """Drain new protocol lines on the driver lane."""
+        self._watch_job = None
+        self.jobs.submit('driver', 'watch', self.watcher.poll, self._on_watcher_polled, self._on_watcher_polled)
+
+    def _on_watcher_polled(self, result: JobResult) -> None:
+        """Show what the poll applied, predict if a decision came in and schedule the next poll.
+
+        The next poll is only queued from here, so the watcher's state is never read on the Tk
+        thread while the driver lane is changing it. A failed poll or prediction still queues it,
+        so one bad turn doesn't stop the watching.
+        """
+        if not self._watching:
+            return
+        try:
+            if result.error is not None:
+                return
+            # install returns None and always syncs, a poll only when it applied something
+            if result.value is not False:
+                self._sync_from_watcher()
+            if self._decision_pending and self.my_status is not None and self.enemy_status is not None:
+                self._decision_pending = False
+                self._update_prediction()
+        finally:
+            self._watch_job = self.window.after(self.WATCH_INTERVAL_MS, self._poll_watcher)
+
+    def _sync_from_watcher(self) -> None:
+        """Copy the watched battle into the GUI's state and refresh what is shown."""
+        battle = self.watcher.battle
+        if battle is None:
+            return
+        self.my_team = battle.my_team()
+        self.enemy_team = battle.enemy_team()
+        self.moves = battle.moves()
+        self.my_status = battle.my_status()
+        self.enemy_status = battle.enemy_status()
+        self.battlefield = battle.battlefield()
+        if self.tree is not None:
+            self.update_tree_teams()
+            self.update_selection_frame()
     
     def _add_buttons(self) -> None:
         """Add buttons to the window."""
@@ -278,6 +446,8 @@ class GUI:
         btn.pack(side=tkinter.LEFT, padx=5)
         btn = ttk.Button(button_frame, text='Run Model', command=self._update_prediction)
         btn.pack(side=tkinter.LEFT, padx=5)
+        btn = ttk.Button(button_frame, text='Watch Battle', command=self._toggle_watch)
+        btn.pack(side=tkinter.LEFT, padx=5)
     
     def _add_team_info(self, team_name: str) -> tuple[ttk.Frame, list[ttk.Frame]]:
         """Adds an area to display team info in a horizontal frame."""
@@ -387,22 +557,17 @@ class GUI:
         return prediction_info_frame, subframes
     
     def update_info_frame(self, frame: ttk.Frame, subframes: list[ttk.Frame], info: list[list[str]]) -> None:
-        """Update the info frame with the given info."""
-        for subframe in subframes:
-            subframe.destroy()
-        subframes.clear()
-        for info_lines in info:
-            subframe = ttk.Frame(frame)
-            subframe.pack(side=tkinter.LEFT, padx=5)
-            for line in info_lines:
-                label = ttk.Label(subframe, text=line)
-                label.pack(side=tkinter.TOP)
-            subframes.append(subframe)
-        frame.update()
+        """Update the info frame with the given info, reconfiguring only the labels that changed."""
+        view = self._info_views.get(str(frame))
+        if view is None:
+            view = self._info_views[str(frame)] = LabelColumns(frame, subframes)
+        if view.update(info):
+            # geometry only, a full update() here would run queued callbacks re-entrantly
+            frame.update_idletasks()
     
-    def format_data(self) -> dict[str, int | float]:
-        """Format the data into a dictionary."""
-        table = load_pokemon_table('pkmn_data.csv')
+    def format_data(self) -> TurnState:
+        """Collect the current battle state for the encoder."""
+        from .conversion import TurnState
 
         my_onfield: StartingPokemonInfo | None = None
         my_bench = self.my_team.copy()
@@ -428,8 +593,7 @@ class GUI:
         if enemy_onfield is None:
             raise ValueError('Could not find active pokemon in team.')
         
-        return serialize_data(
-            pokemon_table=table,
+        return TurnState(
             player_pokemon=my_onfield,
             player_bench=my_bench,
             player_status=self.my_status,
@@ -440,45 +604,31 @@ class GUI:
         )
     
     def _update_prediction(self) -> None:
-        """Update the prediction."""
+        """Run the model on the current state on the model lane and show the result when it arrives."""
         if self.driver is None:
             return
 
-        data = self.format_data()
-
-        model = load_model('model.h5')
-        df = pd.DataFrame([data])
-        scaler = MinMaxScaler()
-        df_to_scale = pd.read_csv('final_moves.csv')
-        X_train = df_to_scale.drop(columns=['PlayerMove'])
-        scaler.fit(X_train)
-        df_scaled = scaler.transform(df)
-        pred = model.predict(df_scaled)
-
-        # sort the moves based on their probabilities in descending order
-        sorted_indices = np.argsort(-pred[0])
-        if sorted_indices.ndim > 1:
-            sorted_indices = sorted_indices.flatten()
-        
-        # load all the moves' data from the excel file
-        moves_data = pd.ExcelFile('move_data.xlsx')
-        df_moves = pd.read_excel(moves_data, sheet_name=0)
-
-        # Create a dictionary mapping from move name to a numerical value or index
-        # Assuming the Excel file has columns 'move_name' and 'move_value'
-        move_mapping = pd.Series(df_moves['id'].values, index=df_moves['name']).to_dict()
-        move_mapping['switch'] = 0
-        reverse_move_mapping = {v: k for k, v in move_mapping.items()}
-
-        # Assuming self.moves is a list of move names
-        # Encode self.moves using the mapping
-        encoded_moves = [move_mapping[move.name] for move in self.moves if move.name in move_mapping]
+        # the state is read here on the Tk thread, the lane only sees this copy
+        state = self.format_data()
+        moves = list(self.moves)
+        self.warm_up()
 
-        # Filter the list to a list of valid moves
-        valid_moves = [index for index in sorted_indices if index in encoded_moves or index == 0]
+        def predict() -> tuple[list[str], str]:
+            # the first prediction can come before the warm-up is done
+            self._warm_up_thread.join()
+            if self.session is None:
+                raise RuntimeError('The prediction session failed to load.') from self._warm_up_error
+            pred = self.session.predict(state)
+            return self.session.rank_moves(pred, moves), self.session.latency_summary()
 
-        # Format into a list of strings with the move name and probability
-        move_probabilities = [f'{reverse_move_mapping[index]}: {(pred[0][index]*100):.2f}%' for index in valid_moves]
+        self.jobs.submit('model', 'predict', predict, self._show_prediction)
 
+    def _show_prediction(self, result: JobResult) -> None:
+        """Show the ranked moves a prediction job returned."""
+        move_probabilities, latency_summary = result.value
         if self._prediction_frame is not None and self._prediction_subframe is not None:
-            self.update_info_frame(self._prediction_frame, self._prediction_subframe, [move_probabilities])
+            self.update_info_frame(
+                self._prediction_frame,
+                self._prediction_subframe,
+                [move_probabilities, latency_summary.split('\n')],
+            )
@@ -0,0 +1,179 @@
+import queue
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Any, Callable
+
+
+@dataclass
+class JobResult:
+    """What a job returned or raised, with when it was queued, started and finished."""
+    lane: str
+    key: str
+    job_id: int
+    value: Any
+    error: BaseException | None
+    queued_at: float
+    started_at: float
+    finished_at: float
+
+    @property
+    def latency(self) -> float:
+        """Seconds from submitting the job to its result."""
+        return self.finished_at - self.queued_at
+
+
+@dataclass
+class _Job:
+    key: str
+    job_id: int
+    work: Callable[[], Any]
+    on_done: Callable[[JobResult], None] | None
+    on_error: Callable[[JobResult], None] | None
+    queued_at: float
+
+
+class JobLane:
+    """A worker thread that runs its jobs one at a time, in the order their keys were first queued.
+
+    Submitting a job whose key is already waiting replaces the waiting one, so a burst of
+    clicks runs once. A job that was already running when a newer one with the same key came
+    in finishes, but its result is dropped as stale.
+    """
+
+    def __init__(self, name: str, results: queue.Queue) -> None:
+        self.name = name
+        self._results = results
+        self._condition = threading.Condition()
+        self._pending: dict[str, _Job] = {}
+        self._latest: dict[str, int] = {}
+        self._running: _Job | None = None
+        self._running_since = 0.0
+        self._next_id = 0
+        self._closed = False
+        self.coalesced = 0
+        self.last_latency: float | None = None
+        self._thread = threading.Thread(target=self._run, name=f'{name}-lane', daemon=True)
+        self._thread.start()
+
+    def submit(self, key: str, work: Callable[[], Any], on_done: Callable[[JobResult], None] | None = None,
+               on_error: Callable[[JobResult], None] | None = None) -> int:
+        """Queue work under key, replacing a job with the same key that hasn't started yet."""
+        with self._condition:
+            self._next_id += 1
+            if key in self._pending:
+                self.coalesced += 1
+            self._pending[key] = _Job(key, self._next_id, work, on_done, on_error, time.perf_counter())
+            self._latest[key] = self._next_id
+            self._condition.notify()
+            return self._next_id
+
+    def is_current(self, result: JobResult) -> bool:
+        """Whether no newer job with the same key has been submitted since this one."""
+        with self._condition:
+            return self._latest.get(result.key) == result.job_id
+
+    def in_flight(self) -> tuple[str, float] | None:
+        """The running job's key and how long it has been running, if any."""
+        with self._condition:
+            if self._running is None:
+                return None
+            return self._running.key, time.perf_counter() - self._running_since
+
+    @property
+    def waiting(self) -> int:
+        with self._condition:
+            return len(self._pending)
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._pending.clear()
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                # dicts keep insertion order, so the oldest waiting key goes first
+                key = next(iter(self._pending))
+                job = self._pending.pop(key)
+                self._running = job
+                self._running_since = time.perf_counter()
+
+            value, error = None, None
+            try:
+                value = job.work()
+            except BaseException as e:
+                error = e
+            finished = time.perf_counter()
+
+            with self._condition:
+                self._running = None
+                self.last_latency = finished - job.queued_at
+            result = JobResult(self.name, job.key, job.job_id, value, error, job.queued_at, self._running_since, finished)
+            self._results.put((result, job.on_error if error is not None else job.on_done))
+
+
+class JobRunner:
+    """Named job lanes whose results are handed back on the thread that calls deliver()."""
+
+    def __init__(self, lanes: tuple[str, ...]) -> None:
+        self._results: queue.Queue = queue.Queue()
+        self.lanes = {name: JobLane(name, self._results) for name in lanes}
+
+    def submit(self, lane: str, key: str, work: Callable[[], Any],
+               on_done: Callable[[JobResult], None] | None = None,
+               on_error: Callable[[JobResult], None] | None = None) -> int:
+        """Run work on the lane, on_done is called with the result by the next deliver().
+
+        If work raises, the error is printed and on_error gets the result instead.
+        """
+        return self.lanes[lane].submit(key, work, on_done, on_error)
+
+    def deliver(self) -> int:
+        """Call back for every finished job that is still current, return how many were delivered.
+
+        A callback that raises is printed and skipped, so one bad result can't stop the rest.
+        """
+        delivered = 0
+        while True:
+            try:
+                result, callback = self._results.get_nowait()
+            except queue.Empty:
+                return delivered
+            if result.error is not None:
+                traceback.print_exception(result.error)
+            if callback is None or not self.lanes[result.lane].is_current(result):
+                continue
+            try:
+                callback(result)
+            except Exception:
+                traceback.print_exc()
+            delivered += 1
+
+    def status(self) -> str:
+        """One line per lane with the running job's age or the last job's latency."""
+        lines = []
+        for name, lane in self.lanes.items():
+            running = lane.in_flight()
+            if running is not None:
+                text = f'{name}: {running[0]} running {running[1] * 1000:.0f} ms'
+            elif lane.last_latency is not None:
+                text = f'{name}: idle, last {lane.last_latency * 1000:.0f} ms'
+            else:
+                text = f'{name}: idle'
+            if lane.waiting:
+                text += f', {lane.waiting} waiting'
+            if lane.coalesced:
+                text += f', {lane.coalesced} coalesced'
+            lines.append(text)
+        return '\n'.join(lines)
+
+    def close(self) -> None:
+        for lane in self.lanes.values():
+            lane.close()
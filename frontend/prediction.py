@@ -0,0 +1,135 @@
+import os
+import time
+
+import numpy as np
+
+from .driver import MoveInfo
+from .conversion import FeatureEncoder, TurnState
+from .dense_model import dense_model_path_for, load_dense_model
+from .vocabulary import load_moves
+from .feature_schema import FeatureSchema, load_feature_schema, save_feature_schema, schema_from_scaler, schema_path_for
+
+
+def _fit_legacy_schema(scaler_data_path: str, move_data_path: str, n_outputs: int) -> FeatureSchema:
+    """Fit a schema from the training csv for models saved before train2 wrote one."""
+    import pandas as pd
+    from sklearn.preprocessing import MinMaxScaler
+
+    df_to_scale = pd.read_csv(scaler_data_path)
+    X_train = df_to_scale.drop(columns=['PlayerMove'])
+    scaler = MinMaxScaler()
+    scaler.fit(X_train)
+
+    # older models output one unit per move id
+    move_ids = np.arange(n_outputs)
+    move_names = load_moves(move_data_path).names_for(move_ids.tolist())
+    return schema_from_scaler(X_train.columns, scaler, move_ids, move_names)
+
+
+def _choose_backend(model_path: str, backend: str) -> str:
+    """Resolve 'auto' to 'numpy' when exported weights at least as new as the model exist."""
+    if backend != 'auto':
+        return backend
+    dense_path = dense_model_path_for(model_path)
+    if os.path.exists(dense_path) and (
+            not os.path.exists(model_path) or os.path.getmtime(dense_path) >= os.path.getmtime(model_path)):
+        return 'numpy'
+    return 'keras'
+
+
+class PredictionSession:
+    """Keeps the model, scaler parameters and move maps loaded between predictions.
+
+    backend 'numpy' runs the weights export_model wrote next to the model without importing
+    TensorFlow, 'keras' loads the model itself and 'auto' picks numpy when the export is current.
+    """
+
+    model_path: str
+    backend: str
+    schema: FeatureSchema
+    encoder: FeatureEncoder
+
+    cold_start_seconds: float
+    warm_latencies: list[float]
+
+    def __init__(
+        self,
+        model_path: str = 'model.h5',
+        scaler_data_path: str = 'final_moves.csv',
+        move_data_path: str = 'move_data.xlsx',
+        pokemon_data_path: str = 'pkmn_data.csv',
+        backend: str = 'auto',
+    ) -> None:
+        """Load everything a prediction needs and run one warm-up pass."""
+        start = time.perf_counter()
+        self.model_path = model_path
+        self.backend = _choose_backend(model_path, backend)
+        if self.backend == 'numpy':
+            self.model = load_dense_model(dense_model_path_for(model_path))
+            n_outputs = self.model.output_width
+        elif self.backend == 'keras':
+            from keras.models import load_model
+            self.model = load_model(model_path)
+            n_outputs = self.model.output_shape[-1]
+        else:
+            raise ValueError(f"Unknown prediction backend {backend!r}, expected 'auto', 'numpy' or 'keras'.")
+
+        schema_path = schema_path_for(model_path)
+        if os.path.exists(schema_path):
+            self.schema = load_feature_schema(schema_path)
+        else:
+            # write the sidecar so only the first start pays for the csv parse
+            self.schema = _fit_legacy_schema(scaler_data_path, move_data_path, n_outputs)
+            save_feature_schema(schema_path, self.schema)
+        self._scale = self.schema.scale.astype(np.float32)
+        self._offset = self.schema.offset.astype(np.float32)
+
+        self.encoder = FeatureEncoder.from_file(pokemon_data_path, self.schema.columns)
+        self._row = np.zeros((1, self.encoder.width), dtype=np.float32)
+
+        # the first call into the model builds its graph, do it now instead of on the first turn
+        self._forward(self._row)
+
+        self.cold_start_seconds = time.perf_counter() - start
+        self.warm_latencies = []
+
+    def _forward(self, scaled: np.ndarray) -> np.ndarray:
+        """Run a single forward pass without the overhead of model.predict."""
+        if self.backend == 'numpy':
+            return self.model.forward(scaled)
+        return self.model(scaled, training=False).numpy()
+
+    def predict(self, state: TurnState) -> np.ndarray:
+        """Return the move probabilities for one turn."""
+        start = time.perf_counter()
+        row = self._row
+        self.encoder.encode(state, row[0])
+        row *= self._scale
+        row += self._offset
+        pred = self._forward(row)[0]
+        self.warm_latencies.append(time.perf_counter() - start)
+        return pred
+
+    def predict_many(self, states: list[TurnState]) -> np.ndarray:
+        """Return the move probabilities for a batch of turns, one row per state."""
+        X = self.encoder.encode_many(states)
+        X *= self._scale
+        X += self._offset
+        return self._forward(X)
+
+    def rank_moves(self, pred: np.ndarray, moves: list[MoveInfo]) -> list[str]:
+        """Format the available moves (and switching) by descending probability."""
+        available = {move.name for move in moves}
+        available.add('switch')
+        move_names = self.schema.move_names
+        sorted_indices = np.argsort(-pred)
+        return [f'{move_names[index]}: {(pred[index]*100):.2f}%' for index in sorted_indices if move_names[index] in available]
+
+    def latency_summary(self) -> str:
+        """Return the cold-start and warm prediction latencies as a display string."""
+        summary = f'Cold start: {self.cold_start_seconds * 1000:.0f} ms ({self.backend})'
+        if self.warm_latencies:
+            last = self.warm_latencies[-1] * 1000
+            mean = sum(self.warm_latencies) / len(self.warm_latencies) * 1000
+            summary += f'\nWarm: {last:.1f} ms (mean {mean:.1f} ms over {len(self.warm_latencies)})'
+        return summary
@@ -0,0 +1,124 @@
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Callable
+
+VOCABULARY_VERSION = 1
+
+# The label a turn gets when the player switched instead of using a move
+SWITCH_MOVE_ID = 0
+
+# (path, kind) -> (source key, value), so repeated loads in one process skip the disk too
+_loaded: dict[tuple[str, str], tuple[tuple, Any]] = {}
+
+
+@dataclass
+class MoveVocabulary:
+    """The move ids in label order and the maps between move names and ids."""
+    ids: list[int]
+    name_to_id: dict[str, int]
+    id_to_name: dict[int, str]
+
+    def names_for(self, move_ids) -> list[str]:
+        """Return display names for move ids, where id 0 is switching."""
+        return [str(self.id_to_name.get(move_id, 'switch' if move_id == SWITCH_MOVE_ID else move_id))
+                for move_id in move_ids]
+
+
+@dataclass
+class SpeciesColumns:
+    """One entry per row of the species table, in file order."""
+    names: list[str]
+    numbers: list[float]
+    stats: list[list[int]]
+    types: list[list[str | None]]
+
+
+def _read_table(path: str):
+    import pandas as pd
+
+    if path.endswith('.csv'):
+        return pd.read_csv(path)
+    return pd.read_excel(path, sheet_name=0)
+
+
+def _build_moves(path: str) -> MoveVocabulary:
+    df = _read_table(path)
+    # the first column holds the ids, sorted when they are all numbers
+    ids = df.iloc[:, 0].unique().tolist()
+    if all(isinstance(move, (int, float)) for move in ids):
+        ids.sort()
+    # later rows win on duplicates, like pd.Series(...).to_dict()
+    return MoveVocabulary(
+        ids=ids,
+        name_to_id=dict(zip(df['name'].tolist(), df['id'].tolist())),
+        id_to_name=dict(zip(df['id'].tolist(), df['name'].tolist())),
+    )
+
+
+def _build_species(path: str) -> SpeciesColumns:
+    df = _read_table(path)
+    types = [[value if isinstance(value, str) else None for value in row] for row in df[['Type 1', 'Type 2']].values.tolist()]
+    return SpeciesColumns(
+        names=df['Name'].tolist(),
+        numbers=df['Number'].astype(float).tolist(),
+        stats=df[['HP', 'Atk', 'Def', 'SpA', 'SpD', 'Spe']].astype(int).values.tolist(),
+        types=types,
+    )
+
+
+def cache_path_for(path: str, kind: str) -> str:
+    """Return where the compiled form of a source table is cached."""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, '.vocabulary_cache', f'{name}.{kind}.pickle')
+
+
+def _source_key(path: str) -> tuple:
+    stat = os.stat(path)
+    return (VOCABULARY_VERSION, stat.st_mtime_ns, stat.st_size)
+
+
+def _load_cached(path: str, kind: str, build: Callable[[str], Any]) -> Any:
+    """Load a table compiled from path, rebuilding it when the source file has changed."""
+    key = _source_key(path)
+    loaded = _loaded.get((path, kind))
+    if loaded is not None and loaded[0] == key:
+        return loaded[1]
+
+    cache_path = cache_path_for(path, kind)
+    value = None
+    try:
+        with open(cache_path, 'rb') as f:
+            cached_key, cached_value = pickle.load(f)
+        if cached_key == key:
+            value = cached_value
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+        pass
+
+    if value is None:
+        value = build(path)
+        directory = os.path.dirname(cache_path)
+        os.makedirs(directory, exist_ok=True)
+        # write through a temp file so a concurrent reader never sees half a cache
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    _loaded[(path, kind)] = (key, value)
+    return value
+
+
+def load_moves(path: str = 'moves.xlsx') -> MoveVocabulary:
+    """Load the move vocabulary from a moves spreadsheet or csv."""
+    return _load_cached(path, 'moves', _build_moves)
+
+
+def load_species(path: str = 'better_pkmn_data.xlsx') -> SpeciesColumns:
+    """Load the species names, numbers, base stats and types from a spreadsheet or csv."""
+    return _load_cached(path, 'species', _build_species)
@@ -0,0 +1,109 @@
+import tkinter
+from tkinter import ttk
+
+
+class LabelStack:
+    """Labels packed into a parent, one per line, that an update reconfigures in place.
+
+    The text each label shows is kept here so an update compares strings instead of asking Tk,
+    and only labels whose line changed are touched. Lines past the old count get new labels and
+    labels past the new count are destroyed.
+    """
+
+    def __init__(self, parent: tkinter.Misc, **pack) -> None:
+        self.parent = parent
+        self.pack = pack or {'side': tkinter.TOP}
+        self.labels: list[ttk.Label] = []
+        self.lines: list[str] = []
+
+    @classmethod
+    def adopt(cls, parent: tkinter.Misc, **pack) -> 'LabelStack':
+        """Take over the labels a parent was built with, e.g. the 'Unknown' placeholders."""
+        stack = cls(parent, **pack)
+        for child in parent.winfo_children():
+            if isinstance(child, ttk.Label):
+                stack.labels.append(child)
+                stack.lines.append(str(child.cget('text')))
+        return stack
+
+    def update(self, lines: list[str]) -> int:
+        """Show lines, return how many labels were reconfigured, created or destroyed."""
+        changed = 0
+        for i, line in enumerate(lines):
+            if i < len(self.labels):
+                if self.lines[i] != line:
+                    self.labels[i].configure(text=line)
+                    self.lines[i] = line
+                    changed += 1
+            else:
+                label = ttk.Label(self.parent, text=line)
+                label.pack(**self.pack)
+                self.labels.append(label)
+                self.lines.append(line)
+                changed += 1
+        while len(self.labels) > len(lines):
+            self.labels.pop().destroy()
+            self.lines.pop()
+            changed += 1
+        return changed
+
+
+class LabelColumns:
+    """Side by side columns of labels, e.g. one per pokemon, diffed column by column.
+
+    subframes is the list the GUI keeps for the frame. It is kept in step with the columns, so
+    code holding on to it still sees the frames that are on screen.
+    """
+
+    def __init__(self, frame: ttk.Frame, subframes: list[ttk.Frame]) -> None:
+        self.frame = frame
+        self.subframes = subframes
+        self.columns = [LabelStack.adopt(subframe, side=tkinter.TOP) for subframe in subframes]
+
+    def update(self, info: list[list[str]]) -> int:
+        """Show one column per entry of info, return how many widgets changed."""
+        changed = 0
+        for i, lines in enumerate(info):
+            if i == len(self.columns):
+                subframe = ttk.Frame(self.frame)
+                subframe.pack(side=tkinter.LEFT, padx=5)
+                self.subframes.append(subframe)
+                self.columns.append(LabelStack(subframe, side=tkinter.TOP))
+            changed += self.columns[i].update(lines)
+        while len(self.columns) > len(info):
+            self.columns.pop()
+            self.subframes.pop().destroy()
+            changed += 1
+        return changed
+
+
+class TreeRows:
+    """The children of one Treeview item, renamed in place instead of deleted and reinserted.
+
+    Rows are named f'{prefix}_{index}', so a selected row stays selected while its text changes.
+    """
+
+    def __init__(self, tree: ttk.Treeview, parent: str, prefix: str) -> None:
+        self.tree = tree
+        self.parent = parent
+        self.prefix = prefix
+        self.texts: list[str] = []
+
+    def update(self, texts: list[str]) -> int:
+        """Show one row per text, return how many rows were renamed, inserted or deleted."""
+        changed = 0
+        for i, text in enumerate(texts):
+            if i < len(self.texts):
+                if self.texts[i] != text:
+                    self.tree.item(f'{self.prefix}_{i}', text=text)
+                    self.texts[i] = text
+                    changed += 1
+            else:
+                self.tree.insert(self.parent, 'end', f'{self.prefix}_{i}', text=text)
+                self.texts.append(text)
+                changed += 1
+        while len(self.texts) > len(texts):
+            self.texts.pop()
+            self.tree.delete(f'{self.prefix}_{len(self.texts)}')
+            changed += 1
+        return changed
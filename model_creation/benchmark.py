@@ -0,0 +1,398 @@
+import copy
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from frontend import vocabulary
+from frontend.dense_model import dense_model_path_for, load_dense_model
+from frontend.battle_state import BOOSTS, SIDE_CONDITIONS, BattleState
+from .export_model import check_export, export_model
+from .parse2 import parse_log
+from .species_index import SpeciesIndex
+
+
+class _ScanningIds:
+    # Resolves names with a full DataFrame scan, the way parse2 looked species up before SpeciesIndex
+    def __init__(self, df):
+        self.df = df
+
+    def __getitem__(self, name):
+        return self.df.loc[self.df['Name'] == name].index[0]
+
+
+def _normalize(actions):
+    # NaN types from the DataFrame and None from the index both end up as empty csv cells
+    return [{key: None if value != value else value for key, value in action.items()} for action in actions]
+
+
+def benchmark_species_lookup(log_files, moves_file='moves.xlsx', pkmn_file='better_pkmn_data.xlsx', repeat=3):
+    logs = []
+    for log_file in log_files:
+        with open(log_file, 'r', encoding='utf-8') as f:
+            logs.append(f.read())
+
+    hash_moves = vocabulary.load_moves(moves_file).name_to_id
+    df = pd.read_excel(pkmn_file)
+
+    indexed = SpeciesIndex.from_dataframe(df)
+    scanning = SpeciesIndex.from_dataframe(df)
+    scanning.ids = _ScanningIds(df)
+
+    results = {}
+    outputs = {}
+    for label, species in (('scan', scanning), ('index', indexed)):
+        best = None
+        for _ in range(repeat):
+            actions = []
+            start = time.perf_counter()
+            for log in logs:
+                try:
+                    parse_log(log, actions, species, hash_moves)
+                except Exception as e:
+                    print(e)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[label] = len(logs) / best
+        outputs[label] = _normalize(actions)
+        print(f'{label}: {results[label]:.1f} replays/s ({len(actions)} actions)')
+
+    if outputs['scan'] != outputs['index']:
+        raise AssertionError('species index produced different rows than the DataFrame scan')
+    print(f"speedup: {results['index'] / results['scan']:.1f}x")
+    return results
+
+
+# Run in a fresh interpreter so each load starts from a clean heap. VmHWM is the peak rss of this process
+# alone (ru_maxrss can carry over from the parent), resource is the fallback off linux.
+_LOAD_SCRIPT = """
+import json, sys, time
+from model_creation.turn_table import read_turn_table
+start = time.perf_counter()
+df = read_turn_table(sys.argv[1])
+df.sum(numeric_only=True)
+elapsed = time.perf_counter() - start
+try:
+    with open('/proc/self/status') as f:
+        peak_kb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM'))
+except OSError:
+    import resource
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'seconds': elapsed, 'peak_rss_mb': peak_kb / 1024, 'rows': len(df)}))
+"""
+
+
+def benchmark_table_load(csv_file, columnar_dir, repeat=3):
+    results = {}
+    for label, path in (('csv', csv_file), ('columnar', columnar_dir)):
+        runs = []
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, '-c', _LOAD_SCRIPT, path], capture_output=True, text=True,
+                                    check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        best = min(runs, key=lambda run: run['seconds'])
+        results[label] = best
+        print(f"{label}: {best['seconds'] * 1000:.1f} ms, peak rss {best['peak_rss_mb']:.0f} MB ({best['rows']} rows)")
+    print(f"speedup: {results['csv']['seconds'] / results['columnar']['seconds']:.1f}x")
+    return results
+
+
+def benchmark_vocabulary_load(moves_file='moves.xlsx', pkmn_file='better_pkmn_data.xlsx', repeat=3):
+    results = {}
+    for label, path, build, load in (('moves', moves_file, vocabulary._build_moves, vocabulary.load_moves),
+                                     ('species', pkmn_file, vocabulary._build_species, vocabulary.load_species)):
+        start = time.perf_counter()
+        build(path)
+        parse_seconds = time.perf_counter() - start
+        load(path)
+        best = None
+        for _ in range(repeat):
+            # drop the in-process copy so every run reads the cache file
+            vocabulary._loaded.clear()
+            start = time.perf_counter()
+            load(path)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[label] = {'parse_seconds': parse_seconds, 'cached_seconds': best}
+        print(f'{label}: parse {parse_seconds * 1000:.1f} ms, cached {best * 1000:.2f} ms')
+    return results
+
+
+def benchmark_turn_snapshot(log_file, repeat=10000):
+    # Compares taking a TurnSnapshot against deep-copying the nested lists parse2 used to alias
+    with open(log_file, 'r', encoding='utf-8') as f:
+        lines = f.read().split('\n')
+    state = BattleState()
+    for line in lines:
+        if state.apply(line) == 'turn':
+            break
+    nested = [[list(side.species), list(side.hp), [0] * len(side.species)] for side in state.sides]
+    boosts = [dict(zip(BOOSTS, side.boosts)) for side in state.sides]
+    hazards = [dict(zip(SIDE_CONDITIONS, side.conditions)) for side in state.sides]
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        state.snapshot()
+    snapshot_us = (time.perf_counter() - start) / repeat * 1e6
+    start = time.perf_counter()
+    for _ in range(repeat):
+        copy.deepcopy((nested, boosts, hazards))
+    deepcopy_us = (time.perf_counter() - start) / repeat * 1e6
+    print(f'snapshot: {snapshot_us:.2f} us, deepcopy: {deepcopy_us:.2f} us ({deepcopy_us / snapshot_us:.0f}x)')
+    return {'snapshot_us': snapshot_us, 'deepcopy_us': deepcopy_us}
+
+
+def check_dense_parity(model_file, rows=1024, seed=0, atol=1e-4):
+    # Exports the model and checks the NumPy forward pass against model.predict on random scaled rows
+    from keras.models import load_model
+
+    model = load_model(model_file)
+    dense_model = load_dense_model(export_model(model_file))
+    X = np.random.default_rng(seed).random((rows, dense_model.input_width), dtype=np.float32)
+    expected = model.predict(X, verbose=0)
+    actual = dense_model.forward(X)
+
+    max_error = float(np.abs(expected - actual).max())
+    same_top = float((expected.argmax(axis=1) == actual.argmax(axis=1)).mean())
+    print(f'max abs error {max_error:.2e}, same top move on {same_top * 100:.1f}% of {rows} rows')
+    if max_error > atol:
+        raise AssertionError(f'numpy backend differs from model.predict by {max_error:.2e} (atol {atol:.0e})')
+    return {'max_error': max_error, 'same_top': same_top}
+
+
+# Loads a model and runs one row in a fresh interpreter, so import time and rss are counted from zero
+_PREDICTION_STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import numpy as np
+if sys.argv[2] == 'numpy':
+    from frontend.dense_model import dense_model_path_for, load_dense_model
+    model = load_dense_model(dense_model_path_for(sys.argv[1]))
+    model.forward(np.zeros((1, model.input_width), dtype=np.float32))
+else:
+    from keras.models import load_model
+    model = load_model(sys.argv[1])
+    model(np.zeros((1, model.input_shape[-1]), dtype=np.float32), training=False)
+elapsed = time.perf_counter() - start
+try:
+    with open('/proc/self/status') as f:
+        peak_kb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM'))
+except OSError:
+    import resource
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'seconds': elapsed, 'peak_rss_mb': peak_kb / 1024, 'tensorflow': 'tensorflow' in sys.modules}))
+"""
+
+
+def benchmark_prediction_startup(model_file, repeat=3):
+    if not os.path.exists(dense_model_path_for(model_file)):
+        export_model(model_file)
+    results = {}
+    for backend in ('keras', 'numpy'):
+        runs = []
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, '-c', _PREDICTION_STARTUP_SCRIPT, model_file, backend],
+                                    capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        best = min(runs, key=lambda run: run['seconds'])
+        results[backend] = best
+        print(f"{backend}: {best['seconds'] * 1000:.0f} ms, peak rss {best['peak_rss_mb']:.0f} MB, "
+              f"tensorflow imported: {best['tensorflow']}")
+    print(f"speedup: {results['keras']['seconds'] / results['numpy']['seconds']:.1f}x")
+    return results
+
+
+def _rebuild_info_frame(frame, subframes, info):
+    # What GUI.update_info_frame did before LabelColumns: tear every column down and build it again
+    from tkinter import ttk
+    for subframe in subframes:
+        subframe.destroy()
+    subframes.clear()
+    for info_lines in info:
+        subframe = ttk.Frame(frame)
+        subframe.pack(side='left', padx=5)
+        for line in info_lines:
+            ttk.Label(subframe, text=line).pack(side='top')
+        subframes.append(subframe)
+    frame.update()
+
+
+class _RebuildStack:
+    # update_selection_frame before LabelStack, every label destroyed and recreated
+    def __init__(self, parent):
+        self.parent = parent
+
+    def update(self, lines):
+        from tkinter import ttk
+        for child in self.parent.winfo_children():
+            child.destroy()
+        for line in lines:
+            ttk.Label(self.parent, text=line).pack(side='top', anchor='w', pady=3)
+        return len(lines)
+
+
+class _RebuildRows:
+    # update_tree_teams before TreeRows, every row deleted and reinserted
+    def __init__(self, tree, parent, prefix):
+        self.tree, self.parent, self.prefix = tree, parent, prefix
+
+    def update(self, texts):
+        for child in self.tree.get_children(self.parent):
+            self.tree.delete(child)
+        for i, text in enumerate(texts):
+            self.tree.insert(self.parent, 'end', f'{self.prefix}_{i}', text=text)
+        return len(texts)
+
+
+def _battle_info(rng):
+    from frontend.driver import BattlefieldInfo, ModifierInfo, MoveInfo, PokemonInfo, StartingPokemonInfo
+
+    my_team = [StartingPokemonInfo(f'Pokemon {k}', None, ['Water', 'Ground'], 'Fire', 'F', 100.0, 300, 'Ability',
+                                   'Leftovers', 200, 210, 150, 160, 180, ['Surf', 'Earthquake', 'Protect', 'Toxic'])
+               for k in range(6)]
+    enemy_team = [PokemonInfo(f'Enemy {k}', None, 'M', 100.0, None, ['Ability A', 'Ability B'], (150, 250))
+                  for k in range(6)]
+    moves = [MoveInfo(name, 'Normal', int(rng.integers(5, 33))) for name in ('Surf', 'Earthquake', 'Protect', 'Toxic')]
+    my_status = ModifierInfo('Pokemon 0', 0, 0, 0, 0, 0, 0, 0, *([False] * 8))
+    enemy_status = ModifierInfo('Enemy 0', 0, 0, 0, 0, 0, 0, 0, *([False] * 8))
+    battlefield = BattlefieldInfo(None, None, [], [], [], ['Stealth Rock'])
+    return [my_team, enemy_team, moves, my_status, enemy_status, battlefield]
+
+
+def _next_turn(info, rng):
+    # A turn changes a few numbers, the way a refresh during a battle usually does
+    my_team, enemy_team, moves, my_status, enemy_status, battlefield = info
+    enemy_team[0].hp_percent = float(rng.integers(0, 101))
+    my_team[0].hp_percent = float(rng.integers(0, 101))
+    move = moves[int(rng.integers(0, len(moves)))]
+    move.moves_left = max(move.moves_left - 1, 0)
+    my_status.atk = int(rng.integers(-6, 7))
+    return tuple(info)
+
+
+def benchmark_gui_refresh(frames=300, seed=0):
+    # Stress test for the info frames, the team tree and the selection frame. Pushes a new turn into
+    # the GUI and paints it, frames times, once diffing the widgets and once rebuilding them.
+    # Needs a display to open the window on.
+    from frontend.gui import GUI
+
+    results = {}
+    for mode in ('rebuild', 'diff'):
+        gui = GUI('GUI refresh benchmark', '1400x900')
+        gui._near_team_info_frame, gui._near_team_info_subframes = gui._add_team_info('Your Team')
+        gui._far_team_info_frame, gui._far_team_info_subframes = gui._add_team_info('Enemy Team')
+        gui._move_info_frame, gui._move_info_subframes = gui._add_move_info()
+        gui._status_info_frame, gui._status_info_subframes = gui._add_status_info()
+        gui._battlefield_info_frame, gui._battlefield_info_subframes = gui.add_battlefield_info()
+        if mode == 'rebuild':
+            gui.update_info_frame = _rebuild_info_frame
+            gui._selection_view = _RebuildStack(gui._treeview_info_frame)
+            gui._tree_rows = {'near_team': _RebuildRows(gui.tree, 'near_team', 'near_pokemon'),
+                              'far_team': _RebuildRows(gui.tree, 'far_team', 'far_pokemon')}
+
+        rng = np.random.default_rng(seed)
+        info = _battle_info(rng)
+        gui._apply_all_info(tuple(info))
+        gui.window.update()
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            gui._apply_all_info(_next_turn(info, rng))
+            gui.window.update()
+        elapsed = time.perf_counter() - start
+        gui.jobs.close()
+        gui.window.destroy()
+
+        results[mode] = frames / elapsed
+        print(f'{mode}: {results[mode]:.1f} refreshes/s ({elapsed / frames * 1000:.2f} ms each)')
+    print(f"speedup: {results['diff'] / results['rebuild']:.1f}x")
+    return results
+
+
+def check_switch_labels(log_files, moves_file='moves.xlsx', pkmn_file='better_pkmn_data.xlsx'):
+    # Parses the logs into a columnar table and streams it back the way train2 does. Every switch
+    # has to come out with the switch label, and every other row with a move from the vocabulary.
+    import tempfile
+    from frontend.vocabulary import SWITCH_MOVE_ID
+    from .input_pipeline import TurnTableStream
+    from .turn_table import ColumnarTurnTableWriter
+
+    moves = vocabulary.load_moves(moves_file)
+    species = SpeciesIndex.from_file(pkmn_file)
+    move_list = [SWITCH_MOVE_ID] + [move_id for move_id in moves.ids if move_id != SWITCH_MOVE_ID]
+
+    switches = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'turns.cols')
+        with ColumnarTurnTableWriter(path) as actions:
+            for log_file in log_files:
+                with open(log_file, 'r', encoding='utf-8') as f:
+                    log = f.read()
+                parse_log(log, actions, species, moves.name_to_id)
+
+                # Count the switches the parser saw, straight from the battle state
+                counted = []
+                state = BattleState(on_action=lambda state, user, move, switch: counted.append(switch is not None))
+                for line in log.split('\n'):
+                    if state.apply(line) == 'win':
+                        break
+                switches += sum(counted)
+
+        table = TurnTableStream(path)
+        labels = np.asarray(table.columns['PlayerMove'])
+        unknown = sorted(set(labels.tolist()) - set(move_list))
+        if unknown:
+            raise AssertionError(f'labels outside the move vocabulary: {unknown[:10]}')
+
+        schema = table.fit_schema(None, move_list, moves.names_for(move_list))
+        y = np.concatenate([batch_y for _, batch_y in table.batches(schema, None, 4096)])
+
+    if switches == 0:
+        raise AssertionError('the logs have no switches to check')
+    if len(y) != len(labels) or int((y == 0).sum()) != switches:
+        raise AssertionError(f'{switches} switches but {int((y == 0).sum())} rows labelled switch '
+                             f'out of {len(y)} streamed and {len(labels)} written')
+    print(f'{switches} switches of {len(y)} rows labelled {SWITCH_MOVE_ID}')
+    return {'rows': len(y), 'switches': switches}
+
+
+def check_tiny_export(seed=0, atol=1e-5):
+    # Builds a small model laid out like train2's, Dense -> BatchNormalization -> Dropout blocks
+    # with non-trivial moving statistics, exports it and checks the saved NumPy model against
+    # model.predict. Runs in seconds, so it can guard every change to the export.
+    import tempfile
+    from keras.models import Model
+    from keras.layers import Input, Dense, Dropout, BatchNormalization
+
+    rng = np.random.default_rng(seed)
+    input_layer = Input(shape=(12,))
+    hidden = input_layer
+    for width in (16, 8):
+        hidden = Dense(width, activation='relu')(hidden)
+        hidden = BatchNormalization()(hidden)
+        hidden = Dropout(0.3)(hidden)
+    output_layer = Dense(5, activation='softmax')(hidden)
+    model = Model(inputs=input_layer, outputs=output_layer)
+
+    for layer in model.layers:
+        if type(layer).__name__ == 'BatchNormalization':
+            gamma, beta, mean, variance = layer.get_weights()
+            layer.set_weights([
+                rng.uniform(0.5, 2, gamma.shape).astype(np.float32),
+                rng.normal(0, 0.5, beta.shape).astype(np.float32),
+                rng.normal(0, 1, mean.shape).astype(np.float32),
+                rng.uniform(0.5, 2, variance.shape).astype(np.float32),
+            ])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_file = os.path.join(tmp, 'tiny.keras')
+        model.save(model_file)
+        dense_model = load_dense_model(export_model(model_file))
+        max_error = check_export(model, dense_model, seed=seed, atol=atol)
+
+    print(f'tiny export matches model.predict, max abs error {max_error:.2e}')
+    return max_error
@@ -0,0 +1,76 @@
+import numpy as np
+
+from frontend.dense_model import ACTIVATIONS, DenseModel, dense_model_path_for, save_dense_model
+
+
+def fold_keras_model(model):
+    # Walk the layers in order, keeping Dense layers and folding everything else into them.
+    # Dropout does nothing at inference. A BatchNormalization is an affine map x * a + c, and in
+    # train2 it comes after the relu, so it can't go into the Dense before it. It goes into the
+    # next one instead: (x * a + c) @ W + b == x @ (a[:, None] * W) + (c @ W + b)
+    weights, biases, activations = [], [], []
+    pending = None
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind in ('InputLayer', 'Dropout'):
+            continue
+
+        if kind == 'BatchNormalization':
+            config = layer.get_config()
+            params = layer.get_weights()
+            gamma = params.pop(0) if config['scale'] else 1.0
+            beta = params.pop(0) if config['center'] else 0.0
+            moving_mean, moving_variance = params
+            a = gamma / np.sqrt(moving_variance + config['epsilon'])
+            c = beta - moving_mean * a
+            # Two in a row compose into one affine map
+            pending = (a, c) if pending is None else (pending[0] * a, pending[1] * a + c)
+            continue
+
+        if kind == 'Dense':
+            activation = layer.get_config()['activation']
+            if activation not in ACTIVATIONS:
+                raise ValueError(f'Cannot export {layer.name}: unsupported activation {activation}')
+            params = layer.get_weights()
+            weight = params[0].astype(np.float64)
+            bias = params[1].astype(np.float64) if len(params) > 1 else np.zeros(weight.shape[1])
+            if pending is not None:
+                a, c = pending
+                bias = c @ weight + bias
+                weight = a[:, None] * weight
+                pending = None
+            weights.append(weight.astype(np.float32))
+            biases.append(bias.astype(np.float32))
+            activations.append(activation)
+            continue
+
+        raise ValueError(f'Cannot export {layer.name}: unsupported layer {kind}')
+
+    if pending is not None:
+        raise ValueError('Cannot export a model that ends in BatchNormalization')
+    return DenseModel(weights=weights, biases=biases, activations=activations)
+
+
+def check_export(model, dense_model, rows=256, seed=0, atol=1e-4):
+    # The folded NumPy model has to give what model.predict gives, on random rows in the scaled range
+    X = np.random.default_rng(seed).random((rows, dense_model.input_width), dtype=np.float32)
+    expected = model.predict(X, verbose=0)
+    actual = dense_model.forward(X.copy())
+    max_error = float(np.abs(expected - actual).max())
+    if not np.allclose(expected, actual, atol=atol, rtol=0):
+        raise AssertionError(f'exported model differs from model.predict by {max_error:.2e} (atol {atol:.0e})')
+    return max_error
+
+
+def export_model(model_name, output_path=None):
+    # Write the weights next to the model so the GUI can predict without importing TensorFlow.
+    # Every export is checked against model.predict before it is written.
+    from keras.models import load_model
+
+    model = load_model(model_name)
+    dense_model = fold_keras_model(model)
+    max_error = check_export(model, dense_model)
+    output_path = output_path or dense_model_path_for(model_name)
+    save_dense_model(output_path, dense_model)
+    print(f'Exported {len(dense_model.weights)} dense layers to {output_path}, max abs error {max_error:.2e}')
+    return output_path
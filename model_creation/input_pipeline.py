@@ -0,0 +1,125 @@
+import os
+from typing import NamedTuple
+
+import numpy as np
+import tensorflow as tf
+
+from frontend.feature_schema import FeatureSchema
+from .turn_table import convert_csv, is_columnar, is_current_columnar, read_columns
+
+LABEL_COLUMN = 'PlayerMove'
+
+
+class RowSplit(NamedTuple):
+    """One side of a seeded split of the rows, picking the same rows every time it's read."""
+    test_size: float
+    seed: int
+    test: bool
+
+    def mask(self, chunk, rows):
+        # Seeded per chunk, so a chunk's rows land on the same side whatever order chunks are read in
+        holdout = np.random.default_rng((self.seed, int(chunk))).random(rows) < self.test_size
+        return holdout if self.test else ~holdout
+
+
+class TurnTableStream:
+    """Reads a columnar turn table in row chunks straight from its memory maps.
+
+    Only one chunk is materialized at a time, so memory depends on chunk_size and not on
+    the number of turns. A csv is converted to a columnar copy next to it the first time.
+    """
+
+    def __init__(self, path, chunk_size=65536):
+        if not is_columnar(path):
+            columnar_path = path + '.cols'
+            # Converted again when the csv changed or the copy is in an older format
+            if not is_current_columnar(columnar_path) or os.path.getmtime(columnar_path) < os.path.getmtime(path):
+                convert_csv(path, columnar_path)
+            path = columnar_path
+        self.path = path
+        self.chunk_size = chunk_size
+        self.columns, schema = read_columns(path)
+        self.feature_columns = [column for column in self.columns if column != LABEL_COLUMN]
+        self.categorical = {entry['name'] for entry in schema if 'categories' in entry}
+        self.rows = len(self.columns[LABEL_COLUMN])
+
+    @property
+    def chunk_count(self):
+        return (self.rows + self.chunk_size - 1) // self.chunk_size
+
+    def split(self, test_size=0.2, seed=42):
+        # Rows are split inside every chunk, so both sides are still read sequentially from disk
+        # and even a one chunk table gets a test_size holdout
+        return RowSplit(test_size, seed, False), RowSplit(test_size, seed, True)
+
+    def read_chunk(self, chunk, split=None):
+        # All of the chunk's rows, or only those on one side of a split
+        start = chunk * self.chunk_size
+        stop = min(start + self.chunk_size, self.rows)
+        X = np.empty((stop - start, len(self.feature_columns)), dtype=np.float32)
+        for k, column in enumerate(self.feature_columns):
+            X[:, k] = self.columns[column][start:stop]
+            if column in self.categorical:
+                # type codes line up with frontend.conversion.type_mappings, where a missing type is 0
+                np.maximum(X[:, k], 0, out=X[:, k])
+        moves = np.asarray(self.columns[LABEL_COLUMN][start:stop])
+        if split is not None:
+            mask = split.mask(chunk, stop - start)
+            X, moves = X[mask], moves[mask]
+        return X, moves
+
+    def min_max(self, split=None):
+        # One streaming pass for the MinMaxScaler parameters of the given rows
+        data_min = np.full(len(self.feature_columns), np.inf, dtype=np.float32)
+        data_max = np.full(len(self.feature_columns), -np.inf, dtype=np.float32)
+        for chunk in range(self.chunk_count):
+            X, _ = self.read_chunk(chunk, split)
+            if len(X):
+                np.minimum(data_min, X.min(axis=0), out=data_min)
+                np.maximum(data_max, X.max(axis=0), out=data_max)
+        return data_min, data_max
+
+    def fit_schema(self, split, move_ids, move_names):
+        data_min, data_max = self.min_max(split)
+        # constant columns get a range of 1 like MinMaxScaler does
+        data_range = data_max - data_min
+        data_range[data_range == 0] = 1
+        return FeatureSchema(
+            columns=list(self.feature_columns),
+            data_min=data_min,
+            scale=(1 / data_range).astype(np.float32),
+            move_ids=np.asarray(move_ids, dtype=np.int32),
+            move_names=list(move_names),
+        )
+
+    def batches(self, schema, split, batch_size, rng=None):
+        # Yields scaled (X, label index) batches, turns whose move isn't in the vocabulary are dropped
+        move_ids = np.asarray(schema.move_ids)
+        order = np.argsort(move_ids)
+        sorted_ids = move_ids[order]
+        offset = schema.offset.astype(np.float32)
+        chunks = rng.permutation(self.chunk_count) if rng is not None else range(self.chunk_count)
+        for chunk in chunks:
+            X, moves = self.read_chunk(chunk, split)
+            positions = np.clip(np.searchsorted(sorted_ids, moves), 0, len(sorted_ids) - 1)
+            known = sorted_ids[positions] == moves
+            X = X[known]
+            y = order[positions[known]].astype(np.int32)
+            X *= schema.scale
+            X += offset
+            rows = rng.permutation(len(X)) if rng is not None else np.arange(len(X))
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                yield X[batch], y[batch]
+
+    def dataset(self, schema, split, batch_size=32, shuffle=True, seed=42):
+        # Each epoch calls the generator again, the rng carries on so every epoch gets a new order
+        rng = np.random.default_rng(seed) if shuffle else None
+        signature = (
+            tf.TensorSpec(shape=(None, len(schema.columns)), dtype=tf.float32),
+            tf.TensorSpec(shape=(None,), dtype=tf.int32),
+        )
+        return tf.data.Dataset.from_generator(
+            lambda: self.batches(schema, split, batch_size, rng),
+            output_signature=signature,
+        ).prefetch(tf.data.AUTOTUNE)
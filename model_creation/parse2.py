@@ -1,210 +1,210 @@
 import logging
+import os
+import shutil
 import urllib.request
-import pandas as pd
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
 
+from frontend.battle_state import BOOSTS, SIDE_CONDITIONS, BattleState
+from frontend.conversion import convert_terrain_from_name, convert_weather_from_name
+from frontend.vocabulary import SWITCH_MOVE_ID, load_moves
+from .replay_fetcher import ReplayCache, ReplayFetcher
+from .species_index import SpeciesIndex
+from .turn_table import ColumnarTurnTableWriter, TurnTableWriter, merge_columnar
 
-def add_action(actions, hash_pkmn, hash_moves, pokemon, boosts, weather, terrain, hazards, moves, user):
+
+def add_action(actions, species, hash_moves, snapshot, user, move, switch):
     if user == 0:
         i, j = 0, 1
     else:
         i, j = 1, 0
+    player, enemy = snapshot.sides[i], snapshot.sides[j]
+    # Resolve each slot's species once, everything else is array indexing
+    player_ids = [species.ids[name] for name in player.species[:6]]
+    enemy_ids = [species.ids[name] for name in enemy.species[:6]]
+    player_types = [species.type_list(species_id) for species_id in player_ids]
+    player_stats = [species.stat_list(species_id) for species_id in player_ids]
+    enemy_types = [species.type_list(species_id) for species_id in enemy_ids]
+    enemy_stats = [species.stat_list(species_id) for species_id in enemy_ids]
+    player_boosts = dict(zip(BOOSTS, player.boosts))
+    enemy_boosts = dict(zip(BOOSTS, enemy.boosts))
+    player_conditions = dict(zip(SIDE_CONDITIONS, player.conditions))
+    enemy_conditions = dict(zip(SIDE_CONDITIONS, enemy.conditions))
+    # Statuses aren't encoded at prediction time yet, so the table keeps them at 0
+    statuses = [0] * 6
     action_info = {
-        'PlayerPkmnOnField': (hash_pkmn.loc[hash_pkmn['Name'] == pokemon[i][0][0]])['Number'],
-        'PlayerPkmnHealth': pokemon[i][1][0],
-        'PlayerPkmnStatus': pokemon[i][2][0],
-        'PlayerPkmnType1': pokemon[i][3][0][0],
-        'PlayerPkmnType2': pokemon[i][3][0][1],
-        'PlayerPkmnHP': pokemon[i][4][0][0],
-        'PlayerPkmnAtk': pokemon[i][4][0][1],
-        'PlayerPkmnDef': pokemon[i][4][0][2],
-        'PlayerPkmnSpA': pokemon[i][4][0][3],
-        'PlayerPkmnSpD': pokemon[i][4][0][4],
-        'PlayerPkmnSpe': pokemon[i][4][0][5],
-        'PlayerBenchOne': (hash_pkmn.loc[hash_pkmn['Name'] == pokemon[i][0][1]])['Number'],
-        'PlayerBenchOneHp': pokemon[i][1][1],
-        'PlayerBenchOneStatus': pokemon[i][2][1],
-        'PlayerBenchOneType1': pokemon[i][3][1][0],
-        'PlayerBenchOneType2': pokemon[i][3][1][1],
-        'PlayerBenchOneHP': pokemon[i][4][1][0],
-        'PlayerBenchOneAtk': pokemon[i][4][1][1],
-        'PlayerBenchOneDef': pokemon[i][4][1][2],
-        'PlayerBenchOneSpA': pokemon[i][4][1][3],
-        'PlayerBenchOneSpD': pokemon[i][4][1][4],
-        'PlayerBenchOneSpe': pokemon[i][4][1][5],
-        'PlayerBenchTwo': (hash_pkmn.loc[hash_pkmn['Name'] == pokemon[i][0][2]])['Number'],
-        'PlayerBenchTwoHp': pokemon[i][1][2],
-        'PlayerBenchTwoStatus': pokemon[i][2][2],
-        'PlayerBenchTwoType1': pokemon[i][3][2][0],
-        'PlayerBenchTwoType2': pokemon[i][3][2][1],
-        'PlayerBenchTwoHP': pokemon[i][4][2][0],
-        'PlayerBenchTwoAtk': pokemon[i][4][2][1],
-        'PlayerBenchTwoDef': pokemon[i][4][2][2],
-        'PlayerBenchTwoSpA': pokemon[i][4][2][3],
-        'PlayerBenchTwoSpD': pokemon[i][4][2][4],
-        'PlayerBenchTwoSpe': pokemon[i][4][2][5],
-        'PlayerBenchThree': (hash_pkmn.loc[hash_pkmn['Name'] == pokemon[i][0][3]])['Number'],
-        'PlayerBenchThreeHp': pokemon[i][1][3],
-        'PlayerBenchThreeStatus': pokemon[i][2][3],
-        'PlayerBenchThreeType1': pokemon[i][3][3][0],
-        'PlayerBenchThreeType2': pokemon[i][3][3][1],
-        'PlayerBenchThreeHP': pokemon[i][4][3][0],
-        'PlayerBenchThreeAtk': pokemon[i][4][3][1],
-        'PlayerBenchThreeDef': pokemon[i][4][3][2],
-        'PlayerBenchThreeSpA': pokemon[i][4][3][3],
-        'PlayerBenchThreeSpD': pokemon[i][4][3][4],
-        'PlayerBenchThreeSpe': pokemon[i][4][3][5],
-        'PlayerBenchFour': (hash_pkmn.loc[hash_pkmn['Name'] == pokemon[i][0][4]])['Number'],
-        'PlayerBenchFourHp': pokemon[i][1][4],
-        'PlayerBenchFourStatus': pokemon[i][2][4],
-        'PlayerBenchFourType1': pokemon[i][3][4][0],
-        'PlayerBenchFourType2': pokemon[i][3][4][1],
-        'PlayerBenchFourHP': pokemon[i][4][4][0],
-        'PlayerBenchFourAtk': pokemon[i][4][4][1],
-        'PlayerBenchFourDef': pokemon[i][4][4][2],
-        'PlayerBenchFourSpA': pokemon[i][4][4][3],
-        'PlayerBenchFourSpD': pokemon[i][4][4][4],
-        'PlayerBenchFourSpe': pokemon[i][4][4][5],
-        'PlayerBenchFive': (hash_pkmn.loc[hash_pkmn['Name'] == pokemon[i][0][5]])['Number'],
-        'PlayerBenchFiveHp': pokemon[i][1][5],
-        'PlayerBenchFiveStatus': pokemon[i][2][5],
-        'PlayerBenchFiveType1': pokemon[i][3][5][0],
-        'PlayerBenchFiveType2': pokemon[i][3][5][1],
-        'PlayerBenchFiveHP': pokemon[i][4][5][0],
-        'PlayerBenchFiveAtk': pokemon[i][4][5][1],
-        'PlayerBenchFiveDef': pokemon[i][4][5][2],
-        'PlayerBenchFiveSpA': pokemon[i][4][5][3],
-        'PlayerBenchFiveSpD': pokemon[i][4][5][4],
-        'PlayerBenchFiveSpe': pokemon[i][4][5][5],
-        'PlayerBoostAtk': boosts[i]["atk"],
-        'PlayerBoostDef': boosts[i]["def"],
-        'PlayerBoostSpa': boosts[i]["spa"],
-        'PlayerBoostSpd': boosts[i]["spd"],
-        'PlayerBoostSpe': boosts[i]["spe"],
-        'PlayerBoostEva': boosts[i]["evasion"],
-        'PlayerBoostAcc': boosts[i]["accuracy"],
-        'EnemyPkmnOnField': (hash_pkmn.loc[hash_pkmn['Name'] == pokemon[j][0][0]])['Number'],
-        'EnemyPkmnHealth': pokemon[j][1][0],
-        'EnemyPkmnStatus': pokemon[j][2][0],
-        'EnemyPkmnType1': pokemon[j][3][0][0],
-        'EnemyPkmnType2': pokemon[j][3][0][1],
-        'EnemyPkmnHP': pokemon[j][4][0][0],
-        'EnemyPkmnAtk': pokemon[j][4][0][1],
-        'EnemyPkmnDef': pokemon[j][4][0][2],
-        'EnemyPkmnSpA': pokemon[j][4][0][3],
-        'EnemyPkmnSpD': pokemon[j][4][0][4],
-        'EnemyPkmnSpe': pokemon[j][4][0][5],
-        'EnemyBenchOne': (hash_pkmn.loc[hash_pkmn['Name'] == pokemon[j][0][1]])['Number'],
-        'EnemyBenchOneHp': pokemon[j][1][1],
-        'EnemyBenchOneStatus': pokemon[j][2][1],
-        'EnemyBenchOneType1': pokemon[j][3][1][0],
-        'EnemyBenchOneType2': pokemon[j][3][1][1],
-        'EnemyBenchOneHP': pokemon[j][4][1][0],
-        'EnemyBenchOneAtk': pokemon[j][4][1][1],
-        'EnemyBenchOneDef': pokemon[j][4][1][2],
-        'EnemyBenchOneSpA': pokemon[j][4][1][3],
-        'EnemyBenchOneSpD': pokemon[j][4][1][4],
-        'EnemyBenchOneSpe': pokemon[j][4][1][5],
-        'EnemyBenchTwo': (hash_pkmn.loc[hash_pkmn['Name'] == pokemon[j][0][3]])['Number'],
-        'EnemyBenchTwoHp': pokemon[j][1][2],
-        'EnemyBenchTwoStatus': pokemon[j][2][2],
-        'EnemyBenchTwoType1': pokemon[j][3][2][0],
-        'EnemyBenchTwoType2': pokemon[j][3][2][1],
-        'EnemyBenchTwoHP': pokemon[j][4][2][0],
-        'EnemyBenchTwoAtk': pokemon[j][4][2][1],
-        'EnemyBenchTwoDef': pokemon[j][4][2][2],
-        'EnemyBenchTwoSpA': pokemon[j][4][2][3],
-        'EnemyBenchTwoSpD': pokemon[j][4][2][4],
-        'EnemyBenchTwoSpe': pokemon[j][4][2][5],
-        'EnemyBenchThree': (hash_pkmn.loc[hash_pkmn['Name'] == pokemon[j][0][3]])['Number'],
-        'EnemyBenchThreeHp': pokemon[j][1][3],
-        'EnemyBenchThreeStatus': pokemon[j][2][3],
-        'EnemyBenchThreeType1': pokemon[j][3][3][0],
-        'EnemyBenchThreeType2': pokemon[j][3][3][1],
-        'EnemyBenchThreeHP': pokemon[j][4][3][0],
-        'EnemyBenchThreeAtk': pokemon[j][4][3][1],
-        'EnemyBenchThreeDef': pokemon[j][4][3][2],
-        'EnemyBenchThreeSpA': pokemon[j][4][3][3],
-        'EnemyBenchThreeSpD': pokemon[j][4][3][4],
-        'EnemyBenchThreeSpe': pokemon[j][4][3][5],
-        'EnemyBenchFour': (hash_pkmn.loc[hash_pkmn['Name'] == pokemon[j][0][4]])['Number'],
-        'EnemyBenchFourHp': pokemon[j][1][4],
-        'EnemyBenchFourStatus': pokemon[j][2][4],
-        'EnemyBenchFourType1': pokemon[j][3][4][0],
-        'EnemyBenchFourType2': pokemon[j][3][4][1],
-        'EnemyBenchFourHP': pokemon[j][4][4][0],
-        'EnemyBenchFourAtk': pokemon[j][4][4][1],
-        'EnemyBenchFourDef': pokemon[j][4][4][2],
-        'EnemyBenchFourSpA': pokemon[j][4][4][3],
-        'EnemyBenchFourSpD': pokemon[j][4][4][4],
-        'EnemyBenchFourSpe': pokemon[j][4][4][5],
-        'EnemyBenchFive': (hash_pkmn.loc[hash_pkmn['Name'] == pokemon[j][0][5]])['Number'],
-        'EnemyBenchFiveHp': pokemon[j][1][5],
-        'EnemyBenchFiveStatus': pokemon[j][2][5],
-        'EnemyBenchFiveType1': pokemon[j][3][5][0],
-        'EnemyBenchFiveType2': pokemon[j][3][5][1],
-        'EnemyBenchFiveHP': pokemon[j][4][5][0],
-        'EnemyBenchFiveAtk': pokemon[j][4][5][1],
-        'EnemyBenchFiveDef': pokemon[j][4][5][2],
-        'EnemyBenchFiveSpA': pokemon[j][4][5][3],
-        'EnemyBenchFiveSpD': pokemon[j][4][5][4],
-        'EnemyBenchFiveSpe': pokemon[j][4][5][5],
-        'EnemyBoostAtk': boosts[j]["atk"],
-        'EnemyBoostDef': boosts[j]["def"],
-        'EnemyBoostSpa': boosts[j]["spa"],
-        'EnemyBoostSpd': boosts[j]["spd"],
-        'EnemyBoostSpe': boosts[j]["spe"],
-        'EnemyBoostEva': boosts[j]["evasion"],
-        'EnemyBoostAcc': boosts[j]["accuracy"],
-        'Weather': weather,
-        'Terrain': terrain,
-        'PlayerStealthRock': hazards[i]['Stealth Rock'],
-        'PlayerSpikes': hazards[i]['Spikes'],
-        'PlayerToxicSpikes': hazards[i]['Toxic Spikes'],
-        'PlayerStickyWeb': hazards[i]['Sticky Web'],
-        'PlayerReflect': hazards[i]['Reflect'],
-        'PlayerLightScreen': hazards[i]['Light Screen'],
-        'PlayerMist': hazards[i]['Mist'],
-        'PlayerAuroraVeil': hazards[i]['Aurora Veil'],
-        'PlayerSafeguard': hazards[i]['Safeguard'],
-        'EnemyStealthRock': hazards[j]['Stealth Rock'],
-        'EnemySpikes': hazards[j]['Spikes'],
-        'EnemyToxicSpikes': hazards[j]['Toxic Spikes'],
-        'EnemyStickyWeb': hazards[j]['Sticky Web'],
-        'EnemyReflect': hazards[j]['Reflect'],
-        'EnemyLightScreen': hazards[j]['Light Screen'],
-        'EnemyMist': hazards[j]['Mist'],
-        'EnemyAuroraVeil': hazards[j]['Aurora Veil'],
-        'EnemySafeguard': hazards[j]['Safeguard'],
-        'PlayerMove': None if moves[i] is None else moves[i] if type(moves[i]) is int else hash_moves[moves[i]],
+        'PlayerPkmnOnField': species.number(player_ids[0]),
+        'PlayerPkmnHealth': player.hp[0],
+        'PlayerPkmnStatus': statuses[0],
+        'PlayerPkmnType1': player_types[0][0],
+        'PlayerPkmnType2': player_types[0][1],
+        'PlayerPkmnHP': player_stats[0][0],
+        'PlayerPkmnAtk': player_stats[0][1],
+        'PlayerPkmnDef': player_stats[0][2],
+        'PlayerPkmnSpA': player_stats[0][3],
+        'PlayerPkmnSpD': player_stats[0][4],
+        'PlayerPkmnSpe': player_stats[0][5],
+        'PlayerBenchOne': species.number(player_ids[1]),
+        'PlayerBenchOneHp': player.hp[1],
+        'PlayerBenchOneStatus': statuses[1],
+        'PlayerBenchOneType1': player_types[1][0],
+        'PlayerBenchOneType2': player_types[1][1],
+        'PlayerBenchOneHP': player_stats[1][0],
+        'PlayerBenchOneAtk': player_stats[1][1],
+        'PlayerBenchOneDef': player_stats[1][2],
+        'PlayerBenchOneSpA': player_stats[1][3],
+        'PlayerBenchOneSpD': player_stats[1][4],
+        'PlayerBenchOneSpe': player_stats[1][5],
+        'PlayerBenchTwo': species.number(player_ids[2]),
+        'PlayerBenchTwoHp': player.hp[2],
+        'PlayerBenchTwoStatus': statuses[2],
+        'PlayerBenchTwoType1': player_types[2][0],
+        'PlayerBenchTwoType2': player_types[2][1],
+        'PlayerBenchTwoHP': player_stats[2][0],
+        'PlayerBenchTwoAtk': player_stats[2][1],
+        'PlayerBenchTwoDef': player_stats[2][2],
+        'PlayerBenchTwoSpA': player_stats[2][3],
+        'PlayerBenchTwoSpD': player_stats[2][4],
+        'PlayerBenchTwoSpe': player_stats[2][5],
+        'PlayerBenchThree': species.number(player_ids[3]),
+        'PlayerBenchThreeHp': player.hp[3],
+        'PlayerBenchThreeStatus': statuses[3],
+        'PlayerBenchThreeType1': player_types[3][0],
+        'PlayerBenchThreeType2': player_types[3][1],
+        'PlayerBenchThreeHP': player_stats[3][0],
+        'PlayerBenchThreeAtk': player_stats[3][1],
+        'PlayerBenchThreeDef': player_stats[3][2],
+        'PlayerBenchThreeSpA': player_stats[3][3],
+        'PlayerBenchThreeSpD': player_stats[3][4],
+        'PlayerBenchThreeSpe': player_stats[3][5],
+        'PlayerBenchFour': species.number(player_ids[4]),
+        'PlayerBenchFourHp': player.hp[4],
+        'PlayerBenchFourStatus': statuses[4],
+        'PlayerBenchFourType1': player_types[4][0],
+        'PlayerBenchFourType2': player_types[4][1],
+        'PlayerBenchFourHP': player_stats[4][0],
+        'PlayerBenchFourAtk': player_stats[4][1],
+        'PlayerBenchFourDef': player_stats[4][2],
+        'PlayerBenchFourSpA': player_stats[4][3],
+        'PlayerBenchFourSpD': player_stats[4][4],
+        'PlayerBenchFourSpe': player_stats[4][5],
+        'PlayerBenchFive': species.number(player_ids[5]),
+        'PlayerBenchFiveHp': player.hp[5],
+        'PlayerBenchFiveStatus': statuses[5],
+        'PlayerBenchFiveType1': player_types[5][0],
+        'PlayerBenchFiveType2': player_types[5][1],
+        'PlayerBenchFiveHP': player_stats[5][0],
+        'PlayerBenchFiveAtk': player_stats[5][1],
+        'PlayerBenchFiveDef': player_stats[5][2],
+        'PlayerBenchFiveSpA': player_stats[5][3],
+        'PlayerBenchFiveSpD': player_stats[5][4],
+        'PlayerBenchFiveSpe': player_stats[5][5],
+        'PlayerBoostAtk': player_boosts["atk"],
+        'PlayerBoostDef': player_boosts["def"],
+        'PlayerBoostSpa': player_boosts["spa"],
+        'PlayerBoostSpd': player_boosts["spd"],
+        'PlayerBoostSpe': player_boosts["spe"],
+        'PlayerBoostEva': player_boosts["evasion"],
+        'PlayerBoostAcc': player_boosts["accuracy"],
+        'EnemyPkmnOnField': species.number(enemy_ids[0]),
+        'EnemyPkmnHealth': enemy.hp[0],
+        'EnemyPkmnStatus': statuses[0],
+        'EnemyPkmnType1': enemy_types[0][0],
+        'EnemyPkmnType2': enemy_types[0][1],
+        'EnemyPkmnHP': enemy_stats[0][0],
+        'EnemyPkmnAtk': enemy_stats[0][1],
+        'EnemyPkmnDef': enemy_stats[0][2],
+        'EnemyPkmnSpA': enemy_stats[0][3],
+        'EnemyPkmnSpD': enemy_stats[0][4],
+        'EnemyPkmnSpe': enemy_stats[0][5],
+        'EnemyBenchOne': species.number(enemy_ids[1]),
+        'EnemyBenchOneHp': enemy.hp[1],
+        'EnemyBenchOneStatus': statuses[1],
+        'EnemyBenchOneType1': enemy_types[1][0],
+        'EnemyBenchOneType2': enemy_types[1][1],
+        'EnemyBenchOneHP': enemy_stats[1][0],
+        'EnemyBenchOneAtk': enemy_stats[1][1],
+        'EnemyBenchOneDef': enemy_stats[1][2],
+        'EnemyBenchOneSpA': enemy_stats[1][3],
+        'EnemyBenchOneSpD': enemy_stats[1][4],
+        'EnemyBenchOneSpe': enemy_stats[1][5],
+        'EnemyBenchTwo': species.number(enemy_ids[3]),
+        'EnemyBenchTwoHp': enemy.hp[2],
+        'EnemyBenchTwoStatus': statuses[2],
+        'EnemyBenchTwoType1': enemy_types[2][0],
+        'EnemyBenchTwoType2': enemy_types[2][1],
+        'EnemyBenchTwoHP': enemy_stats[2][0],
+        'EnemyBenchTwoAtk': enemy_stats[2][1],
+        'EnemyBenchTwoDef': enemy_stats[2][2],
+        'EnemyBenchTwoSpA': enemy_stats[2][3],
+        'EnemyBenchTwoSpD': enemy_stats[2][4],
+        'EnemyBenchTwoSpe': enemy_stats[2][5],
+        'EnemyBenchThree': species.number(enemy_ids[3]),
+        'EnemyBenchThreeHp': enemy.hp[3],
+        'EnemyBenchThreeStatus': statuses[3],
+        'EnemyBenchThreeType1': enemy_types[3][0],
+        'EnemyBenchThreeType2': enemy_types[3][1],
+        'EnemyBenchThreeHP': enemy_stats[3][0],
+        'EnemyBenchThreeAtk': enemy_stats[3][1],
+        'EnemyBenchThreeDef': enemy_stats[3][2],
+        'EnemyBenchThreeSpA': enemy_stats[3][3],
+        'EnemyBenchThreeSpD': enemy_stats[3][4],
+        'EnemyBenchThreeSpe': enemy_stats[3][5],
+        'EnemyBenchFour': species.number(enemy_ids[4]),
+        'EnemyBenchFourHp': enemy.hp[4],
+        'EnemyBenchFourStatus': statuses[4],
+        'EnemyBenchFourType1': enemy_types[4][0],
+        'EnemyBenchFourType2': enemy_types[4][1],
+        'EnemyBenchFourHP': enemy_stats[4][0],
+        'EnemyBenchFourAtk': enemy_stats[4][1],
+        'EnemyBenchFourDef': enemy_stats[4][2],
+        'EnemyBenchFourSpA': enemy_stats[4][3],
+        'EnemyBenchFourSpD': enemy_stats[4][4],
+        'EnemyBenchFourSpe': enemy_stats[4][5],
+        'EnemyBenchFive': species.number(enemy_ids[5]),
+        'EnemyBenchFiveHp': enemy.hp[5],
+        'EnemyBenchFiveStatus': statuses[5],
+        'EnemyBenchFiveType1': enemy_types[5][0],
+        'EnemyBenchFiveType2': enemy_types[5][1],
+        'EnemyBenchFiveHP': enemy_stats[5][0],
+        'EnemyBenchFiveAtk': enemy_stats[5][1],
+        'EnemyBenchFiveDef': enemy_stats[5][2],
+        'EnemyBenchFiveSpA': enemy_stats[5][3],
+        'EnemyBenchFiveSpD': enemy_stats[5][4],
+        'EnemyBenchFiveSpe': enemy_stats[5][5],
+        'EnemyBoostAtk': enemy_boosts["atk"],
+        'EnemyBoostDef': enemy_boosts["def"],
+        'EnemyBoostSpa': enemy_boosts["spa"],
+        'EnemyBoostSpd': enemy_boosts["spd"],
+        'EnemyBoostSpe': enemy_boosts["spe"],
+        'EnemyBoostEva': enemy_boosts["evasion"],
+        'EnemyBoostAcc': enemy_boosts["accuracy"],
+        'Weather': convert_weather_from_name(snapshot.weather),
+        'Terrain': convert_terrain_from_name(snapshot.terrain),
+        'PlayerStealthRock': player_conditions['Stealth Rock'],
+        'PlayerSpikes': player_conditions['Spikes'],
+        'PlayerToxicSpikes': player_conditions['Toxic Spikes'],
+        'PlayerStickyWeb': player_conditions['Sticky Web'],
+        'PlayerReflect': player_conditions['Reflect'],
+        'PlayerLightScreen': player_conditions['Light Screen'],
+        'PlayerMist': player_conditions['Mist'],
+        'PlayerAuroraVeil': player_conditions['Aurora Veil'],
+        'PlayerSafeguard': player_conditions['Safeguard'],
+        'EnemyStealthRock': enemy_conditions['Stealth Rock'],
+        'EnemySpikes': enemy_conditions['Spikes'],
+        'EnemyToxicSpikes': enemy_conditions['Toxic Spikes'],
+        'EnemyStickyWeb': enemy_conditions['Sticky Web'],
+        'EnemyReflect': enemy_conditions['Reflect'],
+        'EnemyLightScreen': enemy_conditions['Light Screen'],
+        'EnemyMist': enemy_conditions['Mist'],
+        'EnemyAuroraVeil': enemy_conditions['Aurora Veil'],
+        'EnemySafeguard': enemy_conditions['Safeguard'],
+        # Every switch shares one label, the species switched to is not a move id
+        'PlayerMove': hash_moves[move] if switch is None else SWITCH_MOVE_ID,
     }
     actions.append(action_info)
 
 
-def parse(link, actions, hash_pkmn, hash_moves, count):
-    # Represents Pokémon, hp, and status effects
-    pokemon = [[[], [100] * 6, [0] * 6], [], [], [[], [100] * 6, [0] * 6], [0] * 6, [], []]
-    # Represents base stat changes
-    boosts_zero = {"atk": 0, "def": 0, "spa": 0, "spd": 0, "spe": 0, "accuracy": 0, "evasion": 0}
-    # Represents stat changes
-    boosts = [{"atk": 0, "def": 0, "spa": 0, "spd": 0, "spe": 0, "accuracy": 0, "evasion": 0},
-              {"atk": 0, "def": 0, "spa": 0, "spd": 0, "spe": 0, "accuracy": 0, "evasion": 0}]
-    # Each Pokémon move
-    moves = [None, None]
-    weather = 0
-    terrain = 0
-    hazards = [{'Stealth Rock': 0, 'Spikes': 0, 'Toxic Spikes': 0, 'Sticky Web': 0,
-                'Reflect': 0, 'Light Screen': 0, 'Mist': 0, 'Aurora Veil': 0, 'Safeguard': 0},
-               {'Stealth Rock': 0, 'Spikes': 0, 'Toxic Spikes': 0, 'Sticky Web': 0,
-                'Reflect': 0, 'Light Screen': 0, 'Mist': 0, 'Aurora Veil': 0, 'Safeguard': 0}]
-
-    # current state of Pokémon, boosts, weather, terrain, and statuses
-    currPkmn = pokemon
-    currBoosts = boosts
-    currWeather = weather
-    currTerrain = terrain
-    currHazards = hazards
-
+def fetch_log(link):
     # Create a request object with a User-Agent header
     req = urllib.request.Request(
         link,
@@ -218,137 +218,133 @@ def parse(link, actions, hash_pkmn, hash_moves, count):
         response = urllib.request.urlopen(req)
     except Exception as e:
         logging.exception(e)
-        return
+        return None
 
+    return response.read().decode('utf-8')
+
+
+def parse(link, actions, species, hash_moves, count):
+    log = fetch_log(link)
+    if log is None:
+        return
     print(str(count) + ':' + link)
-    log = response.read().decode('utf-8')
-    # Read through each line in the battle log
+    parse_log(log, actions, species, hash_moves)
+
+
+def parse_log(log, actions, species, hash_moves):
+    # Rows describe the state at the last turn or upkeep, the leads before turn 1 see it as it is
+    turn_start = [None]
+
+    def record(state, user, move, switch):
+        snapshot = turn_start[0] if turn_start[0] is not None else state.snapshot()
+        add_action(actions, species, hash_moves, snapshot, user, move, switch)
+
+    state = BattleState(on_action=record)
     for line in log.split('\n'):
-        blocks: List[str] = line.split('|')
-        if len(blocks) < 2:
-            pass
-        elif blocks[1] == 'win':
+        command = state.apply(line)
+        if command == 'win':
             break
-        elif blocks[1] == 'poke':
-            i = 0 if blocks[2] == 'p1' else 1
-            # pokemon[i][0].append(blocks[3].split(',')[0].split('-*')[0])
-            name = blocks[3].split(',')[0].split('-*')[0]
-            pkmn_data = hash_pkmn.loc[hash_pkmn['Name'] == name]
-            pokemon[i][0].append(name)
-            pokemon[i][3].append(pkmn_data[['HP', 'Atk', 'Def', 'SpA', 'SpD', 'Spe']].values.tolist()[0])
-            pokemon[i][4].append(pkmn_data[['Type 1', 'Type 2']].values.tolist()[0])
-        elif blocks[1] == 'switch':
-            i = 0 if blocks[2].startswith('p1') else 1
-            swapIndex = 0
-            if blocks[3].split(",")[0] == "Zamazenta-Crowned":
-                swapIndex = pokemon[i][0].index("Zamazenta")
-            elif blocks[3].split(",")[0] == "Zacian-Crowned":
-                swapIndex = pokemon[i][0].index("Zacian")
-            elif blocks[3].split(",")[0] == "Urshifu-Rapid-Strike" \
-                    or blocks[3].split(",")[0] == "Urshifu-Single-Strike":
-                swapIndex = pokemon[i][0].index("Urshifu")
-            elif blocks[3].split(",")[0] == "Mimikyu-Busted":
-                swapIndex = pokemon[i][0].index("Mimikyu")
-            elif blocks[3].split(",")[0] == "Ogerpon-Teal-Tera" or blocks[3].split(",")[0] == "Ogerpon-Wellspring-Tera":
-                for j in range(6):
-                    if pokemon[i][0][j].startswith("Ogerpon"):
-                        swapIndex = j
-            elif blocks[3].split(",")[0] == "Indeedee-F":
-                swapIndex = pokemon[i][0].index("Indeedee")
-            else:
-                swapIndex = pokemon[i][0].index(blocks[3].split(",")[0])
-            moves[i] = (hash_pkmn.loc[hash_pkmn['Name'] == pokemon[i][0][swapIndex]])['Number']
-            add_action(actions, hash_pkmn, hash_moves, currPkmn, currBoosts, currWeather, currTerrain, currHazards,
-                       moves, i)
-            pokemon[i][0][0], pokemon[i][0][swapIndex] = pokemon[i][0][swapIndex], pokemon[i][0][0]
-            pokemon[i][1][0], pokemon[i][1][swapIndex] = pokemon[i][1][swapIndex], pokemon[i][1][0]
-            boosts[i] = boosts_zero
-            pokemon[i][2][0], pokemon[i][2][swapIndex] = pokemon[i][2][swapIndex], pokemon[i][2][0]
-            pokemon[i][3][0], pokemon[i][3][swapIndex] = pokemon[i][3][swapIndex], pokemon[i][3][0]
-            pokemon[i][4][0], pokemon[i][4][swapIndex] = pokemon[i][4][swapIndex], pokemon[i][4][0]
-        elif blocks[1] == 'drag':
-            i = 0 if blocks[2].startswith('p1') else 1
-            pokemon[i][0][0], pokemon[i][0][5] = pokemon[i][0][5], pokemon[i][0][0]
-            pokemon[i][1][0], pokemon[i][1][5] = pokemon[i][1][5], pokemon[i][1][0]
-            boosts[i] = boosts_zero
-            pokemon[i][2][0], pokemon[i][2][5] = pokemon[i][2][5], pokemon[i][2][0]
-            pokemon[i][3][0], pokemon[i][3][5] = pokemon[i][3][5], pokemon[i][3][0]
-            pokemon[i][4][0], pokemon[i][4][5] = pokemon[i][4][5], pokemon[i][4][0]
-        elif blocks[1] == 'move':
-            i = 0 if blocks[2].startswith('p1') else 1
-            moves[i] = blocks[3]
-            add_action(actions, hash_pkmn, hash_moves, currPkmn, currBoosts, currWeather, currTerrain, currHazards,
-                       moves, i)
-        elif blocks[1] == '-damage' or blocks[1] == '-heal':
-            i = 0 if blocks[2].startswith('p1') else 1
-            pokemon[i][1][0] = int(blocks[3].split(" ")[0].split("/")[0])
-        elif blocks[1] == '-boost' or blocks[1] == '-unboost':
-            i = 0 if blocks[2].startswith('p1') else 1
-            change = int(blocks[4]) * -1 if blocks[1].startswith('-un') else 1
-            boosts[i][blocks[3]] += change
-        elif blocks[1] == '-fieldstart':
-            terr_temp = blocks[2].split(" ")[1]
-            if terr_temp == 'Electric':
-                terrain = 1
-            elif terr_temp == 'Psychic':
-                terrain = 2
-            elif terr_temp == 'Misty':
-                terrain = 3
-            elif terr_temp == 'Grassy':
-                terrain = 4
-        elif blocks[1] == '-fieldend':
-            terrain = 0
-        elif blocks[1] == '-weather':
-            weath_temp = blocks[2]
-            if weath_temp == 'none':
-                weather = 0
-            elif weath_temp == 'SunnyDay':
-                weather = 1
-            elif weath_temp == 'Snow':
-                weather = 2
-            elif weath_temp == 'Rain':
-                weather = 3
-            elif weath_temp == 'Sandstorm':
-                weather = 4
-        elif blocks[1] == '-sidestart':
-            i = 0 if blocks[2].startswith('p1') else 1
-            if ':' in blocks[3]:
-                hazards[i][blocks[3].split(': ')[1]] += 1
-            else:
-                hazards[i][blocks[3]] += 1
-        elif blocks[1] == '-sideend':
-            i = 0 if blocks[2].startswith('p1') else 1
-            if ':' in blocks[3]:
-                hazards[i][blocks[3].split(': ')[1]] = 0
-            else:
-                hazards[i][blocks[3]] = 0
-        elif blocks[1] == '-swapsideconditions':
-            hazards[0], hazards[1] = hazards[1], hazards[0]
-        elif blocks[1] == 'turn' or blocks[1] == 'upkeep':
-            currPkmn = pokemon
-            currBoosts = boosts
-            currWeather = weather
-            currTerrain = terrain
-            currHazards = hazards
+        if command == 'turn' or command == 'upkeep':
+            turn_start[0] = state.snapshot()
+
+
+# Set in each worker process by _init_worker
+_worker_species = None
+_worker_hash_moves = None
 
 
-def create_table(links_input, turnsTable):
-    actions = []
+def _init_worker(species, hash_moves):
+    global _worker_species, _worker_hash_moves
+    _worker_species = species
+    _worker_hash_moves = hash_moves
 
-    move_data = pd.ExcelFile('moves.xlsx')
-    dfm = pd.read_excel(move_data, sheet_name=0)
-    hash_moves = pd.Series(dfm['id'].values, index=dfm['name']).to_dict()
-    hash_pkmn = pd.read_excel('better_pkmn_data.xlsx')
+
+def _parse_shard(shard):
+    # Parse one contiguous slice of the links from the cache into its own partial csv
+    start, links, cache_dir, part_path, chunk_size, columnar = shard
+    cache = ReplayCache(cache_dir)
+    writer_class = ColumnarTurnTableWriter if columnar else TurnTableWriter
+    with writer_class(part_path, chunk_size) as actions:
+        for i, link in enumerate(links, start=start):
+            log = cache.get(link)
+            if log is None:
+                continue
+            print(str(i) + ':' + link)
+            try:
+                parse_log(log, actions, _worker_species, _worker_hash_moves)
+            except Exception as e:
+                print(e)
+    return part_path if actions.rows_written else None
+
+
+def _merge_parts(part_paths, turnsTable):
+    # Concatenate the partial tables in shard order, keeping only the first header
+    with open(turnsTable, 'w', newline='') as out:
+        header_written = False
+        for part_path in part_paths:
+            with open(part_path, 'r', newline='') as part:
+                header = part.readline()
+                if not header_written:
+                    out.write(header)
+                    header_written = True
+                shutil.copyfileobj(part, out)
+            os.remove(part_path)
+
+
+def create_table_from_logs(logs, turnsTable, chunk_size=10000, columnar=False):
+    # Parse logs from any iterable, e.g. the database stream in backend/replay_parser.py. Logs are
+    # taken one at a time, so memory holds one log and one chunk of rows however long the stream is
+    hash_moves = load_moves('moves.xlsx').name_to_id
+    species = SpeciesIndex.from_file('better_pkmn_data.xlsx')
+
+    writer_class = ColumnarTurnTableWriter if columnar else TurnTableWriter
+    with writer_class(turnsTable, chunk_size) as actions:
+        for i, log in enumerate(logs, start=1):
+            try:
+                parse_log(log, actions, species, hash_moves)
+            except Exception as e:
+                print(e)
+            if i % 1000 == 0:
+                print(str(i) + ' logs, ' + str(actions.rows_written) + ' rows')
+    return actions.rows_written
+
+
+def create_table(links_input, turnsTable, cache_dir='replay_cache', source=None, workers=16, processes=None,
+                 shard_size=64, chunk_size=10000, columnar=False):
+    hash_moves = load_moves('moves.xlsx').name_to_id
+    species = SpeciesIndex.from_file('better_pkmn_data.xlsx')
 
     with open(links_input, 'r') as f:
-        links = f.read()
-    i = 1
-    for link in links.split("\n"):
-        try:
-            parse(link + ".log", actions, hash_pkmn, hash_moves, i)
-        except Exception as e:
-            print(e)
-        i += 1
+        links = [link + ".log" for link in f.read().split("\n") if link]
+
+    # Download everything missing from the cache concurrently, then parse from the cache
+    fetcher = ReplayFetcher(cache_dir, source, workers)
+    try:
+        fetcher.prefetch(links)
+    finally:
+        fetcher.close()
 
-    df = pd.DataFrame(actions)
-    df.to_csv(turnsTable, index=False)
+    # Shards depend only on shard_size, so the merged table has the same rows in link order
+    # whatever the number of processes
+    parts_dir = turnsTable + '.parts'
+    os.makedirs(parts_dir, exist_ok=True)
+    part_suffix = '' if columnar else '.csv'
+    shards = [
+        (start + 1, links[start:start + shard_size], cache_dir, os.path.join(parts_dir, f'part-{n:05}{part_suffix}'),
+         chunk_size, columnar)
+        for n, start in enumerate(range(0, len(links), shard_size))
+    ]
+    if processes == 1:
+        _init_worker(species, hash_moves)
+        part_paths = list(map(_parse_shard, shards))
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(species, hash_moves)) as executor:
+            part_paths = list(executor.map(_parse_shard, shards))
+
+    part_paths = [part_path for part_path in part_paths if part_path is not None]
+    if columnar:
+        merge_columnar(part_paths, turnsTable)
+    else:
+        _merge_parts(part_paths, turnsTable)
+    os.rmdir(parts_dir)
@@ -0,0 +1,127 @@
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+              'Chrome/58.0.3029.110 Safari/537.3 ')
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class ReplayCache:
+    """Content-addressed store for raw replay logs.
+
+    objects/ab/<sha256 of log> holds each distinct log once and refs/cd/<sha256 of link>
+    names the object a link resolved to, so a link is never downloaded twice.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _ref_path(self, link):
+        digest = _sha256(link.encode('utf-8'))
+        return os.path.join(self.root, 'refs', digest[:2], digest)
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], digest)
+
+    def __contains__(self, link):
+        return os.path.exists(self._ref_path(link))
+
+    def get(self, link):
+        try:
+            with open(self._ref_path(link), 'r') as f:
+                digest = f.read().strip()
+            with open(self._object_path(digest), 'rb') as f:
+                return f.read().decode('utf-8')
+        except FileNotFoundError:
+            return None
+
+    def put(self, link, log):
+        data = log.encode('utf-8')
+        digest = _sha256(data)
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            _write_atomic(object_path, data)
+        _write_atomic(self._ref_path(link), digest.encode('ascii'))
+
+
+class ReplayFetcher:
+    """Downloads replay logs on a pooled keep-alive session into a ReplayCache.
+
+    source redirects where logs come from: None fetches each link as is, an http(s) base
+    url (e.g. a local stub server) replaces the link's scheme and host, and anything else
+    is a directory holding the logs under their file names (gen9ou-123.log).
+    """
+
+    def __init__(self, cache_dir='replay_cache', source=None, workers=16, timeout=30):
+        self.cache = ReplayCache(cache_dir)
+        self.source = source
+        self.workers = workers
+        self.timeout = timeout
+
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _download(self, link):
+        if self.source is None:
+            url = link
+        elif self.source.startswith(('http://', 'https://')):
+            url = self.source.rstrip('/') + urlsplit(link).path
+        else:
+            with open(os.path.join(self.source, os.path.basename(urlsplit(link).path)), 'r', encoding='utf-8') as f:
+                return f.read()
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content.decode('utf-8')
+
+    def fetch(self, link):
+        log = self.cache.get(link)
+        if log is not None:
+            return log
+        try:
+            log = self._download(link)
+        except Exception as e:
+            logging.exception(e)
+            return None
+        self.cache.put(link, log)
+        return log
+
+    def _prefetch_one(self, link):
+        if link in self.cache:
+            return True
+        return self.fetch(link) is not None
+
+    def prefetch(self, links):
+        # Only fill the cache here; callers read logs back one at a time so memory stays flat
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return sum(executor.map(self._prefetch_one, links))
+
+    def close(self):
+        self.session.close()
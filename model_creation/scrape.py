@@ -1,27 +1,115 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def scrape():
-    # Set up the driver for the browser of your choice (e.g., Chrome, Firefox)
-    driver = webdriver.Chrome()
-    file = open('links.txt', 'w')
+from .replay_fetcher import USER_AGENT
+
+REPLAY_BASE_URL = 'https://replay.pokemonshowdown.com/'
+
+
+class ReplayListCrawler:
+    """Collects replay links from the search.json endpoint, many formats and pages at a time.
+
+    base_url is where search.json is asked (e.g. a local stub server) while link_base is what
+    the written links start with, so they stay real replay urls for parse2.create_table.
+    """
+
+    def __init__(self, base_url=REPLAY_BASE_URL, link_base=REPLAY_BASE_URL, workers=16, timeout=30):
+        self.base_url = base_url.rstrip('/') + '/'
+        self.link_base = link_base.rstrip('/') + '/'
+        self.workers = workers
+        self.timeout = timeout
+
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch_page(self, format_page, sort='rating'):
+        format_id, page = format_page
+        url = self.base_url + 'search.json?format=' + format_id + '&page=' + str(page)
+        if sort:
+            url += '&sort=' + sort
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logging.exception(e)
+            return None
+
+    def crawl(self, formats, pages, links_output, sort='rating'):
+        # Links already in the file are skipped and pages listed in the progress file aren't asked
+        # again, so an interrupted crawl picks up where it stopped
+        seen = set()
+        if os.path.exists(links_output):
+            with open(links_output, 'r') as f:
+                seen.update(link for link in f.read().split('\n') if link)
+
+        progress_path = links_output + '.progress'
+        done = {}
+        last_page = {}
+        if os.path.exists(progress_path):
+            with open(progress_path, 'r') as f:
+                progress = json.load(f)
+            done = {format_id: set(done_pages) for format_id, done_pages in progress['done'].items()}
+            last_page = progress['last']
+
+        # Page-major so each wave spreads over the formats
+        todo = [(format_id, page) for page in range(1, pages + 1) for format_id in formats
+                if page not in done.get(format_id, ())]
+        added = 0
+
+        with open(links_output, 'a') as out, ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for start in range(0, len(todo), self.workers):
+                # Nothing past a format's last page is asked for
+                wave = [(format_id, page) for format_id, page in todo[start:start + self.workers]
+                        if page <= last_page.get(format_id, pages)]
+                results = executor.map(lambda format_page: self.fetch_page(format_page, sort), wave)
+
+                for (format_id, page), replays in zip(wave, results):
+                    # A failed page isn't marked done, so the next run asks for it again
+                    if replays is None:
+                        continue
+                    for replay in replays:
+                        link = self.link_base + replay['id']
+                        if link not in seen:
+                            seen.add(link)
+                            out.write(link + '\n')
+                            added += 1
+                    # A short page is the last one
+                    if len(replays) < 50:
+                        last_page[format_id] = min(page, last_page.get(format_id, page))
+                    done.setdefault(format_id, set()).add(page)
+
+                # Progress only ever covers links that are already on disk
+                out.flush()
+                progress = {
+                    'done': {format_id: sorted(done_pages) for format_id, done_pages in done.items()},
+                    'last': last_page,
+                }
+                with open(progress_path + '.tmp', 'w') as f:
+                    json.dump(progress, f)
+                os.replace(progress_path + '.tmp', progress_path)
+                print(str(len(seen)) + ' links')
+
+        return added
+
+    def close(self):
+        self.session.close()
+
+
+def scrape(formats=('gen9ou',), pages=99, links_output='links.txt', base_url=REPLAY_BASE_URL, workers=16,
+           sort='rating'):
+    crawler = ReplayListCrawler(base_url, workers=workers)
     try:
-        for i in range(1, 100):
-            # Generate the URL for the current page of games
-            url = 'https://replay.pokemonshowdown.com/?format=gen9ou&page=' + str(i) + '&sort=rating'
-            driver.get(url)
-            # Wait for the dynamic element to be present on the page
-            elements = WebDriverWait(driver, 10).until(
-                EC.presence_of_all_elements_located((By.CLASS_NAME, 'blocklink'))
-            )
-            # Extract the text from each element
-            for element in elements:
-                href = element.get_attribute('href')
-                print(href)
-                file.write(href + "\n")
+        return crawler.crawl(formats, pages, links_output, sort)
     finally:
-        file.close()
-        driver.quit()  # Quit the driver after the loop is finished
+        crawler.close()
@@ -0,0 +1,53 @@
+import numpy as np
+
+from frontend.vocabulary import load_species
+
+STAT_COLUMNS = ['HP', 'Atk', 'Def', 'SpA', 'SpD', 'Spe']
+TYPE_COLUMNS = ['Type 1', 'Type 2']
+
+
+class SpeciesIndex:
+    """Maps species names to dense integer ids with their number, stats and types stored in arrays.
+
+    When a name appears more than once (alternate forms share a name) the first row wins,
+    the same row hash_pkmn.loc[hash_pkmn['Name'] == name] would have returned first.
+    """
+
+    def __init__(self, names, numbers, stats, types):
+        self.ids = {}
+        for row, name in enumerate(names):
+            self.ids.setdefault(name, row)
+        self.numbers = np.asarray(numbers, dtype=np.float64)
+        self.stats = np.asarray(stats, dtype=np.int64)
+
+        # types are stored as small codes into type_names, None marks a missing second type
+        self.type_names = [None]
+        type_codes = {None: 0}
+        self.types = np.zeros((len(self.numbers), len(TYPE_COLUMNS)), dtype=np.int8)
+        for row, row_types in enumerate(types):
+            for k, type_name in enumerate(row_types):
+                if not isinstance(type_name, str):
+                    type_name = None
+                if type_name not in type_codes:
+                    type_codes[type_name] = len(self.type_names)
+                    self.type_names.append(type_name)
+                self.types[row, k] = type_codes[type_name]
+
+    @classmethod
+    def from_dataframe(cls, df):
+        return cls(df['Name'].tolist(), df['Number'].to_numpy(), df[STAT_COLUMNS].to_numpy(),
+                   df[TYPE_COLUMNS].values.tolist())
+
+    @classmethod
+    def from_file(cls, file_path):
+        columns = load_species(file_path)
+        return cls(columns.names, columns.numbers, columns.stats, columns.types)
+
+    def number(self, species_id):
+        return self.numbers[species_id]
+
+    def stat_list(self, species_id):
+        return self.stats[species_id].tolist()
+
+    def type_list(self, species_id):
+        return [self.type_names[code] for code in self.types[species_id]]
@@ -5,6 +5,8 @@ from keras.models import Model
 from keras.layers import Input, Dense, Dropout, BatchNormalization
 from keras.optimizers import Adam
 
+from frontend.vocabulary import load_moves
+
 
 def encode_moves(df, move_list):
     # Assume 'move_list' is a list of all unique moves available to all Pokémon
@@ -14,25 +16,12 @@ def encode_moves(df, move_list):
     return encoded_moves, encoder
 
 
-def get_moves_from_excel(file_path):
-    # Load the Excel file
-    moves_data = pd.ExcelFile(file_path)
-    # Read the first sheet or a specific sheet if required
-    moves_df = pd.read_excel(moves_data, sheet_name=0)
-    # Assume that the first column contains the moves; adjust if it's a different column
-    moves_list = moves_df.iloc[:, 0].unique().tolist()
-    # Sort the list if the moves are numerical
-    if all(isinstance(move, (int, float)) for move in moves_list):
-        moves_list.sort()
-    return moves_list
-
-
 def train2():
     # data = pd.ExcelFile('turns.csv')
     # df = pd.read_excel(data, sheet_name=0)
     df = pd.read_csv('turns.csv')
 
-    move_list = get_moves_from_excel('moves.xlsx')
+    move_list = load_moves('moves.xlsx').ids
 
     # Encode the moves
     Y, move_encoder = encode_moves(df, move_list)
@@ -1,57 +1,40 @@
 import logging
 import urllib.request
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
 from keras.models import Model, load_model
 from keras.layers import Input, Dense, Dropout, BatchNormalization
 from keras.optimizers import Adam
 
+from frontend.conversion import feature_index
+from frontend.feature_schema import save_feature_schema, schema_path_for
+from frontend.vocabulary import SWITCH_MOVE_ID, load_moves
+from .export_model import export_model
+from .input_pipeline import TurnTableStream
 
-def encode_moves(df, move_list):
-    # Assume 'move_list' is a list of all unique moves available to all Pokémon
-    encoder = OneHotEncoder(categories=[move_list], sparse=False)
-    # Reshape is necessary if 'PlayerMove' is a 1D array (series)
-    encoded_moves = encoder.fit_transform(df['PlayerMove'].values.reshape(-1, 1))
-    return encoded_moves, encoder
 
+def train2(turnTable, model_name, epochs=10, batch_size=32, chunk_size=65536):
+    # The table is streamed from disk in chunks instead of loaded whole, so it can be larger than memory
+    table = TurnTableStream(turnTable, chunk_size)
 
-def get_moves_from_excel(file_path):
-    # Load the Excel file
-    moves_data = pd.ExcelFile(file_path)
-    # Read the first sheet or a specific sheet if required
-    moves_df = pd.read_excel(moves_data, sheet_name=0)
-    # Assume that the first column contains the moves; adjust if it's a different column
-    moves_list = moves_df.iloc[:, 0].unique().tolist()
-    # Sort the list if the moves are numerical
-    if all(isinstance(move, (int, float)) for move in moves_list):
-        moves_list.sort()
-    return moves_list
+    # The GUI has to encode the same columns at prediction time, so fail now rather than after training
+    feature_index(table.feature_columns)
 
+    moves = load_moves('moves.xlsx')
+    # The switch label goes first, the class weights below count on it being index 0
+    move_list = [SWITCH_MOVE_ID] + [move_id for move_id in moves.ids if move_id != SWITCH_MOVE_ID]
+    move_names = moves.names_for(move_list)
 
-def train2(turnTable, model_name):
-    # data = pd.ExcelFile('turns.csv')
-    # df = pd.read_excel(data, sheet_name=0)
-    df = pd.read_csv(turnTable)
+    # Split into training and test sets, 20% of the rows of every chunk are held out
+    train_rows, test_rows = table.split(test_size=0.2, seed=42)
 
-    move_list = get_moves_from_excel('moves.xlsx')
+    # Normalize features with the min/max of the training rows, found in one pass over them
+    schema = table.fit_schema(train_rows, move_list, move_names)
 
-    # Encode the moves
-    Y, move_encoder = encode_moves(df, move_list)
-
-    # Features
-    X = df.drop(columns=['PlayerMove'])
-
-    # Split into training and test sets
-    X_train, X_test, Y_train, Y_test = train_test_split(X, Y, test_size=0.2, random_state=42)
-
-    # Normalize features
-    scaler_X = MinMaxScaler()
-    X_train_scaled = scaler_X.fit_transform(X_train)
-    X_test_scaled = scaler_X.transform(X_test)
+    # Batches are scaled on the fly and labelled with the move's index in move_list
+    train_data = table.dataset(schema, train_rows, batch_size, shuffle=True, seed=42)
+    test_data = table.dataset(schema, test_rows, batch_size, shuffle=False)
 
     # Model definition
-    input_layer = Input(shape=(X_train_scaled.shape[1],))
+    input_layer = Input(shape=(len(schema.columns),))
 
     # First hidden layer
     hidden_layer_1 = Dense(256, activation='relu')(input_layer)
@@ -84,7 +67,7 @@ def train2(turnTable, model_name):
 
     # (learning_rate=0.001) PUT THIS IN BUT TEST WITHOUT
     model.compile(optimizer=Adam(learning_rate=0.001),
-                  loss='categorical_crossentropy',
+                  loss='sparse_categorical_crossentropy',
                   metrics=['accuracy'])
 
     # Calculate class weights
@@ -94,10 +77,15 @@ def train2(turnTable, model_name):
         class_weights[move_id] = 1  # Assign normal weight to other moves
 
     # Train the model with class weights
-    model.fit(X_train_scaled, Y_train, epochs=10, batch_size=32,
-              validation_data=(X_test_scaled, Y_test), class_weight=class_weights)
+    model.fit(train_data, epochs=epochs, validation_data=test_data, class_weight=class_weights)
 
     # Evaluate the model on the test set
-    model.evaluate(X_test_scaled, Y_test)
+    model.evaluate(test_data)
 
     model.save(model_name)
+
+    # Save the scaling and move vocabulary next to the model so inference doesn't refit them
+    save_feature_schema(schema_path_for(model_name), schema)
+
+    # And the weights with BatchNorm folded in, for the NumPy inference backend
+    export_model(model_name)
@@ -0,0 +1,235 @@
+import csv
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# 2 stored PlayerMove as float32 instead of int16. That only stopped 445.1 being cut to 445;
+# switch rows still carried species numbers, which collide with move ids. 3 is written since
+# parse2 labels every switch with SWITCH_MOVE_ID, so tables with species labels are rejected.
+COLUMNAR_VERSION = 3
+
+# Same codes as frontend.conversion.type_mappings
+TYPE_CATEGORIES = ['', 'Fire', 'Normal', 'Water', 'Grass', 'Electric', 'Ice', 'Fighting', 'Poison', 'Ground',
+                   'Flying', 'Psychic', 'Bug', 'Rock', 'Ghost', 'Dragon', 'Dark', 'Steel', 'Fairy']
+TYPE_CODES = {name: code for code, name in enumerate(TYPE_CATEGORIES)}
+
+_STAT_SUFFIXES = ('HP', 'Atk', 'Def', 'SpA', 'SpD', 'Spe')
+_TYPE_SUFFIXES = ('Type1', 'Type2', 'Type 1', 'Type 2')
+_SIDE_CONDITION_SUFFIXES = ('StealthRock', 'Spikes', 'ToxicSpikes', 'StickyWeb', 'Reflect', 'LightScreen', 'Mist',
+                            'AuroraVeil', 'Safeguard')
+
+
+def column_dtype(name):
+    # Boosts, statuses and field conditions fit in a byte, base stats in two, hp and species numbers
+    # (forms are numbered 445.1) need a float. PlayerMove stays a float so a csv from before
+    # SWITCH_MOVE_ID converts without cutting its labels.
+    if 'Boost' in name or 'Status' in name or name in ('Weather', 'Terrain') or name.endswith(_SIDE_CONDITION_SUFFIXES):
+        return 'int8'
+    if name.endswith(_TYPE_SUFFIXES):
+        return 'int8'
+    if name.endswith(_STAT_SUFFIXES):
+        return 'int16'
+    return 'float32'
+
+
+class TurnTableWriter:
+    """Streams action rows to a csv, flushing every chunk_size rows.
+
+    It has the same append() as the list parse_log used to fill. Reading the file back with
+    pd.read_csv gives the table pd.DataFrame(actions).to_csv would have written, only integer
+    cells in columns with gaps are written as 38 rather than 38.0.
+    """
+
+    def __init__(self, path, chunk_size=10000):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.columns = None
+        self.rows_written = 0
+        self._rows = []
+        self._file = None
+        self._writer = None
+
+    def append(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        if self._writer is None:
+            self.columns = list(self._rows[0])
+            self._file = open(self.path, 'w', newline='')
+            self._writer = csv.writer(self._file, lineterminator=os.linesep)
+            self._writer.writerow(self.columns)
+        self._writer.writerows([row[column] for column in self.columns] for row in self._rows)
+        self.rows_written += len(self._rows)
+        self._rows.clear()
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ColumnarTurnTableWriter(TurnTableWriter):
+    """Streams action rows into a directory with one raw little-endian file per column.
+
+    schema.json records each column's dtype, and for type columns the categories the codes
+    index into (-1 marks a missing value). Type names are encoded with the full TYPE_CATEGORIES
+    list whatever the first chunk held, and a name outside it is an error rather than a 0.
+    """
+
+    def __init__(self, path, chunk_size=10000):
+        super().__init__(path, chunk_size)
+        self.schema = None
+
+    def _start(self, columns):
+        self.columns = list(columns)
+        self.schema = []
+        for column in self.columns:
+            entry = {'name': column, 'dtype': column_dtype(column)}
+            if column.endswith(_TYPE_SUFFIXES):
+                entry['categories'] = TYPE_CATEGORIES
+            self.schema.append(entry)
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path)
+        os.makedirs(self.path)
+
+    def _encode(self, entry, values):
+        if 'categories' in entry:
+            return np.array([self._type_code(entry, value) for value in values], dtype=entry['dtype'])
+        values = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+        if np.dtype(entry['dtype']).kind == 'i':
+            values = values.fillna(0)
+        return values.to_numpy().astype(entry['dtype'])
+
+    @staticmethod
+    def _type_code(entry, value):
+        # Names and the codes older tables held both end up as codes into the categories
+        if isinstance(value, str):
+            if value not in TYPE_CODES:
+                raise ValueError(f"Unknown type {value!r} in column {entry['name']}.")
+            return TYPE_CODES[value]
+        if value is None or value != value:
+            return -1
+        if not 0 <= value < len(TYPE_CATEGORIES):
+            raise ValueError(f"Type code {value} out of range in column {entry['name']}.")
+        return int(value)
+
+    def _write_columns(self, get_values, n_rows):
+        for k, entry in enumerate(self.schema):
+            data = self._encode(entry, get_values(entry['name']))
+            with open(os.path.join(self.path, f'{k}.bin'), 'ab') as f:
+                data.astype(np.dtype(entry['dtype']).newbyteorder('<')).tofile(f)
+        self.rows_written += n_rows
+        self._write_schema()
+
+    def _write_schema(self):
+        with open(os.path.join(self.path, 'schema.json'), 'w') as f:
+            json.dump({'version': COLUMNAR_VERSION, 'rows': self.rows_written, 'columns': self.schema}, f)
+
+    def flush(self):
+        if not self._rows:
+            return
+        rows = self._rows
+        if self.schema is None:
+            self._start(rows[0])
+        self._write_columns(lambda column: [row[column] for row in rows], len(rows))
+        self._rows = []
+
+    def append_frame(self, df):
+        self.flush()
+        if self.schema is None:
+            self._start(df.columns)
+        self._write_columns(lambda column: df[column].tolist(), len(df))
+
+    def close(self):
+        self.flush()
+
+
+def is_columnar(path):
+    return os.path.isdir(path)
+
+
+def is_current_columnar(path):
+    # Whether a columnar table exists and was written in the current format
+    try:
+        with open(os.path.join(path, 'schema.json'), 'r') as f:
+            return json.load(f)['version'] == COLUMNAR_VERSION
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def read_columns(path):
+    # Every column is a read-only memory map, nothing is parsed or copied
+    with open(os.path.join(path, 'schema.json'), 'r') as f:
+        meta = json.load(f)
+    if meta['version'] != COLUMNAR_VERSION:
+        raise ValueError(f"Unsupported columnar table version {meta['version']} in {path}.")
+    columns = {}
+    for k, entry in enumerate(meta['columns']):
+        dtype = np.dtype(entry['dtype']).newbyteorder('<')
+        if meta['rows'] == 0:
+            columns[entry['name']] = np.zeros(0, dtype=dtype)
+        else:
+            columns[entry['name']] = np.memmap(os.path.join(path, f'{k}.bin'), dtype=dtype, mode='r',
+                                               shape=(meta['rows'],))
+    return columns, meta['columns']
+
+
+def read_turn_table(path):
+    # Loads either a csv or a columnar directory as a DataFrame, decoding type codes to names
+    if not is_columnar(path):
+        return pd.read_csv(path)
+    columns, schema = read_columns(path)
+    data = {}
+    for entry in schema:
+        values = columns[entry['name']]
+        if 'categories' in entry:
+            values = pd.Categorical.from_codes(np.asarray(values, dtype=np.int64), categories=entry['categories'])
+        data[entry['name']] = values
+    return pd.DataFrame(data)
+
+
+def merge_columnar(part_paths, path):
+    # Concatenates columnar parts column by column in the given order
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+    schema = None
+    rows = 0
+    for part_path in part_paths:
+        with open(os.path.join(part_path, 'schema.json'), 'r') as f:
+            meta = json.load(f)
+        if schema is None:
+            schema = meta['columns']
+        elif meta['columns'] != schema:
+            raise ValueError(f'{part_path} has a different schema than the parts before it.')
+        for k in range(len(schema)):
+            with open(os.path.join(path, f'{k}.bin'), 'ab') as out, open(os.path.join(part_path, f'{k}.bin'), 'rb') as part:
+                shutil.copyfileobj(part, out)
+        rows += meta['rows']
+        shutil.rmtree(part_path)
+    with open(os.path.join(path, 'schema.json'), 'w') as f:
+        json.dump({'version': COLUMNAR_VERSION, 'rows': rows, 'columns': schema or []}, f)
+
+
+def convert_csv(csv_path, path, chunk_size=100000):
+    # Converts an existing turn table csv to the columnar format without loading it all at once
+    writer = ColumnarTurnTableWriter(path, chunk_size)
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+        writer.append_frame(chunk)
+    writer.close()
+    return writer.rows_written
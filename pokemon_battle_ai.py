@@ -1,19 +1,92 @@
-from selenium import webdriver
+import argparse
+import os
+import subprocess
+import sys
+import time
 
 from frontend.gui import GUI
-from frontend.driver import WebDriver
+
+# Time from launching the process to the first painted window that --profile-startup holds us to
+STARTUP_BUDGET_MS = 300
+
+
+def _parse_importtime(stderr: str) -> list[tuple[int, int, str]]:
+    """Return (self us, cumulative us, module) for the top-level imports in -X importtime output."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # nested imports are indented under the module that pulled them in
+        if name.startswith(' ') and not name.startswith('  '):
+            imports.append((int(self_us), int(cumulative_us), name.strip()))
+    return imports
+
+
+def profile_startup(top: int = 15) -> int:
+    """Start a window in a child interpreter under -X importtime and report where the time went."""
+    # Timed from just before the child is launched, so interpreter boot and every import count
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--startup-probe', repr(time.time())],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        return result.returncode
+
+    timings = dict(line.split('=', 1) for line in result.stdout.splitlines() if '=' in line)
+    window_ms = float(timings['window_ms'])
+    warm_up_ms = float(timings['warm_up_ms'])
+
+    print(f'{"self ms":>9} {"total ms":>9}  module')
+    imports = sorted(_parse_importtime(result.stderr), key=lambda entry: -entry[1])
+    for self_us, cumulative_us, name in imports[:top]:
+        print(f'{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {name}')
+    print(f'\nwindow shown {window_ms:.0f} ms after launch (budget {STARTUP_BUDGET_MS} ms), '
+          f'warm-up done after {warm_up_ms:.0f} ms')
+    return 0 if window_ms <= STARTUP_BUDGET_MS else 1
+
+
+def startup_probe(launched_at: float) -> None:
+    """Show the window, wait for the warm-up and print both times since launched_at, without a browser."""
+    gui = GUI('Pokemon Showdown Bot', '500x500')
+    gui.window.update()
+    print(f'window_ms={(time.time() - launched_at) * 1000:.1f}')
+    gui.warm_up()
+    gui._warm_up_thread.join()
+    print(f'warm_up_ms={(time.time() - launched_at) * 1000:.1f}')
+    gui.window.destroy()
+
 
 def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='print an import time breakdown of opening the window and exit')
+    parser.add_argument('--startup-probe', type=float, metavar='LAUNCHED_AT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        sys.exit(profile_startup())
+    if args.startup_probe is not None:
+        startup_probe(args.startup_probe)
+        return
+
     gui = GUI('Pokemon Showdown Bot', '500x500')
-    
+    # paint the window and start loading the model before the slow browser launch
+    gui.window.update()
+    gui.warm_up()
+
+    from selenium import webdriver
+    from frontend.driver import WebDriver
+
     options = webdriver.ChromeOptions()
     options.add_argument('--ignore-certificate-errors-spki-list')
     driver = WebDriver(options=options)
     driver.get("https://play.pokemonshowdown.com/")
-    
+
     gui.hook(driver)
     gui.run()
-    
+
     driver.quit()
 
 if __name__ == '__main__':